@@ -168,10 +168,9 @@ Display.BlockOnOpenWindow()
 #
 print("Create Accelerated Data")
 accFactor = 4;
-samplingPattern = IsmrmSunrise.GenerateAcceleratedSamplingPattern(im1.shape, accFactor, 0)
-samplingMask = np.logical_or(samplingPattern == 1,samplingPattern == 3).astype(float)
-dataAccel = data * samplingMask[:,:,np.newaxis]
-imAlias = IsmrmSunrise.TransformKspaceToImage(dataAccel, [0,1])
+samplingPattern = IsmrmSunrise.SamplingPattern(im1.shape, accFactor, 0)
+dataAccel = IsmrmSunrise.AcceleratedKspace.FromFullData(data, samplingPattern)
+imAlias = dataAccel.TransformToAliasedImage()
 
 Display.ShowImage2D(imAlias, maxNumInRow=4, windowTitle='Aliased Images', titles='channel')
 ## Create Data Driven & Model Driven Joint Encoding Relations
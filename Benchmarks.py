@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark suite for IsmrmSunrise
+
+Times the main IsmrmSunrise functions on synthetic data over a range of matrix sizes
+and channel counts, recording the best time and the peak memory allocated by each call,
+and flags regressions against a stored baseline.
+
+    python Benchmarks.py --sizes 64 128 --channels 8 16 --save-baseline baseline.json
+    python Benchmarks.py --sizes 64 128 --channels 8 16 --baseline baseline.json
+
+With --imports the time and memory of importing the packages in a fresh interpreter
+are measured too, e.g. `import IsmrmSunrise` against `from IsmrmSunrise import *`.
+
+The run exits with status 1 if any benchmark is slower (or allocates more) than the
+baseline by more than the tolerance.
+"""
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import IsmrmSunrise
+
+
+def GenerateBenchmarkData(matrixSize, numChannels, accFactor=2, calSize=32, seed=0):
+    """Synthetic phantom, coil sensitivities, noise covariance and k-space data.
+
+    Coil sensitivities are smooth Gaussian profiles around the field of view with a
+    linear phase, the noise covariance is a random positive definite matrix and the
+    noise is generated with GenerateCorrelatedNoise.
+    """
+    np.random.seed(seed)
+    x, y = np.meshgrid(np.linspace(-1, 1, matrixSize), np.linspace(-1, 1, matrixSize), indexing='ij')
+    im = ((x**2/0.6 + y**2/0.8) < 1) * (200 + 50*np.cos(6*x))
+
+    csm = np.zeros([matrixSize, matrixSize, numChannels], dtype=complex)
+    for channel in range(numChannels):
+        angle = 2*np.pi*channel/numChannels
+        csm[:, :, channel] = np.exp(-((x - 1.2*np.cos(angle))**2 + (y - 1.2*np.sin(angle))**2)/1.5) * np.exp(1j*(0.5*x*np.cos(angle) + 0.7*y + np.random.rand()))
+
+    mixing = np.eye(numChannels) + 0.1*(np.random.randn(numChannels, numChannels) + 1j*np.random.randn(numChannels, numChannels))
+    noiseMatrix = np.dot(mixing, mixing.conj().T)
+
+    noise = 0.05 * np.max(im) * IsmrmSunrise.GenerateCorrelatedNoise(im.shape, noiseMatrix)
+    data = IsmrmSunrise.TransformImageToKspace(csm * im[:, :, np.newaxis], [0, 1]) + noise
+
+    samplingPattern = IsmrmSunrise.SamplingPattern(im.shape, accFactor, calSize)
+    calData = IsmrmSunrise.ExtractCalData(data * samplingPattern.Mask()[:, :, np.newaxis], samplingPattern)
+    lpFilter = np.outer(np.hamming(calData.shape[0]), np.hamming(calData.shape[1]))
+    calIm = IsmrmSunrise.TransformKspaceToImage(calData * lpFilter[:, :, np.newaxis], [0, 1], im.shape)
+
+    ccm = IsmrmSunrise.ComputeChannelCombinationMaps(csm, noiseMatrix)
+    return {'im': im, 'csm': csm, 'noiseMatrix': noiseMatrix, 'data': data, 'accFactor': accFactor,
+            'samplingPattern': samplingPattern, 'calData': calData, 'calIm': calIm, 'ccm': ccm,
+            'pixelMask': (im > 0).astype(float), 'kernelShape': [5, 7]}
+
+
+def CreateBenchmarks(d):
+    """name -> function of no arguments, for the data returned by GenerateBenchmarkData."""
+    unmix = IsmrmSunrise.ComputeJerUnmixing(IsmrmSunrise.ComputeJerDataDriven(d['calData'], d['kernelShape']), d['accFactor'], d['ccm'], 0.001)
+    imChannels = IsmrmSunrise.TransformKspaceToImage(d['data'], [0, 1])
+    accelerated = IsmrmSunrise.AcceleratedKspace.FromFullData(d['data'], d['samplingPattern'])
+    unfilteredCalIm = IsmrmSunrise.TransformKspaceToImage(d['calData'], [0, 1], 2 * np.array(d['calData'].shape[0:2]))
+    jerLookup = IsmrmSunrise.ComputeJerDataDriven(d['calData'], d['kernelShape'])
+
+    return {
+        'GenerateCorrelatedNoise': lambda: IsmrmSunrise.GenerateCorrelatedNoise(d['im'].shape, d['noiseMatrix']),
+        'EstimateCovarianceMatrix': lambda: IsmrmSunrise.EstimateCovarianceMatrix(np.reshape(d['data'], [-1, d['data'].shape[2]])),
+        'ApplyNoiseDecorrelationMatrix': lambda: IsmrmSunrise.ApplyNoiseDecorrelationMatrix(d['data'], IsmrmSunrise.ComputeNoiseDecorrelationMatrixFromCovarianceMatrix(d['noiseMatrix'])),
+        'TransformImageToKspace': lambda: IsmrmSunrise.TransformImageToKspace(imChannels, [0, 1]),
+        'TransformKspaceToImage': lambda: IsmrmSunrise.TransformKspaceToImage(d['data'], [0, 1]),
+        'TransformToAliasedImage': lambda: accelerated.TransformToAliasedImage(),
+        'ComputeChannelCombinationMaps': lambda: IsmrmSunrise.ComputeChannelCombinationMaps(d['csm'], d['noiseMatrix']),
+        'EstimateCsmWalsh': lambda: IsmrmSunrise.EstimateCsmWalsh(d['calIm']),
+        'EstimateCsmMckenzie': lambda: IsmrmSunrise.EstimateCsmMckenzie(d['calIm']),
+        'ComputeCcmDvc': lambda: IsmrmSunrise.ComputeCcmDvc(d['calIm']),
+        'ComputeJerDataDriven': lambda: IsmrmSunrise.ComputeJerDataDriven(d['calData'], d['kernelShape']),
+        'ComputeJerModelDriven': lambda: IsmrmSunrise.ComputeJerModelDriven(unfilteredCalIm, d['kernelShape']),
+        'ComputeJerUnmixing': lambda: IsmrmSunrise.ComputeJerUnmixing(jerLookup, d['accFactor'], d['ccm'], 0.001),
+        'ComputeSenseUnmixing': lambda: IsmrmSunrise.ComputeSenseUnmixing(d['accFactor'], d['csm'], d['noiseMatrix']),
+        'ComputeGmap': lambda: IsmrmSunrise.ComputeGmap(unmix, d['ccm'], d['accFactor'], d['noiseMatrix']),
+        'ComputeAliasingEnergyMap': lambda: IsmrmSunrise.ComputeAliasingEnergyMap(d['pixelMask'], d['csm'], unmix, d['accFactor']),
+        'ComputeSvdCoilCompressionMatrix': lambda: IsmrmSunrise.ComputeSvdCoilCompressionMatrix(d['calData'], d['data'].shape[2] // 2),
+    }
+
+
+# name -> import statement, timed in a fresh interpreter by TimeImport
+IMPORT_BENCHMARKS = {
+    'import IsmrmSunrise': 'import IsmrmSunrise',
+    'import IsmrmSunrise.TransformKspaceToImage': 'from IsmrmSunrise import TransformKspaceToImage',
+    'import IsmrmSunrise.*': 'from IsmrmSunrise import *',
+    'import Display': 'import Display',
+    'import Display.ShowImage2D': 'from Display import ShowImage2D',
+}
+
+IMPORT_TIMER = """
+import sys, time, tracemalloc
+if {traceMemory}:
+    tracemalloc.start()
+startTime = time.perf_counter()
+{statement}
+print(time.perf_counter() - startTime, tracemalloc.get_traced_memory()[1], len(sys.modules))
+"""
+
+
+def TimeFunction(function, repeats=3):
+    """Best wall time over repeats, and peak memory allocated during one further call.
+    Memory is measured separately because tracemalloc slows down the call."""
+    function()
+    times = []
+    for repeat in range(repeats):
+        gc.collect()
+        startTime = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - startTime)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        function()
+        peakMemory = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return min(times), peakMemory
+
+
+def TimeImport(statement, repeats=3):
+    """Best wall time of an import statement over repeats, each in a fresh interpreter,
+    peak memory allocated by it in one further run and the number of modules loaded."""
+    times = []
+    for repeat in range(repeats):
+        elapsed, peakMemory, numModules = RunImportTimer(statement, False)
+        times.append(elapsed)
+    peakMemory = RunImportTimer(statement, True)[1]
+    return min(times), peakMemory, numModules
+
+
+def RunImportTimer(statement, traceMemory):
+    output = subprocess.run([sys.executable, '-c', IMPORT_TIMER.format(statement=statement, traceMemory=traceMemory)],
+                            cwd=os.path.dirname(os.path.abspath(__file__)), stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            universal_newlines=True, check=True).stdout.split()
+    return float(output[0]), int(output[1]), int(output[2])
+
+
+def RunBenchmarks(matrixSizes, channelCounts, repeats=3, names=None, verbose=True):
+    """Runs the benchmarks for each matrix size and channel count.
+
+    Returns
+    -------
+    results : list of dict
+        one row per benchmark and data size with keys 'benchmark', 'matrixSize',
+        'numChannels', 'time' (s) and 'peakMemory' (bytes)
+    """
+    results = []
+    for matrixSize in matrixSizes:
+        for numChannels in channelCounts:
+            benchmarks = CreateBenchmarks(GenerateBenchmarkData(matrixSize, numChannels))
+            for name, function in benchmarks.items():
+                if names is not None and name not in names:
+                    continue
+                elapsed, peakMemory = TimeFunction(function, repeats)
+                row = {'benchmark': name, 'matrixSize': matrixSize, 'numChannels': numChannels,
+                       'time': elapsed, 'peakMemory': peakMemory}
+                results.append(row)
+                if verbose:
+                    PrintRow(row)
+    return results
+
+
+def RunImportBenchmarks(repeats=3, names=None, verbose=True):
+    """Runs the import benchmarks. Rows are as for RunBenchmarks with matrixSize and
+    numChannels 0, and the number of loaded modules as 'numModules'. Imports that fail,
+    e.g. Display without Qt installed, are reported and skipped."""
+    results = []
+    for name, statement in IMPORT_BENCHMARKS.items():
+        if names is not None and name not in names:
+            continue
+        try:
+            elapsed, peakMemory, numModules = TimeImport(statement, repeats)
+        except subprocess.CalledProcessError as err:
+            print('{:<44s} failed: {}'.format(name, (err.stderr.strip().splitlines() or [''])[-1]))
+            continue
+        row = {'benchmark': name, 'matrixSize': 0, 'numChannels': 0, 'time': elapsed,
+               'peakMemory': peakMemory, 'numModules': numModules}
+        results.append(row)
+        if verbose:
+            PrintRow(row)
+    return results
+
+
+def CompareToBaseline(results, baseline, tolerance=1.25):
+    """Rows of results whose time or peak memory exceeds the baseline by more than tolerance.
+    Each returned row has the baseline values added as 'baselineTime' and 'baselinePeakMemory'."""
+    baselineRows = dict((BenchmarkKey(row), row) for row in baseline)
+    regressions = []
+    for row in results:
+        baselineRow = baselineRows.get(BenchmarkKey(row))
+        if baselineRow is None:
+            continue
+        if row['time'] > tolerance * baselineRow['time'] or row['peakMemory'] > tolerance * baselineRow['peakMemory']:
+            regressions.append(dict(row, baselineTime=baselineRow['time'], baselinePeakMemory=baselineRow['peakMemory']))
+    return regressions
+
+
+def BenchmarkKey(row):
+    return (row['benchmark'], row['matrixSize'], row['numChannels'])
+
+
+def PrintRow(row):
+    print('{:<44s} {:>5d} {:>4d} {:>10.4f} s {:>10.1f} MB'.format(row['benchmark'], row['matrixSize'], row['numChannels'], row['time'], row['peakMemory'] / 2**20))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark IsmrmSunrise functions on synthetic data')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[64, 128], help='matrix sizes (Nx = Ny)')
+    parser.add_argument('--channels', type=int, nargs='+', default=[8], help='channel counts')
+    parser.add_argument('--repeats', type=int, default=3, help='timed calls per benchmark; the best is kept')
+    parser.add_argument('--benchmarks', nargs='+', default=None, help='names of the benchmarks to run. default is all')
+    parser.add_argument('--imports', action='store_true', help='also time the package imports')
+    parser.add_argument('--baseline', help='baseline results (JSON) to compare against')
+    parser.add_argument('--tolerance', type=float, default=1.25, help='allowed ratio to the baseline')
+    parser.add_argument('--save-baseline', help='file to save the results to, for use as a baseline')
+    args = parser.parse_args()
+
+    results = RunBenchmarks(args.sizes, args.channels, args.repeats, args.benchmarks)
+    if args.imports:
+        results += RunImportBenchmarks(args.repeats, args.benchmarks)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(results, f, indent=1)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = CompareToBaseline(results, json.load(f), args.tolerance)
+        for row in regressions:
+            print('REGRESSION {} {}x{} {} channels: {:.4f} s (baseline {:.4f} s), {:.1f} MB (baseline {:.1f} MB)'.format(
+                row['benchmark'], row['matrixSize'], row['matrixSize'], row['numChannels'], row['time'], row['baselineTime'],
+                row['peakMemory'] / 2**20, row['baselinePeakMemory'] / 2**20))
+        if regressions:
+            sys.exit(1)
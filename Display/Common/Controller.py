@@ -64,7 +64,7 @@ class Controller(QtCore.QObject):
         
         '''
         try:
-            self.dataModel.dataTable.iloc[index, self.dataModel.dataTable.columns.get_loc('Visible')] = visibleFlag
+            self.dataModel.SetDataTableValue(index, 'Visible', visibleFlag)
             self.dataModel.SetMinMaxVisibleViewValues()
             self.VisibleChanged.emit()
         except Exception as err:
@@ -75,9 +75,9 @@ class Controller(QtCore.QObject):
         try:
 
             if self.dataModel.locationSyncFlag == True:
-                self.dataModel.dataTable['CurrIndex'] = sampleIndex
+                self.dataModel.dataTable.FillColumn('CurrIndex', sampleIndex)
             else:
-                self.dataModel.dataTable.iloc[lineIndex, self.dataModel.dataTable.columns.get_loc('CurrIndex')] = sampleIndex
+                self.dataModel.SetDataTableValue(lineIndex, 'CurrIndex', sampleIndex)
 
             self.LocationChanged.emit()
         except Exception as err:
@@ -94,7 +94,7 @@ class Controller(QtCore.QObject):
     def ChangeSingleDimLocation(self, dimIndex, sampleIndex):
         try:
 
-            self.dataModel.commonState.dimsTable.iloc[dimIndex, self.dataModel.commonState.dimsTable.columns.get_loc('CurrLocation')] = sampleIndex
+            self.dataModel.commonState.SetDimValue(dimIndex, 'CurrLocation', sampleIndex)
             self.LocationChanged.emit()
         except Exception as err:
             DisplayCore.HandleException(err)
@@ -104,19 +104,17 @@ class Controller(QtCore.QObject):
     def ChangeDoubleDimLocation(self, dim1Index, sample1Index, dim2Index, sample2Index):
         try:
 
-            currLocationIndex = self.dataModel.commonState.dimsTable.columns.get_loc('CurrLocation')
-            self.dataModel.commonState.dimsTable.iloc[dim1Index, currLocationIndex] = sample1Index
-            self.dataModel.commonState.dimsTable.iloc[dim2Index, currLocationIndex] = sample2Index
+            commonState = self.dataModel.commonState
+            commonState.SetDimValue(dim1Index, 'CurrLocation', sample1Index)
+            commonState.SetDimValue(dim2Index, 'CurrLocation', sample2Index)
             self.LocationChanged.emit()
         except Exception as err:
             DisplayCore.HandleException(err)
 
     def ChangeWindowLevel(self, window, level):
         try:
-            currViewIndex = self.dataModel.commonState.currViewIndex
-
-            self.dataModel.commonState.viewsTable.iloc[currViewIndex, self.dataModel.commonState.viewsTable.columns.get_loc('Window')] = window
-            self.dataModel.commonState.viewsTable.iloc[currViewIndex, self.dataModel.commonState.viewsTable.columns.get_loc('Level')] = level
+            self.dataModel.commonState.SetCurrViewValue('Window', window)
+            self.dataModel.commonState.SetCurrViewValue('Level', level)
             self.WindowLevelChanged.emit()
         
         except Exception as err:
@@ -147,6 +145,7 @@ class Controller(QtCore.QObject):
     def ChangeView(self, imType):
         try:
             self.dataModel.commonState.currViewIndex = imType
+            self.dataModel.SetMinMaxVisibleViewValues()
             self.ViewChanged.emit()
         except Exception as err:
             DisplayCore.HandleException(err)
@@ -15,8 +15,11 @@ Philip J. Beatty (philip.beatty@gmail.com)
 __all__ = ["CommonDataState", "DataModel"]
 
 from . import DisplayCore
+from . import ViewDefinitions
+from .StateStore import StateTable
+from .DataSources import IsInMemory
+import threading
 import numpy as np
-import pandas as pd
 import matplotlib.cm as colormaps
 
 from IPython.display import display
@@ -30,27 +33,31 @@ class CommonDataState(QtCore.QObject):
     signalMarkerChange = QtCore.Signal(int, int)    
 
     def GetNumDims(self):
-        return self.dimsTable.shape[0]
+        return len(self.dimsTable)
     
     def GetDimValue(self, dimIndex, label):
         try:
-            result = self.dimsTable.iloc[dimIndex, self.dimsTable.columns.get_loc(label)]
-            return result
+            return self.dimsTable.rows[dimIndex][label]
         except Exception as err:
             print("Exception in GetDimValue: {}".format(label))
 
+    def SetDimValue(self, dimIndex, label, value):
+        self.dimsTable.SetValue(dimIndex, label, value)
+
         
     def GetCurrViewValue(self, label=None):
+        ''' Value of label for the current view, or the whole row (dict) if label is None
+        '''
         try:
-            colIndex = slice(None)
-            if not label is None:
-                colIndex = self.viewsTable.columns.get_loc(label)
-
-            rVal = self.viewsTable.iloc[self.currViewIndex, colIndex]
-            return rVal
+            if label is None:
+                return self.viewsTable.GetRow(self.currViewIndex)
+            return self.viewsTable.rows[self.currViewIndex][label]
         except Exception as err:
             print("Exception in GetCurrViewValue: {}".format(label))
 
+    def SetCurrViewValue(self, label, value):
+        self.viewsTable.SetValue(self.currViewIndex, label, value)
+
 
 
             
@@ -64,39 +71,27 @@ class CommonDataState(QtCore.QObject):
 
                 names = ['x', 'y', 'z']
                 colors = ['m', 'c', 'y']
-                dimsTable = pd.DataFrame({'Name':names[0:nDims],
-                                          'Shape':dimShape,
-                                          'Color' : colors[0:nDims],
-                                          'CurrLocation' : (np.array(dimShape)*0.5).astype(int)})
+                dimsTable = StateTable({'Name':names[0:nDims],
+                                        'Shape':[int(extent) for extent in dimShape],
+                                        'Color' : colors[0:nDims],
+                                        'CurrLocation' : [int(extent*0.5) for extent in dimShape]})
                 return dimsTable
             
             def CreateViewsTable():
-                # Set Name as index, but also leave as data column
-                viewsTable = pd.DataFrame({'Name':['Magnitude', 'Phase', 'Real', 'Imaginary']})
-                viewsTable = viewsTable.set_index('Name', drop=False)
+                # Rows can be looked up by Name, which is also a data column
+                views = ViewDefinitions.VIEWS
+                names = [view['Name'] for view in views]
+                viewsTable = StateTable({'Name':names}, rowNames=names)
 
                 # Add data columns
-                viewsTable['Index'] = range(4)
-
-                viewsTable['ReductionFn'] = lambda x: np.abs(x)
-                viewsTable.at['Phase', 'ReductionFn'] = lambda x: np.angle(x)
-
-                #N.B. cannot use np.real(x) because it has different behavior
-                # in scalar case. It returns a size 1 array instead of a scaler
-                viewsTable.at['Real', 'ReductionFn'] = lambda x: x.real
-                viewsTable.at['Imaginary', 'ReductionFn'] = lambda x: x.imag
-
-                viewsTable['MaxMin'] = 1000.0 # cannot have a larger min than this
-                viewsTable['MinMax'] = -1000.0 # cannot have a smaller max than this
-
-                viewsTable.at['Phase', 'MaxMin'] = -3.1416
-                viewsTable.at['Phase', 'MinMax'] =  3.1416
-                viewsTable.at['Magnitude', 'MaxMin'] = 0.0
+                viewsTable.SetColumn('Index', list(range(len(views))))
+                for label in ['ReductionFn', 'MaxMin', 'MinMax']:
+                    viewsTable.SetColumn(label, [view[label] for view in views])
 
                 return viewsTable
 
             #
-            # viewsTable is a data frame, where each row completely
+            # viewsTable is a StateTable, where each row completely
             # describes the settings for each type of view of the
             # (complex) data.  I am trying to make it so that the
             # viewer code does not need domain knowledge of how
@@ -106,7 +101,7 @@ class CommonDataState(QtCore.QObject):
             self.viewsTable = CreateViewsTable()
 
             # Set starting image type to Magnitude
-            self.currViewIndex = self.viewsTable.loc['Magnitude', 'Index']
+            self.currViewIndex = self.viewsTable.GetRowIndex('Magnitude')
             self.dimsTable = CreateDimsTable(dimShape)
         except Exception as err:
             print("Exception in DataModelBase.CommonDataState.__init__: {}".format(err))
@@ -138,10 +133,11 @@ class DataModel(object):
         try:
             titles = MakeTitles(titles, numDataSeries)
             colors = DisplayCore.MakeColors(numDataSeries)
-            self.dataTable = pd.DataFrame({'Title': titles,
+            self.dataTable = StateTable({'Title': titles,
                                          'Color' : colors,
-                                         'Visible' : True,
-                                         'Index' : range(numDataSeries)})
+                                         'Visible' : [True] * numDataSeries,
+                                         'Index' : list(range(numDataSeries))})
+            self.viewMinMaxLock = threading.Lock()
 
         except Exception as err:
             DisplayCore.HandleException(err)
@@ -152,7 +148,7 @@ class DataModel(object):
         #cs = self.commonState
 
         rFn = self.commonState.GetCurrViewValue('ReductionFn')
-        currData = self.dataTable.iloc[datasetIndex, self.dataTable.columns.get_loc('Data')]
+        currData = self.dataTable.GetValue(datasetIndex, 'Data')
         if(currData.ndim == 1):            
             result = rFn(currData[dim1Slice])
         elif(currData.ndim == 2):
@@ -169,45 +165,120 @@ class DataModel(object):
         return self.commonState.GetDimValue(dimIndex, label)
 
     def GetNumDatasets(self):
-        return self.dataTable.shape[0]
+        return len(self.dataTable)
 
     def GetNumDims(self):
         return self.commonState.GetNumDims()
     
     def GetDataTableValue(self, index, label=None):
-        
-        colIndex = slice(None)
-        if not label is None:
-            colIndex = self.dataTable.columns.get_loc(label)
-            
-        result = self.dataTable.iloc[index, colIndex]
-        return result
+        ''' Value of label for a dataset, or the whole row (dict) if label is None
+        '''
+        if label is None:
+            return self.dataTable.GetRow(index)
+        return self.dataTable.GetValue(index, label)
+
+    def SetDataTableValue(self, index, label, value):
+        self.dataTable.SetValue(index, label, value)
+        if label == 'Data':
+            self.dataTable.GetRow(index).pop('ViewMinMax', None)
+
+    def GetDataViewMinMax(self, dataIndex, viewIndex):
+        """ (min, max) of a view of a dataset. Computed on first use and cached
+        in the 'ViewMinMax' column of dataTable, a dict per dataset of view
+        index -> (min, max), which is cleared when the data is replaced.
+        For data that is not in memory (memory-mapped, HDF5, SliceProvider)
+        it is estimated from a few slices rather than read in full
+
+        """
+        with self.viewMinMaxLock:
+            viewMinMax = self.dataTable.GetRow(dataIndex).setdefault('ViewMinMax', {})
+            if viewIndex not in viewMinMax:
+                rFn = self.commonState.viewsTable.GetValue(viewIndex, 'ReductionFn')
+                data = self.dataTable.GetValue(dataIndex, 'Data')
+                if IsInMemory(data):
+                    viewMinMax[viewIndex] = ComputeViewMinMax(data, rFn)
+                else:
+                    viewMinMax[viewIndex] = EstimateViewMinMax(data, rFn)
+            return viewMinMax[viewIndex]
+
+    def StartViewMinMaxPrecompute(self):
+        """ Computes the min and max of every view of every dataset on a
+        background thread, so that changing the view or showing a hidden
+        dataset does not have to wait for them
 
-    def SetMinMaxVisibleViewValues(self):
-        """Iterates through dataTable. For each visible data, computes the min
-        and max according to each view. Adds these min and max values
-        to viewsTable as 'DataMin' and 'DataMax' columns
+        """
+        def Precompute():
+            try:
+                for viewIndex in range(len(self.commonState.viewsTable)):
+                    for dataIndex in range(len(self.dataTable)):
+                        self.GetDataViewMinMax(dataIndex, viewIndex)
+            except Exception as err:
+                DisplayCore.HandleException(err)
+
+        thread = threading.Thread(target=Precompute, name='ViewMinMaxPrecompute')
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def SetMinMaxVisibleViewValues(self, viewIndex=None):
+        """Reduces the cached min and max of each visible dataset (see
+        GetDataViewMinMax) for a view, by default the current view. Sets
+        these min and max values in viewsTable as 'DataMin' and 'DataMax'
 
         """
         try:
-            self.commonState.viewsTable['DataMin'] = 0.0
-            self.commonState.viewsTable['DataMax'] = 0.0
-        
-            for viewIndex in range(self.commonState.viewsTable.shape[0]):
-                dataMin = self.commonState.viewsTable.iloc[viewIndex, self.commonState.viewsTable.columns.get_loc('MaxMin')]
-                dataMax = self.commonState.viewsTable.iloc[viewIndex, self.commonState.viewsTable.columns.get_loc('MinMax')]
-                rFn = self.commonState.viewsTable.iloc[viewIndex, self.commonState.viewsTable.columns.get_loc('ReductionFn')]
-                for dataIndex in range(self.dataTable.shape[0]):
-                    if self.dataTable.iloc[dataIndex, self.dataTable.columns.get_loc('Visible')]:
-                        dataView = rFn(self.dataTable.Data[dataIndex])
-                        currMin = np.min(dataView)
-                        currMax = np.max(dataView)
-
-                        dataMin = min(dataMin, currMin)
-                        dataMax = max(dataMax, currMax)
-
-                self.commonState.viewsTable.iloc[viewIndex, self.commonState.viewsTable.columns.get_loc('DataMin')] = dataMin
-                self.commonState.viewsTable.iloc[viewIndex, self.commonState.viewsTable.columns.get_loc('DataMax')] = dataMax
+            viewsTable = self.commonState.viewsTable
+            if viewIndex is None:
+                viewIndex = self.commonState.currViewIndex
+            dataMin = viewsTable.GetValue(viewIndex, 'MaxMin')
+            dataMax = viewsTable.GetValue(viewIndex, 'MinMax')
+            for dataIndex in range(len(self.dataTable)):
+                if self.dataTable.GetValue(dataIndex, 'Visible'):
+                    currMin, currMax = self.GetDataViewMinMax(dataIndex, viewIndex)
+                    dataMin = min(dataMin, currMin)
+                    dataMax = max(dataMax, currMax)
+
+            viewsTable.SetValue(viewIndex, 'DataMin', dataMin)
+            viewsTable.SetValue(viewIndex, 'DataMax', dataMax)
 
         except Exception as err:
             DisplayCore.HandleException(err)
+
+
+def ComputeViewMinMax(data, reductionFn, blockSize=2**22):
+    """ (min, max) of reductionFn(data), reduced in blocks along the first
+    dimension so that the temporary view is about blockSize samples rather
+    than the size of the data
+
+    """
+    if np.ndim(data) == 0:
+        view = reductionFn(data)
+        return view, view
+    planeSize = int(np.prod(data.shape[1:]))
+    step = max(1, blockSize // max(1, planeSize))
+    blockMins = []
+    blockMaxs = []
+    for start in range(0, data.shape[0], step):
+        view = reductionFn(data[start:start + step])
+        blockMins.append(np.min(view))
+        blockMaxs.append(np.max(view))
+    return min(blockMins), max(blockMaxs)
+
+
+def EstimateViewMinMax(data, reductionFn, numSlices=16):
+    """ (min, max) of reductionFn over numSlices slices evenly spaced along the
+    slice axis of data (axis of a SliceProvider, otherwise the first), so
+    that only those slices are read from disk
+
+    """
+    if np.ndim(data) < 2:
+        return ComputeViewMinMax(data[...], reductionFn)
+    axis = getattr(data, 'axis', 0)
+    sliceIndices = np.unique(np.linspace(0, data.shape[axis] - 1, numSlices).astype(int))
+    blockMins = []
+    blockMaxs = []
+    for sliceIndex in sliceIndices:
+        view = reductionFn(np.asarray(data[(slice(None),) * axis + (int(sliceIndex),)]))
+        blockMins.append(np.min(view))
+        blockMaxs.append(np.max(view))
+    return min(blockMins), max(blockMaxs)
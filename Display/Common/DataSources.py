@@ -0,0 +1,91 @@
+"""
+Code made available for the ISMRM 2015 Sunrise Educational Course
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+__all__ = ["SliceProvider", "IsInMemory"]
+
+import numpy as np
+
+
+class SliceProvider(object):
+    ''' Read-only array-like view of data that is produced one slice at a
+    time by a function, e.g. a reader of a large reconstruction on disk.
+
+    Indexing calls getSliceFn only for the slices it needs: an integer index
+    along axis reads one slice, other indices read and stack every slice in
+    their range. Like np.memmap arrays, h5py datasets and
+    IsmrmSunrise.LazyMatArray, it can be shown with ShowImage2D/ShowImage3D
+    without reading the whole data into memory.
+    '''
+    def __init__(self, getSliceFn, shape, dtype=np.complex64, axis=-1):
+        ''' SliceProvider constructor
+
+        Parameters
+        ----------
+        getSliceFn : function
+            given a slice index, returns the slice as an array of the
+            dimensions other than axis
+        shape : tuple of int
+            shape of the whole data
+        dtype : numpy dtype
+            type of the slices
+        axis : int
+            dimension the slices are taken along
+        '''
+        self.getSliceFn = getSliceFn
+        self.shape = tuple(int(extent) for extent in shape)
+        self.ndim = len(self.shape)
+        self.size = int(np.prod(self.shape))
+        self.dtype = np.dtype(dtype)
+        self.axis = axis % self.ndim
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, index):
+        index = ExpandIndex(index, self.ndim)
+        axisIndex = index[self.axis]
+        otherIndex = index[0:self.axis] + index[self.axis + 1:]
+
+        if isinstance(axisIndex, (int, np.integer)):
+            return np.asarray(self.getSliceFn(int(axisIndex) % self.shape[self.axis]))[otherIndex]
+
+        if isinstance(axisIndex, slice):
+            sliceIndices = range(*axisIndex.indices(self.shape[self.axis]))
+        else:
+            sliceIndices = np.arange(self.shape[self.axis])[axisIndex]
+        slices = [np.asarray(self.getSliceFn(int(sliceIndex)))[otherIndex] for sliceIndex in sliceIndices]
+        # integer indices before axis remove dimensions from the result
+        outputAxis = sum(1 for elem in index[0:self.axis] if not isinstance(elem, (int, np.integer)))
+        if not slices:
+            return np.empty((0,), dtype=self.dtype)
+        return np.stack(slices, axis=outputAxis)
+
+    def __array__(self, dtype=None):
+        data = self[...]
+        if dtype is not None:
+            data = data.astype(dtype)
+        return data
+
+
+def ExpandIndex(index, ndim):
+    ''' index as a tuple with an entry for each of ndim dimensions
+    '''
+    if not isinstance(index, tuple):
+        index = (index,)
+    if any(elem is Ellipsis for elem in index):
+        ellipsisIndex = [elem is Ellipsis for elem in index].index(True)
+        numMissing = ndim - (len(index) - 1)
+        index = index[0:ellipsisIndex] + (slice(None),) * numMissing + index[ellipsisIndex + 1:]
+    return index + (slice(None),) * (ndim - len(index))
+
+
+def IsInMemory(data):
+    ''' True for numpy arrays held in memory, False for memory-mapped arrays
+    and other array-likes that read from disk (h5py datasets, SliceProvider, ...)
+    '''
+    return isinstance(data, np.ndarray) and not isinstance(data, np.memmap)
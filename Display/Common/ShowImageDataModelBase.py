@@ -13,13 +13,15 @@ Philip J. Beatty (philip.beatty@gmail.com)
 """
 __all__ = ["ShowImageCommonDataState", "ShowImageDataModel"]
 import numpy as np
-import pandas as pd
 import matplotlib.cm as colormaps
 from IPython.display import display
 
 from qtpy import QtCore
 from . import DataModelBase
 from . import DisplayCore
+from . import ViewDefinitions
+from .SliceStore import SliceCache
+from .DataSources import SliceProvider
 
 class ShowImageCommonDataState(DataModelBase.CommonDataState):
     ''' Stores values common across all data series
@@ -32,21 +34,16 @@ class ShowImageCommonDataState(DataModelBase.CommonDataState):
             super(ShowImageCommonDataState, self).__init__(dimShape)
 
             def AddToViewsTable(viewsTable):
-                # Set Name as index, but also leave as data column
                 # Add data columns
-                viewsTable['Window'] = -1.0
-                viewsTable['Level'] = 0.0
-                viewsTable['EnableWindowLevelChange'] = True
-                viewsTable['Colormap'] = colormaps.Greys_r
-
-                viewsTable.at['Phase', 'Colormap'] = colormaps.hsv
-                viewsTable.at['Phase', 'Window'] = 2.0 * np.pi
-                viewsTable.at['Phase', 'EnableWindowLevelChange'] = False
-                
+                views = ViewDefinitions.VIEWS
+                for label in ['Window', 'Level', 'EnableWindowLevelChange', 'Downsample']:
+                    viewsTable.SetColumn(label, [view[label] for view in views])
+                viewsTable.SetColumn('Colormap', [getattr(colormaps, view['Colormap']) for view in views])
+
                 return viewsTable
 
             #
-            # viewsTable is a data frame, where each row completely
+            # viewsTable is a StateTable, where each row completely
             # describes the settings for each type of view of the
             # (complex) data.  I am trying to make it so that the
             # viewer code does not need domain knowledge of how
@@ -70,6 +67,9 @@ class ShowImageDataModel(DataModelBase.DataModel):
         ----------
 
         complexDataList : list of N-D arrays
+            numpy arrays, or array-likes that read from disk when indexed
+            (np.memmap, h5py datasets, IsmrmSunrise.LazyMatArray,
+            Common.SliceProvider), of which only the displayed planes are read
         """
 
         try:
@@ -78,12 +78,61 @@ class ShowImageDataModel(DataModelBase.DataModel):
             super(ShowImageDataModel, self).__init__(numImages, titles)
 
 
-            self.dataTable['Data'] = complexDataList
+            self.dataTable.SetColumn('Data', list(complexDataList))
+            self.sliceCache = SliceCache()
             self.commonState = ShowImageCommonDataState(complexDataList[0].shape)
             self.SetMinMaxVisibleViewValues()
+            self.StartViewMinMaxPrecompute()
 
         except Exception as err:
             DisplayCore.HandleException(err)
 
+    def SetDataTableValue(self, index, label, value):
+        super(ShowImageDataModel, self).SetDataTableValue(index, label, value)
+        if label == 'Data':
+            self.sliceCache.Clear()
+
+    def Close(self):
+        """ Stops prefetching and releases the cached planes, when the window
+        showing the data is closed
+
+        """
+        self.sliceCache.Close()
+
+    def GetCurrDataPlane(self, datasetIndex, axis):
+        """ Current view of the plane of a dataset through the current location
+        along axis. Planes are kept in sliceCache, and the neighbouring planes
+        are prefetched on its worker thread, so that scrolling does not
+        recompute the view of planes already seen
+
+        """
+        viewIndex = self.commonState.currViewIndex
+        index = self.GetDimValue(axis, 'CurrLocation')
+        plane = self.sliceCache.Get((datasetIndex, viewIndex, axis, index),
+                                    lambda: self.ComputeDataPlane(datasetIndex, viewIndex, axis, index))
+
+        # planes across the slices of a SliceProvider read every slice, so only
+        # its own slices are prefetched
+        data = self.dataTable.GetValue(datasetIndex, 'Data')
+        prefetchDepth = self.sliceCache.prefetchDepth
+        if isinstance(data, SliceProvider) and data.axis != axis:
+            prefetchDepth = 0
+
+        numPlanes = self.GetDimValue(axis, 'Shape')
+        requests = []
+        for step in range(1, prefetchDepth + 1):
+            for neighbour in [index + step, index - step]:
+                if 0 <= neighbour < numPlanes:
+                    requests.append(((datasetIndex, viewIndex, axis, neighbour),
+                                     lambda neighbour=neighbour: self.ComputeDataPlane(datasetIndex, viewIndex, axis, neighbour)))
+        self.sliceCache.Prefetch((datasetIndex, viewIndex, axis), requests)
+        return plane
+
+    def ComputeDataPlane(self, datasetIndex, viewIndex, axis, index):
+        rFn = self.commonState.viewsTable.GetValue(viewIndex, 'ReductionFn')
+        data = self.dataTable.GetValue(datasetIndex, 'Data')
+        # reads only this plane of memory-mapped, HDF5 or SliceProvider data
+        return rFn(np.asarray(data[(slice(None),) * axis + (index,)]))
+
 
                     
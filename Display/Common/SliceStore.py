@@ -0,0 +1,153 @@
+"""
+Code made available for the ISMRM 2015 Sunrise Educational Course
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+__all__ = ["SliceCache"]
+
+import threading
+from collections import OrderedDict
+
+from . import DisplayCore
+
+
+class SliceCache(object):
+    ''' Least recently used cache of reduced (magnitude, phase, ...) image planes,
+    bounded by the number of bytes they use, with a worker thread that computes
+    planes ahead of use (e.g. the neighbours of the current slice).
+    '''
+    def __init__(self, maxBytes=256 * 2**20, prefetchDepth=2):
+        ''' SliceCache constructor
+
+        Parameters
+        ----------
+        maxBytes : int
+            memory budget of the cached planes. The least recently used planes
+            are dropped when it is exceeded
+        prefetchDepth : int
+            number of planes on each side of the current plane to prefetch
+        '''
+        self.maxBytes = maxBytes
+        self.prefetchDepth = prefetchDepth
+        self.numBytes = 0
+        self.planes = OrderedDict()
+        # incremented by Clear, so that planes computed from replaced data are not cached
+        self.generation = 0
+        self.lock = threading.Lock()
+
+        # group -> (list of (key, computeFn) still to prefetch, readyFn), oldest group first
+        self.pending = OrderedDict()
+        self.pendingChanged = threading.Condition(self.lock)
+        self.worker = None
+        # set by Close, stops the worker thread
+        self.closed = False
+
+    def __len__(self):
+        return len(self.planes)
+
+    def Get(self, key, computeFn):
+        ''' Cached plane for key, computed with computeFn() and cached if missing
+        '''
+        with self.lock:
+            plane = self.planes.get(key)
+            if plane is not None:
+                self.planes.move_to_end(key)
+                return plane
+            generation = self.generation
+        plane = computeFn()
+        self.Put(key, plane, generation)
+        return plane
+
+    def Peek(self, key):
+        ''' Cached plane for key, or None if it is not cached
+        '''
+        with self.lock:
+            plane = self.planes.get(key)
+            if plane is not None:
+                self.planes.move_to_end(key)
+            return plane
+
+    def Put(self, key, plane, generation=None):
+        with self.lock:
+            if self.closed or key in self.planes or generation not in (None, self.generation):
+                return
+            self.planes[key] = plane
+            self.numBytes += plane.nbytes
+            # always keep the newest plane, even if it alone exceeds the budget
+            while self.numBytes > self.maxBytes and len(self.planes) > 1:
+                oldKey, oldPlane = self.planes.popitem(last=False)
+                self.numBytes -= oldPlane.nbytes
+
+    def Prefetch(self, group, requests, readyFn=None):
+        ''' Queues planes to be computed on the worker thread
+
+        Parameters
+        ----------
+        group : hashable
+            requests replace those queued earlier for the same group, e.g. the
+            neighbours of the previous slice of the same dataset and axis
+        requests : list of (key, computeFn)
+            in order of priority
+        readyFn : function
+            if given, called with the key on the worker thread once each
+            requested plane is cached, e.g. to emit a queued Qt signal. Groups
+            with a readyFn are computed before the other groups
+        '''
+        with self.lock:
+            if self.closed:
+                return
+            self.pending.pop(group, None)
+            requests = [(key, computeFn) for key, computeFn in requests if key not in self.planes]
+            if requests:
+                self.pending[group] = (requests, readyFn)
+                if readyFn is not None:
+                    self.pending.move_to_end(group, last=False)
+                self.pendingChanged.notify()
+            if self.worker is None:
+                self.worker = threading.Thread(target=self.RunPrefetch, name='SlicePrefetch')
+                self.worker.daemon = True
+                self.worker.start()
+
+    def RunPrefetch(self):
+        while True:
+            with self.lock:
+                while not self.pending and not self.closed:
+                    self.pendingChanged.wait()
+                if self.closed:
+                    return
+                group, (requests, readyFn) = next(iter(self.pending.items()))
+                key, computeFn = requests.pop(0)
+                if not requests:
+                    del self.pending[group]
+                isCached = key in self.planes
+                generation = self.generation
+            try:
+                if not isCached:
+                    self.Put(key, computeFn(), generation)
+                if readyFn is not None:
+                    readyFn(key)
+            except Exception as err:
+                DisplayCore.HandleException(err)
+
+    def Clear(self):
+        with self.lock:
+            self.pending.clear()
+            self.planes.clear()
+            self.numBytes = 0
+            self.generation += 1
+
+    def Close(self):
+        ''' Stops the worker thread and releases the cached planes. Planes are
+        no longer cached or prefetched afterwards, Get still computes them
+        '''
+        with self.lock:
+            self.closed = True
+            self.pending.clear()
+            self.planes.clear()
+            self.numBytes = 0
+            self.generation += 1
+            # the worker exits when it wakes up, or after the plane it is computing
+            self.pendingChanged.notify_all()
@@ -0,0 +1,77 @@
+"""
+Code made available for the ISMRM 2015 Sunrise Educational Course
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+__all__ = ["StateTable"]
+
+
+class StateTable(object):
+    ''' Small table of labelled values, one row per dimension, view or dataset.
+
+    Replaces the pandas DataFrames of the data models: each row is a dict, so a
+    value is a single dict lookup (pandas scalar access costs microseconds, on
+    every mouse move) and a row can be handed to the panels as a description
+    that supports row.get(label, default).
+    '''
+    __slots__ = ['rows', 'rowIndices']
+
+    def __init__(self, columns=None, rowNames=None):
+        ''' StateTable constructor
+
+        Parameters
+        ----------
+        columns : dict
+            label -> list of values, one per row
+        rowNames : list of str
+            optional names of the rows, for GetRowIndex
+        '''
+        columns = columns if columns is not None else {}
+        numRows = len(next(iter(columns.values()))) if columns else len(rowNames or [])
+        self.rows = [{} for index in range(numRows)]
+        for label, values in columns.items():
+            self.SetColumn(label, values)
+        self.rowIndices = dict((name, index) for index, name in enumerate(rowNames or []))
+
+    @classmethod
+    def FromRows(cls, rows, rowNames=None):
+        ''' StateTable from a list of dicts, one per row
+        '''
+        table = cls(rowNames=rowNames)
+        table.rows = [dict(row) for row in rows]
+        return table
+
+    @classmethod
+    def FromDataFrame(cls, dataFrame):
+        return cls(dict((label, list(dataFrame[label])) for label in dataFrame.columns))
+
+    def __len__(self):
+        return len(self.rows)
+
+    def GetRowIndex(self, name):
+        return self.rowIndices[name]
+
+    def GetRow(self, index):
+        return self.rows[index]
+
+    def GetValue(self, index, label):
+        return self.rows[index][label]
+
+    def SetValue(self, index, label, value):
+        self.rows[index][label] = value
+
+    def GetColumn(self, label):
+        return [row[label] for row in self.rows]
+
+    def SetColumn(self, label, values):
+        if len(values) != len(self.rows):
+            raise RuntimeError('Column {} has {} values for {} rows'.format(label, len(values), len(self.rows)))
+        for row, value in zip(self.rows, values):
+            row[label] = value
+
+    def FillColumn(self, label, value):
+        for row in self.rows:
+            row[label] = value
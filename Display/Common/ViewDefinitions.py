@@ -0,0 +1,81 @@
+"""
+Code made available for the ISMRM 2015 Sunrise Educational Course
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+__all__ = ["VIEWS", "GetView", "GetDisplayLimits"]
+
+import numpy as np
+
+#
+# Each entry completely describes how one type of view of the (complex)
+# data is displayed, so that the viewers (Qt or headless) do not need
+# domain knowledge of the views. The order matches ImageType.
+# Downsample is how coarser resolution levels of the view are computed.
+# Only needs numpy, so that it can be used without Qt.
+#
+VIEWS = [
+    {'Name': 'Magnitude',
+     'ReductionFn': lambda x: np.abs(x),
+     'MaxMin': 0.0,
+     'MinMax': -1000.0,
+     'Window': -1.0,
+     'Level': 0.0,
+     'EnableWindowLevelChange': True,
+     'Colormap': 'Greys_r',
+     'Downsample': 'Mean'},
+    {'Name': 'Phase',
+     'ReductionFn': lambda x: np.angle(x),
+     'MaxMin': -3.1416,
+     'MinMax': 3.1416,
+     'Window': 2.0 * np.pi,
+     'Level': 0.0,
+     'EnableWindowLevelChange': False,
+     'Colormap': 'hsv',
+     # averaging wraps at +/-pi, so coarser levels take every other sample
+     'Downsample': 'Decimate'},
+    #N.B. cannot use np.real(x) because it has different behavior
+    # in scalar case. It returns a size 1 array instead of a scaler
+    {'Name': 'Real',
+     'ReductionFn': lambda x: x.real,
+     'MaxMin': 1000.0, # cannot have a larger min than this
+     'MinMax': -1000.0, # cannot have a smaller max than this
+     'Window': -1.0,
+     'Level': 0.0,
+     'EnableWindowLevelChange': True,
+     'Colormap': 'Greys_r',
+     'Downsample': 'Mean'},
+    {'Name': 'Imaginary',
+     'ReductionFn': lambda x: x.imag,
+     'MaxMin': 1000.0,
+     'MinMax': -1000.0,
+     'Window': -1.0,
+     'Level': 0.0,
+     'EnableWindowLevelChange': True,
+     'Colormap': 'Greys_r',
+     'Downsample': 'Mean'},
+]
+
+
+def GetView(view):
+    ''' View description from its index (ImageType) or name
+    '''
+    if isinstance(view, str):
+        for description in VIEWS:
+            if description['Name'] == view:
+                return description
+        raise ValueError('Unknown view: {}'.format(view))
+    return VIEWS[view]
+
+
+def GetDisplayLimits(imageData, window, level):
+    ''' Intensities shown at the bottom and top of the colormap, as in
+    ImagePanel.SetWindowLevel: level -/+ half the window, or the range of
+    imageData if window is negative (the default window/level)
+    '''
+    if window >= 0:
+        return level - 0.5 * window, level + 0.5 * window
+    return np.min(imageData), np.max(imageData)
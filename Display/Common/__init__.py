@@ -12,20 +12,39 @@ Philip J. Beatty (philip.beatty@gmail.com)
 2017, modified by Philip Beatty
 """
 
-try:
-    from .DisplayCore import *
-    from .Controller import *
-    from .DataModelBase import *
-    from .ShowImageDataModelBase import *
-    
-    darkBackgroundColor = '#31363B'
-    lightTextColor = '#A19F9F'
-
-    class ImageType:
-        mag, phase, real, imag = range(4)
-
-
-
-        
-except Exception as err:
-    print("Exception in Common/__init__: {}".format(err))
+import importlib
+
+# submodule -> public names. Most of the submodules import Qt, matplotlib and IPython,
+# so they are imported on first use of one of their names (PEP 562).
+# Controller is both a submodule and a class; use the class through Common.Controller
+# rather than importing the submodule directly, which would bind the module instead.
+SUBMODULE_EXPORTS = {
+    "DisplayCore": ["MainWindow", "HandleException", "MakeColors"],
+    "Controller": ["Controller"],
+    "DataModelBase": ["CommonDataState", "DataModel"],
+    "ShowImageDataModelBase": ["ShowImageCommonDataState", "ShowImageDataModel"],
+    "ViewDefinitions": [],
+    "StateStore": ["StateTable"],
+    "SliceStore": ["SliceCache"],
+    "DataSources": ["SliceProvider", "IsInMemory"],
+}
+
+EXPORT_MODULES = dict((name, moduleName) for moduleName, names in SUBMODULE_EXPORTS.items() for name in names)
+
+darkBackgroundColor = '#31363B'
+lightTextColor = '#A19F9F'
+
+class ImageType:
+    mag, phase, real, imag = range(4)
+
+
+def __getattr__(name):
+    moduleName = EXPORT_MODULES.get(name)
+    if moduleName is not None:
+        value = getattr(importlib.import_module('.' + moduleName, __name__), name)
+    elif name in SUBMODULE_EXPORTS:
+        value = importlib.import_module('.' + name, __name__)
+    else:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    globals()[name] = value
+    return value
@@ -44,7 +44,7 @@ class LocationBox(QtWidgets.QFrame):
             self.dimLabels = []
             self.dimLocations = []
             
-            for dimIndex in commonState.dimsTable.index:
+            for dimIndex in range(commonState.GetNumDims()):
 
                 dimName = commonState.GetDimValue(dimIndex, 'Name')
                 dimExtent = commonState.GetDimValue(dimIndex,'Shape')
@@ -74,5 +74,5 @@ class LocationBox(QtWidgets.QFrame):
             self.controller.signalChangeSingleDimLocation.emit(dimIndex, index)
 
     def Sync(self):
-        for dimIndex in self.commonState.dimsTable.index:
+        for dimIndex in range(self.commonState.GetNumDims()):
             self.dimLocations[dimIndex].setValue(self.commonState.GetDimValue(dimIndex, 'CurrLocation'))
@@ -29,8 +29,8 @@ class ViewBox(QtWidgets.QComboBox):
             self.commonState = commonState
             
 
-            for viewIndex in self.commonState.viewsTable.index:
-                self.addItem(self.commonState.viewsTable.loc[viewIndex, 'Name'])
+            for viewIndex in range(len(self.commonState.viewsTable)):
+                self.addItem(self.commonState.viewsTable.GetValue(viewIndex, 'Name'))
 
 
                 
@@ -0,0 +1,277 @@
+"""
+Renders the ShowImage2D and ShowImage3D layouts to RGB arrays and PNG files
+without Qt, e.g. for writing QA images on compute nodes. Only numpy is
+required; matplotlib (without pyplot) is used for colormaps if it is installed.
+
+Code made available for the ISMRM 2015 Sunrise Educational Course
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+__all__ = ["RenderImage2D", "RenderImage3D", "SaveImage2D", "SaveImage3D", "SaveSliceImages", "WritePng"]
+
+import struct
+import zlib
+
+import numpy as np
+
+from . import Common
+from .Common import ViewDefinitions
+
+
+def RenderImage2D(data,
+                  imageType=Common.ImageType.mag,
+                  window=None,
+                  level=None,
+                  colormap=None,
+                  origin='lower',
+                  maxNumInRow=None,
+                  zoom=1):
+    """ Renders 2D images as a mosaic, laid out as in ShowImage2D
+
+    Parameters
+    ----------
+    data : list of 2D arrays, or a 2D or 3D array (images along the last dimension)
+    imageType : Common.ImageType or view name
+        view of the complex data: magnitude, phase, real or imaginary
+    window, level : float
+        intensity window and level. default is the view default: the range of each
+        image, or [-pi, pi] for phase. A negative window also selects the range of each image
+    colormap : str, matplotlib colormap or (N, 3) array
+        default is the view colormap
+    origin : 'lower' or 'upper'
+        position of the first sample of the second dimension, as in imshow
+    maxNumInRow : int
+        images per row of the mosaic. default is ceil(sqrt(number of images))
+    zoom : int
+        nearest-neighbour magnification of each image
+
+    Returns
+    -------
+    mosaic : (height, width, 3) uint8 array
+    """
+    images = ImageList(data)
+    view = ViewDefinitions.GetView(imageType)
+    lut = CreateColormapLut(colormap if colormap is not None else view['Colormap'])
+    window, level = DefaultWindowLevel(view, window, level)
+
+    tiles = [RenderTile(view['ReductionFn'](image), window, level, lut, origin, zoom) for image in images]
+    if maxNumInRow is None:
+        maxNumInRow = int(np.ceil(np.sqrt(len(tiles))))
+    return AssembleMosaic([tiles[index:index + maxNumInRow] for index in range(0, len(tiles), maxNumInRow)])
+
+
+def RenderImage3D(data,
+                  location=None,
+                  imageType=Common.ImageType.mag,
+                  window=None,
+                  level=None,
+                  colormap=None,
+                  origin='lower',
+                  zoom=1):
+    """ Renders orthogonal planes of 3D images, laid out as in ShowImage3D: one row
+    per image, with columns XY, YZ and ZX through location
+
+    Parameters
+    ----------
+    data : list of 3D arrays of equal shape, or a 3D array
+    location : [x, y, z]
+        sample the planes pass through. default is the centre of the volume
+    imageType, window, level, colormap, origin, zoom :
+        as for RenderImage2D
+
+    Returns
+    -------
+    mosaic : (height, width, 3) uint8 array
+    """
+    if isinstance(data, np.ndarray):
+        data = [data]
+    view = ViewDefinitions.GetView(imageType)
+    lut = CreateColormapLut(colormap if colormap is not None else view['Colormap'])
+    window, level = DefaultWindowLevel(view, window, level)
+    if location is None:
+        location = (np.array(data[0].shape) * 0.5).astype(int)
+
+    rows = []
+    for volume in data:
+        planes = [volume[:, :, location[2]], volume[location[0], :, :], np.transpose(volume[:, location[1], :])]
+        rows.append([RenderTile(view['ReductionFn'](plane), window, level, lut, origin, zoom) for plane in planes])
+    return AssembleMosaic(rows)
+
+
+def SaveImage2D(data, fileName, compressionLevel=1, **kwargs):
+    """ Writes the RenderImage2D mosaic of data to a PNG file. kwargs are passed to RenderImage2D
+    """
+    return WritePng(fileName, RenderImage2D(data, **kwargs), compressionLevel)
+
+
+def SaveImage3D(data, fileName, compressionLevel=1, **kwargs):
+    """ Writes the RenderImage3D mosaic of data to a PNG file. kwargs are passed to RenderImage3D
+    """
+    return WritePng(fileName, RenderImage3D(data, **kwargs), compressionLevel)
+
+
+def SaveSliceImages(volume,
+                    fileNamePattern,
+                    axis=2,
+                    imageType=Common.ImageType.mag,
+                    window=None,
+                    level=None,
+                    colormap=None,
+                    origin='lower',
+                    zoom=1,
+                    compressionLevel=1):
+    """ Writes every slice of a volume to its own PNG file, e.g. for thumbnails
+
+    The view is computed once for the whole volume, and the default window/level is
+    the range of the volume rather than of each slice, so that slices are comparable.
+
+    Parameters
+    ----------
+    volume : 3D array
+    fileNamePattern : str
+        formatted with the slice index, e.g. 'qa/slice{:03d}.png'
+    axis : int
+        dimension to slice along. The slices keep the order of the other two dimensions
+    imageType, window, level, colormap, origin, zoom :
+        as for RenderImage2D
+    compressionLevel : int
+        zlib compression level, 0 (fastest) to 9 (smallest)
+
+    Returns
+    -------
+    fileNames : list of str
+    """
+    view = ViewDefinitions.GetView(imageType)
+    lut = CreateColormapLut(colormap if colormap is not None else view['Colormap'])
+    window, level = DefaultWindowLevel(view, window, level)
+    if np.all(lut == lut[:, 0:1]):
+        # grey PNGs are a third of the size to compress
+        lut = lut[:, 0]
+    reduced = view['ReductionFn'](np.asarray(volume))
+    if window < 0:
+        minVal, maxVal = ViewDefinitions.GetDisplayLimits(reduced, window, level)
+        window, level = maxVal - minVal, 0.5 * (minVal + maxVal)
+
+    fileNames = []
+    for index in range(reduced.shape[axis]):
+        tile = RenderTile(np.take(reduced, index, axis), window, level, lut, origin, zoom)
+        fileNames.append(WritePng(fileNamePattern.format(index), tile, compressionLevel))
+    return fileNames
+
+
+def WritePng(fileName, image, compressionLevel=1):
+    """ Writes a uint8 image, (height, width) grey or (height, width, 3 or 4) RGB(A),
+    to a PNG file. Returns fileName.
+    """
+    image = np.ascontiguousarray(image, dtype=np.uint8)
+    height, width = image.shape[0:2]
+    numChannels = 1 if image.ndim == 2 else image.shape[2]
+    colorType = {1: 0, 3: 2, 4: 6}[numChannels]
+
+    # each row starts with its filter type, 0 (none)
+    rows = np.zeros((height, 1 + width * numChannels), dtype=np.uint8)
+    rows[:, 1:] = image.reshape(height, width * numChannels)
+
+    def Chunk(chunkType, content):
+        return struct.pack('>I', len(content)) + chunkType + content + struct.pack('>I', zlib.crc32(chunkType + content) & 0xffffffff)
+
+    with open(fileName, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n')
+        f.write(Chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, colorType, 0, 0, 0)))
+        f.write(Chunk(b'IDAT', zlib.compress(rows.tobytes(), compressionLevel)))
+        f.write(Chunk(b'IEND', b''))
+    return fileName
+
+
+def ImageList(data):
+    """ List of 2D images, as accepted by ShowImage2D. Images along the last dimension
+    of a 3D array are views, not copies."""
+    if isinstance(data, np.ndarray):
+        if data.ndim == 2:
+            return [data]
+        if data.ndim == 3:
+            return [data[:, :, index] for index in range(data.shape[2])]
+    if not isinstance(data, list):
+        raise RuntimeError('data must be a list: {}'.format(type(data)))
+    return data
+
+
+def DefaultWindowLevel(view, window, level):
+    if window is None:
+        window = view['Window']
+        if level is None:
+            level = view['Level']
+    if level is None:
+        level = 0.0
+    return window, level
+
+
+def RenderTile(imageData, window, level, lut, origin='lower', zoom=1):
+    """ Maps a real 2D image through the colormap lut to an RGB image, oriented as
+    ImagePanel shows it: first dimension horizontal, second vertical"""
+    vmin, vmax = ViewDefinitions.GetDisplayLimits(imageData, window, level)
+    numColors = lut.shape[0]
+    scale = numColors / (vmax - vmin) if vmax > vmin else 0.0
+
+    # same binning as a matplotlib colormap with numColors entries
+    scaled = np.subtract(imageData, vmin, dtype=np.float32)
+    scaled *= scale
+    np.clip(scaled, 0, numColors - 1, out=scaled)
+    np.nan_to_num(scaled, copy=False)
+    indices = scaled.astype(np.uint8 if numColors <= 256 else np.intp).T
+    if origin == 'lower':
+        indices = indices[::-1]
+    if zoom > 1:
+        indices = np.repeat(np.repeat(indices, zoom, axis=0), zoom, axis=1)
+    return lut[indices]
+
+
+def AssembleMosaic(rows, spacing=1):
+    """ Places rows of RGB tiles on a background of Common.darkBackgroundColor. Each
+    column is as wide as its widest tile and each row as high as its highest tile"""
+    background = np.array([int(Common.darkBackgroundColor[index:index + 2], 16) for index in (1, 3, 5)], dtype=np.uint8)
+    numColumns = max(len(row) for row in rows)
+    columnWidths = [max(row[col].shape[1] for row in rows if col < len(row)) for col in range(numColumns)]
+    rowHeights = [max(tile.shape[0] for tile in row) for row in rows]
+
+    mosaic = np.empty((sum(rowHeights) + spacing * (len(rows) - 1), sum(columnWidths) + spacing * (numColumns - 1), 3), dtype=np.uint8)
+    mosaic[:] = background
+    top = 0
+    for row, rowHeight in zip(rows, rowHeights):
+        left = 0
+        for tile, columnWidth in zip(row, columnWidths):
+            mosaic[top:top + tile.shape[0], left:left + tile.shape[1]] = tile
+            left += columnWidth + spacing
+        top += rowHeight + spacing
+    return mosaic
+
+
+def CreateColormapLut(colormap, numColors=256):
+    """ (numColors, 3) uint8 lookup table (RGB) for a colormap name, matplotlib colormap or
+    array of RGB values in [0, 1]. Without matplotlib, only 'Greys_r'/'gray' and 'hsv' are available."""
+    if isinstance(colormap, np.ndarray):
+        return np.round(np.clip(colormap[:, 0:3], 0, 1) * 255).astype(np.uint8)
+    if isinstance(colormap, str):
+        try:
+            import matplotlib.cm as colormaps
+            colormap = getattr(colormaps, colormap)
+        except ImportError:
+            return CreateBuiltInLut(colormap, numColors)
+    # centres of the bins, so that entry k is the colour matplotlib uses for bin k
+    return np.round(colormap((np.arange(numColors) + 0.5) / numColors)[:, 0:3] * 255).astype(np.uint8)
+
+
+def CreateBuiltInLut(name, numColors=256):
+    x = np.linspace(0, 1, numColors)
+    if name in ('Greys_r', 'gray', 'grey'):
+        # linear, where matplotlib's Greys_r follows the ColorBrewer greys
+        rgb = np.stack([x, x, x], axis=1)
+    elif name == 'hsv':
+        # full saturation and value hue sweep, close to matplotlib's hsv
+        rgb = np.clip(np.abs(np.mod(6 * x[:, np.newaxis] + [0, 4, 2], 6) - 3) - 1, 0, 1)
+    else:
+        raise ValueError('colormap {} requires matplotlib'.format(name))
+    return np.round(rgb * 255).astype(np.uint8)
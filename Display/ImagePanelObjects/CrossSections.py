@@ -42,7 +42,7 @@ class CrossSections(QtWidgets.QFrame):
 
         controller : requires VisibleChanged, LocationChanged, ViewChanged, NavModeChanged, signalChangeSingleDimLocation
 
-        dataModel : pandas based data model
+        dataModel : data model
 
         '''
         try:
@@ -73,7 +73,7 @@ class CrossSections(QtWidgets.QFrame):
             self.markerFnList = []
             self.crossSection = []
 
-            self.currLocation = dataModel.commonState.dimsTable['CurrLocation'].copy()
+            self.currLocation = dataModel.commonState.dimsTable.GetColumn('CurrLocation')
             self.layout = QtWidgets.QVBoxLayout(self)
             self.layout.setContentsMargins(0,0,0,0)
             self.layout.setSpacing(3)
@@ -99,7 +99,7 @@ class CrossSections(QtWidgets.QFrame):
                 crossSection = PlotPanel.PlotPanel(self.dataFnList[dimIndex],
                                                    self.locationFnList[dimIndex],
                                                    self.markerFnList[dimIndex],
-                                                   dataModel.commonState.dimsTable.iloc[dimIndex],
+                                                   dataModel.commonState.dimsTable.GetRow(dimIndex),
                                                    numLines, colorFn, visibleFn, yLimits)
                 
                 crossSection.signalHoverOnLine.connect(lambda lineIndex, sampleIndex, dimIndex=dimIndex : self.controller.signalChangeSingleDimLocation.emit(dimIndex, sampleIndex))
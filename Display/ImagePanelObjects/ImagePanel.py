@@ -34,6 +34,7 @@ class ImagePanel(FigureCanvas):
     signalChangeLocation = QtCore.Signal(int, int)
     signalChangeWindowLevel = QtCore.Signal(float, float)
     signalScroll = QtCore.Signal(int)
+    signalZoomChanged = QtCore.Signal()
     def __init__(self,
                  dim0Description,
                  dim1Description,
@@ -44,15 +45,15 @@ class ImagePanel(FigureCanvas):
         Parameters
         ----------
 
-        dim0Description : pandas Series containing Name, Shape, CurrLocation, Color 
+        dim0Description : dict containing Name, Shape, CurrLocation, Color 
 
-        dim1Description : pandas Series containing Name, Shape, CurrLocation, Color 
+        dim1Description : dict containing Name, Shape, CurrLocation, Color 
 
-        currView : pandas Series containing 
+        currView : dict containing 
                    Window, Level, EnableWindowLevelChange, Colormap, Interpolation, Origin
         imageData : numpy 2D array of floats. The data to display
 
-        imageDescription : pandas Series containing Title, Color, Index
+        imageDescription : dict containing Title, Color, Index
 
         '''
 
@@ -72,10 +73,18 @@ class ImagePanel(FigureCanvas):
             self.mpl_connect('button_press_event', self.PressEvent)
             self.mpl_connect('button_release_event', self.ReleaseEvent)
             self.mpl_connect('scroll_event', self.ScrollEvent)
+            self.mpl_connect('draw_event', self.DrawEvent)
             self.leftMousePress = False
             self.middleMousePress = False
             self.rightMousePress = False
 
+            #
+            # Blitting: the rendered image (background) is kept and only the
+            # cursor lines are redrawn on it, unless the image has changed
+            #
+            self.background = None
+            self.imageChanged = True
+
             #
             # Internal data model initialization
             #
@@ -86,6 +95,9 @@ class ImagePanel(FigureCanvas):
                 raise RuntimeError('Dimension 1 shape mismatch: imageData [{}], dim0Description [{}]'.format(imageData.shape[1], dim1Description.get('Shape', 0)))
   
             self.imageData = imageData  
+            # shape of the full resolution data, in whose coordinates locations are
+            # given. imageData may be a coarser (pyramid) level of it
+            self.dataShape = imageData.shape
             
 
             # Set location as CurrLocation
@@ -93,7 +105,7 @@ class ImagePanel(FigureCanvas):
             # Then, restrict location to be an integer in the range [0, Shape)
             self.location = np.array((dim0Description.get('CurrLocation', dim0Description.get('Shape',0)*0.5),
                              dim1Description.get('CurrLocation', dim1Description.get('Shape',0)*0.5)))
-            self.location = np.minimum(np.maximum(self.location, [0,0]), np.subtract(self.imageData.shape, 1)).astype(int)
+            self.location = np.minimum(np.maximum(self.location, [0,0]), np.subtract(self.dataShape, 1)).astype(int)
             
             #image
             #self.fig.subplots_adjust(bottom=0.1,left=0.1)
@@ -122,7 +134,8 @@ class ImagePanel(FigureCanvas):
                 spine.set_linewidth(0)
 
             #self.axes.hold(False) # hold is deprecated an removing it doesn't seem to do anything...
-            self.img = self.axes.imshow(np.zeros(self.imageData.shape).T, 
+            # the extent stays that of the full resolution data
+            self.img = self.axes.imshow(np.zeros(self.dataShape).T, 
                                         interpolation=currView.get('Interpolation', 'bicubic'), 
                                         origin=currView.get('Origin', 'lower'))
             self.SetImageData(imageData)
@@ -134,11 +147,12 @@ class ImagePanel(FigureCanvas):
 
             
 
-            #cursor lines
-            self.hline=self.axes.axhline(y=self.location[1], linewidth=1, linestyle='dashed', dashes=(2,2), color=dim0Description.get('Color', '#000000'))
-            self.vline=self.axes.axvline(x=self.location[0], linewidth=1, linestyle = 'dashed', dashes=(2, 2), color=dim1Description.get('Color', '#000000'))
+            #cursor lines, animated so that they are not part of the background
+            self.hline=self.axes.axhline(y=self.location[1], linewidth=1, linestyle='dashed', dashes=(2,2), color=dim0Description.get('Color', '#000000'), animated=True)
+            self.vline=self.axes.axvline(x=self.location[0], linewidth=1, linestyle = 'dashed', dashes=(2, 2), color=dim1Description.get('Color', '#000000'), animated=True)
 
             self.SetView(currView)
+            self.axes.callbacks.connect('xlim_changed', lambda axes: self.signalZoomChanged.emit())
             
             #zoom functionality
             self.toolbar=NavigationToolbar2QT(self,self)
@@ -256,7 +270,7 @@ class ImagePanel(FigureCanvas):
                 
             enableInvestigate = self.axes.get_navigate_mode() is None  
             if (self.leftMousePress and enableInvestigate):
-                imShape = self.imageData.shape
+                imShape = self.dataShape
                 
                 
                 locationDataCoord = self.axes.transData.inverted().transform([event.x, event.y])            
@@ -271,7 +285,9 @@ class ImagePanel(FigureCanvas):
     #functions that set internal data
     #==================================================================
     def SetImageData(self, newImage):
-        ''' Sets new image data, does not update display
+        ''' Sets new image data, does not update display. newImage may be
+        a downsampled version of the data, it is shown with the extent of the
+        full resolution data
         
         '''
         try:
@@ -280,6 +296,7 @@ class ImagePanel(FigureCanvas):
             self.maxVal = np.max(self.imageData)
             self.dataRange = self.maxVal - self.minVal
             self.img.set_data(self.imageData.T)
+            self.imageChanged = True
         except Exception as err:
             Common.HandleException(err)
         
@@ -313,6 +330,7 @@ class ImagePanel(FigureCanvas):
                 vmin=self.intensityLevel-(self.intensityWindow*0.5)
                 vmax=self.intensityLevel+(self.intensityWindow*0.5)
                 self.img.set_clim(vmin, vmax)
+                self.imageChanged = True
             else:
                 self.SetWindowLevelToDefault()
                 
@@ -329,6 +347,7 @@ class ImagePanel(FigureCanvas):
             self.intensityLevel = 0.5 * (self.minVal + self.maxVal)
             self.intensityWindow = self.maxVal-self.minVal
             self.img.set_clim(self.minVal, self.maxVal)
+            self.imageChanged = True
             
         except Exception as err:
             Common.HandleException(err)
@@ -347,6 +366,7 @@ class ImagePanel(FigureCanvas):
             # have not yet found a fn to reset origin
             self.enableWindowLevel = currView.get('EnableWindowLevelChange', True)
             self.SetWindowLevel(currView.get('Window', -1.0), currView.get('Level', 0.0))
+            self.imageChanged = True
 
         except Exception as err:
             Common.HandleException(err)
@@ -355,27 +375,58 @@ class ImagePanel(FigureCanvas):
     
     def UpdateImageAndLines(self):
         ''' This function allows the image to be updated fast
-        
+
+        The image is only redrawn if its data, window/level or view changed
+        since the last update. Otherwise the cached background is restored
+        and only the cursor lines are drawn and blitted
         '''
-        try:            
-            #if self.fig._cachedRenderer is not None:  
-            self.axes.draw_artist(self.axes.patch)
-            self.axes.draw_artist(self.img)
-            for spine in self.axes.spines.values():
-                self.axes.draw_artist(spine)
+        try:
+            if self.background is None:
+                # first update: a full draw, DrawEvent keeps the background
+                self.draw()
+                return
+
+            if self.imageChanged:
+                self.axes.draw_artist(self.axes.patch)
+                self.axes.draw_artist(self.img)
+                for spine in self.axes.spines.values():
+                    self.axes.draw_artist(spine)
+                self.background = self.copy_from_bbox(self.axes.bbox)
+                self.imageChanged = False
+            else:
+                self.restore_region(self.background)
+
+            self.DrawLines()
+        except Exception as err:
+            Common.HandleException(err)
 
+    def DrawEvent(self, event):
+        ''' Keeps the background after a full draw (first show, resize, zoom or pan)
+        and draws the cursor lines, which full draws leave out
+        '''
+        try:
+            self.background = self.copy_from_bbox(self.axes.bbox)
+            self.imageChanged = False
             self.axes.draw_artist(self.hline)
-            self.axes.draw_artist(self.vline) 
-                
-            self.update()
+            self.axes.draw_artist(self.vline)
         except Exception as err:
             Common.HandleException(err)
-            
-            
-     
-    
+
+    def DrawLines(self):
+        self.axes.draw_artist(self.hline)
+        self.axes.draw_artist(self.vline)
+        self.blit(self.axes.bbox)
+
+
+
     #==================================================================        
     #functions related to Qt
     #==================================================================
+    def GetZoom(self):
+        ''' Magnification by the zoom navigation mode, 1 when not zoomed
+        '''
+        xlim = self.axes.get_xlim()
+        return max(1.0, self.dataShape[0] / abs(xlim[1] - xlim[0]))
+
     def sizeHint(self):
-        return QtCore.QSize(self.imageData.shape[0], self.imageData.shape[1])             
+        return QtCore.QSize(self.dataShape[0], self.dataShape[1])             
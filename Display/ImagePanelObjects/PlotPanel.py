@@ -63,7 +63,7 @@ class PlotPanel(FigureCanvas):
         markerFn : lambda
             Given index of line, returns the sample index where the marker should be set
         
-        dimsTable : pandas series for this dim from dimsTable, includes Color and Name
+        dimsTable : row (dict) for this dim from dimsTable, includes Color and Name
                 
         visibleFn : lambda
             Given index of line, returns True if the line should be displayed
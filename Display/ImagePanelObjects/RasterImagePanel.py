@@ -0,0 +1,341 @@
+"""
+Code made available for the ISMRM 2015 Sunrise Educational Course
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+__all__=["RasterImagePanel"]
+
+import numpy as np
+import matplotlib as mpl
+import matplotlib.cm
+import matplotlib.colors
+
+from qtpy import QtCore, QtGui, QtWidgets
+
+from .. import Common
+from .. import Headless
+
+
+class RasterImagePanel(QtWidgets.QWidget):
+    ''' Drop-in replacement for ImagePanel that paints the image as a QImage
+    instead of a matplotlib canvas, for grids of many images.
+
+    The window/levelled image is mapped to RGBA through a 256 entry lookup table
+    of the colormap in numpy, and Qt scales it to the panel with nearest
+    neighbour interpolation (the Interpolation of the view is not used).
+    Zoom and pan navigation modes are not supported.
+    '''
+    signalChangeLocation = QtCore.Signal(int, int)
+    signalChangeWindowLevel = QtCore.Signal(float, float)
+    signalScroll = QtCore.Signal(int)
+    signalZoomChanged = QtCore.Signal()
+    def __init__(self,
+                 dim0Description,
+                 dim1Description,
+                 currView,
+                 imageData,
+                 integerZoom=False):
+        ''' RasterImagePanel constructor
+
+        Parameters
+        ----------
+
+        dim0Description : dict containing Name, Shape, CurrLocation, Color
+
+        dim1Description : dict containing Name, Shape, CurrLocation, Color
+
+        currView : dict containing
+                   Window, Level, EnableWindowLevelChange, Colormap, Origin
+        imageData : numpy 2D array of floats. The data to display
+
+        integerZoom : bool
+            if True, images are only magnified by whole numbers, so that all
+            image pixels are the same size on screen
+        '''
+        try:
+            super(RasterImagePanel, self).__init__()
+            self.setSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Expanding)
+            self.setAttribute(QtCore.Qt.WA_OpaquePaintEvent)
+
+            self.leftMousePress = False
+            self.middleMousePress = False
+            self.rightMousePress = False
+            self.navMode = None
+            self.integerZoom = integerZoom
+
+            # Check that imageData shape matches dimXDescription Shape
+            if dim0Description.get('Shape',0) != imageData.shape[0]:
+                raise RuntimeError('Dimension 0 shape mismatch: imageData [{}], dim0Description [{}]'.format(imageData.shape[0], dim0Description.get('Shape', 0)))
+            if dim1Description.get('Shape',0) != imageData.shape[1]:
+                raise RuntimeError('Dimension 1 shape mismatch: imageData [{}], dim0Description [{}]'.format(imageData.shape[1], dim1Description.get('Shape', 0)))
+
+            self.imageData = imageData
+            # shape of the full resolution data, in whose coordinates locations are
+            # given. imageData may be a coarser (pyramid) level of it
+            self.dataShape = imageData.shape
+            self.location = np.array((dim0Description.get('CurrLocation', dim0Description.get('Shape',0)*0.5),
+                             dim1Description.get('CurrLocation', dim1Description.get('Shape',0)*0.5)))
+            self.location = np.minimum(np.maximum(self.location, [0,0]), np.subtract(self.dataShape, 1)).astype(int)
+
+            self.hlineColor = QtGui.QColor(mpl.colors.to_hex(dim0Description.get('Color', '#000000')))
+            self.vlineColor = QtGui.QColor(mpl.colors.to_hex(dim1Description.get('Color', '#000000')))
+            self.backgroundColor = QtGui.QColor(Common.darkBackgroundColor)
+
+            # rgba is rendered from imageData when the image has changed,
+            # qImage shares its memory
+            self.origin = currView.get('Origin', 'lower')
+            self.rgba = None
+            self.qImage = None
+            self.imageChanged = True
+
+            self.SetImageData(imageData)
+            self.SetView(currView)
+        except Exception as err:
+            Common.HandleException(err)
+
+
+    def ChangeNavMode(self, mode):
+        ''' Only inspect mode is supported, the image does not zoom or pan
+
+        Parameters
+        ----------
+        mode : 'ZOOM', 'PAN' or None
+            None = inspect mode
+        '''
+        self.navMode = None if mode == 'INSPECT' else mode
+
+
+    def SaveImage(self, fname):
+        try:
+            self.RenderImage()
+            Headless.WritePng(fname + '.png', self.rgba[:, :, 0:3])
+        except Exception as err:
+            Common.HandleException(err)
+
+
+    #==================================================================
+    #slots to deal with Qt mouse events
+    #==================================================================
+    def mousePressEvent(self, event):
+        try:
+            if event.button() == QtCore.Qt.LeftButton:
+                self.leftMousePress = True
+
+            # for middle mouse click we want to show the image in a new window
+            elif event.button() == QtCore.Qt.MiddleButton:
+                self.middleMousePress = True
+                import matplotlib.pyplot
+                vmin, vmax = self.GetDisplayLimits()
+                mpl.pyplot.figure()
+                mpl.pyplot.imshow(self.imageData.T, cmap=self.colormap, origin=self.origin, vmin=vmin, vmax=vmax)
+
+            elif event.button() == QtCore.Qt.RightButton:
+                self.rightMousePress = True
+
+            self.origIntensityWindow = self.intensityWindow
+            self.origIntensityLevel = self.intensityLevel
+            self.origPointerLocation = [event.x(), event.y()]
+            self.mouseMoveEvent(event)
+        except Exception as err:
+            Common.HandleException(err)
+
+
+    def mouseReleaseEvent(self, event):
+        if event.button() == QtCore.Qt.LeftButton:
+            self.leftMousePress = False
+        elif event.button() == QtCore.Qt.MiddleButton:
+            self.middleMousePress = False
+        elif event.button() == QtCore.Qt.RightButton:
+            self.rightMousePress = False
+
+    def wheelEvent(self, event):
+        if event.angleDelta().y() < 0:
+            self.signalScroll.emit(1)
+        else:
+            self.signalScroll.emit(-1)
+
+
+    def mouseMoveEvent(self, event):
+        try:
+            if (self.rightMousePress and self.enableWindowLevel):
+
+                levelScale = 0.001
+                windowScale = 0.001
+
+                # Qt y increases downwards
+                dLevel = levelScale * float(event.y() - self.origPointerLocation[1]) * self.dataRange
+                dWindow = windowScale * float(event.x() - self.origPointerLocation[0]) * self.dataRange
+
+                newIntensityLevel = self.origIntensityLevel + dLevel
+                newIntensityWindow = self.origIntensityWindow + dWindow
+                self.signalChangeWindowLevel.emit(newIntensityWindow,newIntensityLevel)
+
+            if (self.leftMousePress and self.navMode is None):
+                left, top, scale = self.GetImageGeometry()
+                dim0 = (event.x() - left) / scale
+                dim1 = (event.y() - top) / scale
+                if self.origin == 'lower':
+                    dim1 = self.dataShape[1] - dim1
+                clippedLocation = np.minimum(np.maximum(np.floor([dim0, dim1]), [0,0]), np.subtract(self.dataShape,1)).astype(int)
+
+                self.signalChangeLocation.emit(clippedLocation[0], clippedLocation[1])
+        except Exception as err:
+            Common.HandleException(err)
+
+
+    #==================================================================
+    #functions that set internal data
+    #==================================================================
+    def SetImageData(self, newImage):
+        ''' Sets new image data, does not update display. newImage may be
+        a downsampled version of the data, it is scaled to the size of the
+        full resolution data
+
+        '''
+        try:
+            self.imageData = newImage
+            self.minVal = np.min(self.imageData)
+            self.maxVal = np.max(self.imageData)
+            self.dataRange = self.maxVal - self.minVal
+            self.imageChanged = True
+        except Exception as err:
+            Common.HandleException(err)
+
+
+    def SetLocation(self, newLocation):
+        '''
+
+        '''
+        try:
+            if (int(self.location[0]) != newLocation[0]) or (int(self.location[1]) != newLocation[1]):
+                self.location = newLocation
+        except Exception as err:
+            Common.HandleException(err)
+
+
+    def SetWindowLevel(self, newIntensityWindow,newIntensityLevel):
+        ''' Set Window/Level
+
+        '''
+        try:
+            if newIntensityWindow >= 0:
+                self.intensityLevel = newIntensityLevel
+                self.intensityWindow = newIntensityWindow
+                self.defaultWindowLevel = False
+                self.imageChanged = True
+            else:
+                self.SetWindowLevelToDefault()
+
+        except Exception as err:
+            Common.HandleException(err)
+
+
+    def SetWindowLevelToDefault(self):
+        ''' Sets default window/level
+
+        '''
+        try:
+            self.intensityLevel = 0.5 * (self.minVal + self.maxVal)
+            self.intensityWindow = self.maxVal-self.minVal
+            self.defaultWindowLevel = True
+            self.imageChanged = True
+
+        except Exception as err:
+            Common.HandleException(err)
+
+
+    def GetDisplayLimits(self):
+        if self.defaultWindowLevel:
+            return self.minVal, self.maxVal
+        return self.intensityLevel - 0.5 * self.intensityWindow, self.intensityLevel + 0.5 * self.intensityWindow
+
+
+    #==================================================================
+    #functions that update objects visualizing internal data
+    #==================================================================
+    def SetView(self, currView):
+        try:
+            self.colormap = currView.get('Colormap', mpl.cm.Greys_r)
+            lut = Headless.CreateColormapLut(self.colormap)
+            self.lut = np.concatenate([lut, np.full((lut.shape[0], 1), 255, dtype=np.uint8)], axis=1)
+            self.enableWindowLevel = currView.get('EnableWindowLevelChange', True)
+            self.SetWindowLevel(currView.get('Window', -1.0), currView.get('Level', 0.0))
+            self.imageChanged = True
+
+        except Exception as err:
+            Common.HandleException(err)
+
+
+    def RenderImage(self):
+        ''' Maps imageData through the window/level and colormap to the RGBA
+        image painted by paintEvent, if it has changed
+        '''
+        if self.imageChanged:
+            vmin, vmax = self.GetDisplayLimits()
+            self.rgba = Headless.RenderTile(self.imageData, vmax - vmin, 0.5 * (vmin + vmax), self.lut, self.origin)
+            height, width = self.rgba.shape[0:2]
+            self.qImage = QtGui.QImage(self.rgba.data, width, height, 4 * width, QtGui.QImage.Format_RGBA8888)
+            self.imageChanged = False
+
+
+    def UpdateImageAndLines(self):
+        ''' Renders the image if it has changed and schedules a repaint
+
+        '''
+        try:
+            self.RenderImage()
+            self.update()
+        except Exception as err:
+            Common.HandleException(err)
+
+
+    def GetImageGeometry(self):
+        ''' Left and top (widget pixels) and magnification of the image, which
+        is centred in the panel with its aspect ratio kept
+        '''
+        shape = self.dataShape
+        scale = min(self.width() / shape[0], self.height() / shape[1])
+        if self.integerZoom and scale >= 1:
+            scale = np.floor(scale)
+        left = 0.5 * (self.width() - scale * shape[0])
+        top = 0.5 * (self.height() - scale * shape[1])
+        return left, top, scale
+
+
+    #==================================================================
+    #functions related to Qt
+    #==================================================================
+    def paintEvent(self, event):
+        try:
+            self.RenderImage()
+            left, top, scale = self.GetImageGeometry()
+            width = scale * self.dataShape[0]
+            height = scale * self.dataShape[1]
+
+            painter = QtGui.QPainter(self)
+            painter.fillRect(self.rect(), self.backgroundColor)
+            painter.drawImage(QtCore.QRectF(left, top, width, height), self.qImage)
+
+            # cursor lines, on the far edge of the current sample as in ImagePanel
+            lineX = left + (self.location[0] + 1) * scale
+            lineY = top + (self.location[1] + 1) * scale
+            if self.origin == 'lower':
+                lineY = top + height - (self.location[1] + 1) * scale
+            pen = QtGui.QPen(self.hlineColor, 1, QtCore.Qt.CustomDashLine)
+            pen.setDashPattern([2, 2])
+            painter.setPen(pen)
+            painter.drawLine(QtCore.QLineF(left, lineY, left + width, lineY))
+            pen.setColor(self.vlineColor)
+            painter.setPen(pen)
+            painter.drawLine(QtCore.QLineF(lineX, top, lineX, top + height))
+            painter.end()
+        except Exception as err:
+            Common.HandleException(err)
+
+    def GetZoom(self):
+        return 1.0
+
+    def sizeHint(self):
+        return QtCore.QSize(self.dataShape[0], self.dataShape[1])
@@ -15,3 +15,4 @@ Philip J. Beatty (philip.beatty@gmail.com)
 from .CrossSections import *
 from .PlotPanel import *
 from .ImagePanel import *
+from .RasterImagePanel import *
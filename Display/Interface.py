@@ -36,18 +36,24 @@ def ShowImage2D(data,
                 titles=None,
                 axisLabels=None,
                 maxNumInRow=None,
-                colormap=None):
+                colormap=None,
+                rasterTiles=False):
     """ Interface for plotting 2D images and sets of 2D images
 
+    data : list of 2D arrays, or a 2D or 3D array (images along the last dimension)
+        arrays can also be np.memmap, h5py datasets or other array-likes, see ShowImage3D
+    rasterTiles : bool
+        if True, images are painted as QImages rather than matplotlib canvases
+        (nearest neighbour interpolation, no zoom or pan), for grids of many images
     """
 
     
-    if type(data) == np.ndarray:
-        if data.ndim == 2:
+    if not isinstance(data, list) and hasattr(data, 'shape'):
+        if len(data.shape) == 2:
             data = [data]
-        elif data.ndim == 3:
-            tmp = np.dsplit(data, data.shape[2])
-            data = list(map(lambda elem: np.reshape(elem, [elem.shape[0], elem.shape[1]]), tmp))
+        elif len(data.shape) == 3:
+            # views of numpy and memory-mapped arrays, not copies. Other array-likes read each image
+            data = [data[:, :, index] for index in range(data.shape[2])]
         
         
     if type(data) != list:
@@ -60,7 +66,8 @@ def ShowImage2D(data,
                                     axisLabels=axisLabels,
                                     maxNumInRow=maxNumInRow,
                                     colormap=colormap,
-                                    windowTitle=windowTitle)
+                                    windowTitle=windowTitle,
+                                    rasterTiles=rasterTiles)
 
     viewer.Start()
     return viewer
@@ -72,10 +79,23 @@ def ShowImage3D(data,
                 windowTitle=None,
                 titles=None,
                 axisLabels=None,
-                colormap=None):
+                colormap=None,
+                rasterTiles=False):
     """ Interface for plotting 3D images and sets of 3D images
 
+    data : list of 3D arrays, or a 3D or 4D array (images along the last dimension)
+        besides numpy arrays, np.memmap arrays, h5py datasets, IsmrmSunrise.LazyMatArray
+        (e.g. from IsmrmSunrise.LoadArray) and Display.SliceProvider are shown without
+        reading them into memory: only the planes and lines displayed are read
+    rasterTiles : bool
+        as for ShowImage2D
     """
+    if not isinstance(data, list) and hasattr(data, 'shape'):
+        if len(data.shape) == 3:
+            data = [data]
+        elif len(data.shape) == 4:
+            data = [ChannelView(data, channel) for channel in range(data.shape[3])]
+
     if type(data) != list:
         raise RuntimeError('data must be a list: {}'.format(type(data)))
     viewer=Image3DWindow.MainWindow(data,
@@ -84,12 +104,22 @@ def ShowImage3D(data,
                                     titles=titles,
                                     axisLabels=axisLabels,
                                     colormap=colormap,
-                                    windowTitle=windowTitle)
+                                    windowTitle=windowTitle,
+                                    rasterTiles=rasterTiles)
 
     viewer.Start()
     return viewer
 
 
+def ChannelView(data, channel):
+    """ 3D volume of one channel of 4D data. A view for numpy and memory-mapped
+    arrays, otherwise a SliceProvider that reads one plane of the channel at a time
+    """
+    if isinstance(data, np.ndarray):
+        return data[:, :, :, channel]
+    return Common.SliceProvider(lambda index: data[:, :, index, channel], data.shape[0:3], data.dtype, axis=2)
+
+
 # Interface for plotting 1D images and sets of 1D images
 def Plot(data,windowTitle=None):
     viewer = PlotWindow.MainWindow(data, windowTitle)
@@ -13,11 +13,10 @@ Philip J. Beatty (philip.beatty@gmail.com)
 """
 
 #
-# Objective of these factories is to provide convenience functions for creating data in pandas DataFrame format
+# Objective of these factories is to provide convenience functions for creating data in StateTable format
 #
 
 import numpy as np
-import pandas as pd
 from .. import Common
 
 def CreateDataFrameFromLists(complexDataList, sampleLocationsList, titleList=None):
@@ -29,7 +28,7 @@ def CreateDataFrameFromLists(complexDataList, sampleLocationsList, titleList=Non
     if len(sampleLocationsList) != numRows:
         raise RuntimeError("complexDataList length({}) does not match sampleLocationsList length ({})".format(numRows, len(sampleLocationList)))
     
-    dataTable = pd.DataFrame(columns=('Title', 'Data', 'SampleLocations', 'Color', 'CurrIndex', 'Visible', 'Index'))
+    rows = []
 
     if titleList is None:
         titleList = []
@@ -54,5 +53,5 @@ def CreateDataFrameFromLists(complexDataList, sampleLocationsList, titleList=Non
             'Index': index
             }
     
-        dataTable.loc[index] = newRow
-    return dataTable
+        rows.append(newRow)
+    return Common.StateTable.FromRows(rows)
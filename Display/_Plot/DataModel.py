@@ -11,8 +11,8 @@ Philip J. Beatty (philip.beatty@gmail.com)
 2017, modified by Chad Harris
 2017, modified by Philip Beatty
 """
+import threading
 import numpy as np
-import pandas as pd
 import matplotlib.cm as colormaps
 from IPython.display import display
 
@@ -27,7 +27,7 @@ class DataModel(Common.DataModel):
         Parameters
         ----------
 
-        data : pandas data frame
+        data : StateTable or pandas DataFrame, with a row per function
 
 
 
@@ -35,11 +35,14 @@ class DataModel(Common.DataModel):
         try:
 
             self.locationSyncFlag = False
+            self.viewMinMaxLock = threading.Lock()
             
-            if isinstance(data, pd.DataFrame):
-                self.dataTable = data
+            if isinstance(data, Common.StateTable):
+                self.dataTable = Common.StateTable.FromRows(data.rows)
+            elif type(data).__name__ == 'DataFrame':
+                self.dataTable = Common.StateTable.FromDataFrame(data)
             else:
-                raise RuntimeError('data must be a DataFrame')
+                raise RuntimeError('data must be a StateTable or DataFrame')
             
             dimShape = (1,)
             self.commonState = Common.CommonDataState(dimShape)
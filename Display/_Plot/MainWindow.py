@@ -31,7 +31,7 @@ class MainWindow(Common.MainWindow):
             super(MainWindow,self).__init__()
 
             self.callingParams = {}
-            self.callingParams['data'] = data.copy()
+            self.callingParams['data'] = data # the data model copies the table
             self.callingParams['windowTitle'] = windowTitle
             
             self.dataModel = DataModel.DataModel(data)
@@ -60,7 +60,7 @@ class MainWindow(Common.MainWindow):
             visibleFn = lambda channel: self.dataModel.GetDataTableValue(channel, 'Visible')
             colorFn = lambda channel: self.dataModel.GetDataTableValue(channel, 'Color')
 
-            dimsTable = self.dataModel.commonState.dimsTable.iloc[0].copy()
+            dimsTable = dict(self.dataModel.commonState.dimsTable.GetRow(0))
             dimsTable['Color'] = Common.lightTextColor # don't need to color code border
             viewWidget=PlotPanel(dataFn=dataFn,
                                  locationFn=locationFn,
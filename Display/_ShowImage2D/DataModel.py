@@ -12,7 +12,6 @@ Philip J. Beatty (philip.beatty@gmail.com)
 2017, modified by Philip Beatty
 """
 import numpy as np
-import pandas as pd
 import matplotlib.cm as colormaps
 from IPython.display import display
 
@@ -25,6 +24,77 @@ from .. import Common
 
 class DataModel(Common.ShowImageDataModel):
 
+    def GetCurrImage(self, datasetIndex, displaySize=None, readyFn=None):
+        """ Current view of a dataset at the coarsest resolution level that
+        still has at least displaySize samples along the first dimension.
+        Level 0 is the full resolution and each level halves both dimensions.
+        Levels are computed from the next finer level on first use and kept in
+        sliceCache, and the neighbouring levels are prefetched on its worker
+        thread, for when the tile is resized or zoomed
+
+        Parameters
+        ----------
+        datasetIndex : int
+        displaySize : float
+            number of screen pixels the first dimension is shown on,
+            None for full resolution
+        readyFn : function
+            if given and the level is not cached, the nearest cached level is
+            returned instead, the level is computed on the worker thread and
+            readyFn() is called from the worker thread when it is cached.
+            Without a cached level to show, the level is computed here
+        """
+        viewIndex = self.commonState.currViewIndex
+        level = self.GetPyramidLevel(displaySize)
+
+        if readyFn is not None and self.sliceCache.Peek((datasetIndex, viewIndex, 'Pyramid', level)) is None:
+            nearest = self.GetNearestCachedPyramidImage(datasetIndex, viewIndex, level)
+            if nearest is not None:
+                # replaces the level requested earlier for this dataset, if still pending
+                self.sliceCache.Prefetch((datasetIndex, 'PyramidLevel'),
+                                         [((datasetIndex, viewIndex, 'Pyramid', level),
+                                           lambda: self.GetPyramidImage(datasetIndex, viewIndex, level))],
+                                         lambda key: readyFn())
+                return nearest
+
+        image = self.GetPyramidImage(datasetIndex, viewIndex, level)
+
+        requests = []
+        for neighbour in [level - 1, level + 1]:
+            if 0 <= neighbour <= self.GetPyramidLevel(1):
+                requests.append(((datasetIndex, viewIndex, 'Pyramid', neighbour),
+                                 lambda neighbour=neighbour: self.GetPyramidImage(datasetIndex, viewIndex, neighbour)))
+        self.sliceCache.Prefetch((datasetIndex, viewIndex, 'Pyramid'), requests)
+        return image
+
+    def GetNearestCachedPyramidImage(self, datasetIndex, viewIndex, level):
+        """ Cached pyramid level closest to level (the finer one of two equally
+        close levels), or None if no level of the view is cached
+        """
+        levels = range(self.GetPyramidLevel(1) + 1)
+        for nearestLevel in sorted(levels, key=lambda other: (abs(other - level), other)):
+            image = self.sliceCache.Peek((datasetIndex, viewIndex, 'Pyramid', nearestLevel))
+            if image is not None:
+                return image
+        return None
+
+    def GetPyramidLevel(self, displaySize):
+        if displaySize is None or displaySize <= 0:
+            return 0
+        numSamples = self.GetDimValue(0, 'Shape')
+        return max(0, int(np.floor(np.log2(numSamples / float(displaySize)))))
+
+    def GetPyramidImage(self, datasetIndex, viewIndex, level):
+        def ComputeLevel():
+            if level == 0:
+                rFn = self.commonState.viewsTable.GetValue(viewIndex, 'ReductionFn')
+                # [...] reads array-likes (HDF5, SliceProvider), a view of numpy arrays
+                return rFn(np.asarray(self.dataTable.GetValue(datasetIndex, 'Data')[...]))
+            finer = self.GetPyramidImage(datasetIndex, viewIndex, level - 1)
+            return DownsampleImage(finer, self.commonState.viewsTable.GetValue(viewIndex, 'Downsample'))
+
+        return self.sliceCache.Get((datasetIndex, viewIndex, 'Pyramid', level), ComputeLevel)
+
 
 
     def GetCurrValue(self, datasetIndex):
@@ -39,5 +109,17 @@ class DataModel(Common.ShowImageDataModel):
     def GetCurrYLine(self, datasetIndex):
         return self.GetCurrDataSlice(datasetIndex,
                                 dim1Slice=self.GetDimValue(0, 'CurrLocation'))
-                      
-                                
+
+
+def DownsampleImage(image, method='Mean'):
+    """ Halves both dimensions of a 2D image, by averaging 2x2 blocks ('Mean')
+    or by taking every other sample ('Decimate'). Odd dimensions repeat their
+    last sample
+    """
+    if method == 'Decimate':
+        return image[::2, ::2]
+    if image.shape[0] % 2:
+        image = np.concatenate([image, image[-1:, :]], axis=0)
+    if image.shape[1] % 2:
+        image = np.concatenate([image, image[:, -1:]], axis=1)
+    return 0.25 * (image[0::2, 0::2] + image[1::2, 0::2] + image[0::2, 1::2] + image[1::2, 1::2])
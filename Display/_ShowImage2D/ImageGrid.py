@@ -58,15 +58,15 @@ class ImageGrid(QtWidgets.QFrame):
             self.imageFrameList = []
             self.visibleIndices = []
 
-            xDescription = dataModel.commonState.dimsTable.iloc[0]
-            yDescription = dataModel.commonState.dimsTable.iloc[1]
+            xDescription = dataModel.commonState.dimsTable.GetRow(0)
+            yDescription = dataModel.commonState.dimsTable.GetRow(1)
             currViewFn = dataModel.GetCurrViewValue
             self.visibleFn = lambda channel: self.dataModel.GetDataTableValue(channel, 'Visible')
             
             for imIndex in range(self.numImages):
                 color = dataModel.GetDataTableValue(imIndex, 'Color')
                 title = dataModel.GetDataTableValue(imIndex, 'Title')
-                dataFn = lambda index=imIndex: dataModel.GetCurrDataSlice(index)
+                dataFn = lambda displaySize=None, readyFn=None, index=imIndex: dataModel.GetCurrImage(index, displaySize, readyFn)
                 imPanel = ImageTile(dim0Description=xDescription,
                                     dim1Description=yDescription,
                                     currViewFn=currViewFn,
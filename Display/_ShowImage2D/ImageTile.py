@@ -15,6 +15,7 @@ from .. import Common
 from qtpy import QtWidgets, QtCore
 
 from ..ImagePanelObjects import ImagePanel as ImagePanel
+from ..ImagePanelObjects import RasterImagePanel as RasterImagePanel
 
 
 class ImageTile(QtWidgets.QFrame):
@@ -25,6 +26,9 @@ class ImageTile(QtWidgets.QFrame):
     signalChangeLocation = QtCore.Signal(int,int)
     signalChangeWindowLevel = QtCore.Signal(float, float)
     signalScroll = QtCore.Signal(int)
+    # emitted from the slice cache worker thread when the resolution level for
+    # displaySize has been computed
+    signalLevelReady = QtCore.Signal()
     def __init__(self,
                  dim0Description,
                  dim1Description,
@@ -37,6 +41,9 @@ class ImageTile(QtWidgets.QFrame):
             
             self.titleHeight = 15
             self.oldWidth = -1
+            self.imageWidth = None
+            # screen pixels the first dimension is shown on, for the resolution level of the data
+            self.displaySize = None
             
             self.currViewFn = currViewFn
 
@@ -59,9 +66,12 @@ class ImageTile(QtWidgets.QFrame):
             self.colorPanel.setMaximumHeight(self.titleHeight)
             self.colorPanel.setObjectName("colorPanel")
             self.colorPanel.setStyleSheet("#colorPanel {{padding: 0; margin: 0; border-width: 0; background-color: {};color: {}}}".format(color, Common.darkBackgroundColor))
-            self.panel = ImagePanel(dim0Description=dim0Description,
+            # QImage panels for grids of many images, if the viewer asked for them
+            currView = currViewFn()
+            PanelClass = RasterImagePanel if currView.get('RasterTiles', False) else ImagePanel
+            self.panel = PanelClass(dim0Description=dim0Description,
                                                dim1Description=dim1Description,
-                                               currView=currViewFn(),
+                                               currView=currView,
                                                imageData=dataFn())
             
             
@@ -77,6 +87,8 @@ class ImageTile(QtWidgets.QFrame):
             self.panel.signalChangeWindowLevel.connect(self.signalChangeWindowLevel)
             self.panel.signalChangeLocation.connect(self.signalChangeLocation)
             self.panel.signalScroll.connect(self.signalScroll)
+            self.panel.signalZoomChanged.connect(self.ChangeZoom)
+            self.signalLevelReady.connect(self.ChangeLevel, QtCore.Qt.QueuedConnection)
         except Exception as err:
             Common.HandleException(err)
 
@@ -87,7 +99,46 @@ class ImageTile(QtWidgets.QFrame):
         self.setMaximumWidth(width)
         self.setMinimumHeight(height)
         self.setMaximumHeight(height)
+        self.imageWidth = width
+        self.SetDisplaySize()
         self.ShowIt()
+
+    def ChangeZoom(self):
+        if self.SetDisplaySize():
+            self.ShowIt()
+
+    def ChangeLevel(self):
+        try:
+            if self.GetImageData() is not self.panel.imageData:
+                self.SyncDataAndView()
+                self.ShowIt()
+        except Exception as err:
+            Common.HandleException(err)
+
+    def SetDisplaySize(self):
+        ''' Selects the data resolution for the width and zoom of the image.
+        Returns True if the image data changed
+        '''
+        try:
+            if self.imageWidth is None:
+                return False
+            displaySize = self.imageWidth * self.devicePixelRatioF() * self.panel.GetZoom()
+            if displaySize == self.displaySize:
+                return False
+            self.displaySize = displaySize
+            if self.GetImageData() is self.panel.imageData:
+                return False
+            self.SyncDataAndView()
+            return True
+        except Exception as err:
+            Common.HandleException(err)
+
+    def GetImageData(self):
+        ''' Image data for displaySize. A resolution level that is not yet
+        computed is computed on the worker thread, and the nearest computed
+        level is shown until signalLevelReady
+        '''
+        return self.dataFn(self.displaySize, self.signalLevelReady.emit)
         
     def ShowIt(self):
         self.panel.UpdateImageAndLines()
@@ -103,7 +154,7 @@ class ImageTile(QtWidgets.QFrame):
 
     def SyncDataAndView(self):
         try:
-            self.panel.SetImageData(self.dataFn())
+            self.panel.SetImageData(self.GetImageData())
             self.panel.SetView(self.currViewFn())
 
         except Exception as err:
@@ -30,7 +30,8 @@ class MainWindow(Common.MainWindow):
                  imageType=Common.ImageType.mag,
                  maxNumInRow=None,
                  colormap=None,
-		 windowTitle=None):
+		 windowTitle=None,
+		 rasterTiles=False):
 
         try:
             super(MainWindow, self).__init__()
@@ -50,6 +51,7 @@ class MainWindow(Common.MainWindow):
             self.callingParams['imageType'] = imageType
             self.callingParams['colormap'] = colormap
             self.callingParams['windowTitle'] = windowTitle
+            self.callingParams['rasterTiles'] = rasterTiles
             self.callingParams['maxNumInRow'] = maxNumInRow
             
 
@@ -58,6 +60,7 @@ class MainWindow(Common.MainWindow):
 
 
             self.dataModel = DataModel(complexImList, titles)      
+            self.dataModel.commonState.viewsTable.FillColumn('RasterTiles', rasterTiles)
             self.controller = Common.Controller(self.dataModel)
             self.controller.signalClone.connect(self.Clone)
             controlWidget = ControlWidget(self.controller, self.dataModel)
@@ -74,6 +77,15 @@ class MainWindow(Common.MainWindow):
 
 
 
+    def closeEvent(self, event):
+        try:
+            # the slice cache would otherwise keep its planes and prefetch thread
+            self.dataModel.Close()
+        except Exception as err:
+            Common.HandleException(err)
+        super(MainWindow, self).closeEvent(event)
+
+
     def Clone(self):
         try:
             viewer = MainWindow(**self.callingParams)
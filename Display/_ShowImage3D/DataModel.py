@@ -12,7 +12,6 @@ Philip J. Beatty (philip.beatty@gmail.com)
 2017, modified by Philip Beatty
 """
 import numpy as np
-import pandas as pd
 import matplotlib.cm as colormaps
 from IPython.display import display
 
@@ -49,15 +48,11 @@ class DataModel(Common.ShowImageDataModel):
                                 dim1Slice=self.GetDimValue(0, 'CurrLocation'),
                                 dim2Slice=self.GetDimValue(1, 'CurrLocation'))
     def GetCurrXYPlane(self, datasetIndex):
-        return self.GetCurrDataSlice(datasetIndex,
-                                dim3Slice=self.GetDimValue(2, 'CurrLocation'))
+        return self.GetCurrDataPlane(datasetIndex, 2)
                       
     def GetCurrYZPlane(self, datasetIndex):
-        xLoc = self.GetDimValue(0, 'CurrLocation')
-        rv = self.GetCurrDataSlice(datasetIndex,
-                                   dim1Slice=xLoc)
-        return rv
+        return self.GetCurrDataPlane(datasetIndex, 0)
+
     def GetCurrZXPlane(self, datasetIndex):
-        return np.transpose(self.GetCurrDataSlice(datasetIndex,
-                                dim2Slice=self.GetDimValue(1, 'CurrLocation')))
+        return np.transpose(self.GetCurrDataPlane(datasetIndex, 1))
                                 
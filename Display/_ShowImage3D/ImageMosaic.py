@@ -42,7 +42,7 @@ class ImageMosaic(QtWidgets.QFrame):
         Parameters
         ----------
 
-        currView : pandas Series containing
+        currView : dict containing
             Window, Level, EnableWindowLevelChange, Colormap, Interpolation, Origin
 
         imageDataFn : lambda
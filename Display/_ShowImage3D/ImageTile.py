@@ -16,6 +16,7 @@ from qtpy import QtWidgets, QtCore
 import numpy as np
 
 from ..ImagePanelObjects import ImagePanel as ImagePanel
+from ..ImagePanelObjects import RasterImagePanel as RasterImagePanel
 
 
 class ImageTile(QtWidgets.QFrame):
@@ -46,9 +47,12 @@ class ImageTile(QtWidgets.QFrame):
             
             self.setSizePolicy(sizePolicy)
             
-            self.panel = ImagePanel(dim0Description=dim0Description,
+            # QImage panels for grids of many images, if the viewer asked for them
+            currView = currViewFn()
+            PanelClass = RasterImagePanel if currView.get('RasterTiles', False) else ImagePanel
+            self.panel = PanelClass(dim0Description=dim0Description,
                                                dim1Description=dim1Description,
-                                               currView=currViewFn(),
+                                               currView=currView,
                                                imageData=dataFn())
 
             
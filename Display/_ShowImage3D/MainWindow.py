@@ -28,7 +28,8 @@ class MainWindow(Common.MainWindow):
                  axisLabels=None,
                  imageType=Common.ImageType.mag,
                  colormap=None,
-                 windowTitle=None):
+                 windowTitle=None,
+                 rasterTiles=False):
 
         try:
             #print("{}: @Start MainWindow".format(datetime.now().strftime('%X.%f')))
@@ -49,11 +50,13 @@ class MainWindow(Common.MainWindow):
             self.callingParams['imageType'] = imageType
             self.callingParams['colormap'] = colormap
             self.callingParams['windowTitle'] = windowTitle
+            self.callingParams['rasterTiles'] = rasterTiles
             if initLocation is None:
                 initLocation = [int(complexImList[0].shape[0] * 0.5), int(complexImList[0].shape[1] * 0.5), int(complexImList[0].shape[2] * 0.5)]
 
 
             self.dataModel = DataModel(complexImList, titles)
+            self.dataModel.commonState.viewsTable.FillColumn('RasterTiles', rasterTiles)
             #print("{}: DataModel created".format(datetime.now().strftime('%X.%f')))
             self.controller = Common.Controller(self.dataModel)
             self.controller.signalClone.connect(self.Clone)
@@ -73,6 +76,15 @@ class MainWindow(Common.MainWindow):
 
 
 
+    def closeEvent(self, event):
+        try:
+            # the slice cache would otherwise keep its planes and prefetch thread
+            self.dataModel.Close()
+        except Exception as err:
+            Common.HandleException(err)
+        super(MainWindow, self).closeEvent(event)
+
+
     def Clone(self):
         try:
             viewer = MainWindow(**self.callingParams)
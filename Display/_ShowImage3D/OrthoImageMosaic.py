@@ -68,16 +68,16 @@ class OrthoImageMosaic(QtWidgets.QFrame):
         Parameters
         ----------
 
-        dimsTable : pandas DataFrame
+        dimsTable : StateTable
           Row for each dimension, containing Name, Shape, CurrLocation, Color
 
-        currView : pandas Series containing
+        currView : dict containing
             Window, Level, EnableWindowLevelChange, Colormap, Interpolation, Origin
 
         imageDataFn : lambda
             Given image index, returns float image (all images same size)
 
-        imageDescription : pandas DataFrame containing Title, Color, Index for all images
+        imageDescription : StateTable containing Title, Color, Index for all images
 
         maxNumInRow : int
             max number of images in a row, before starting another row
@@ -100,13 +100,13 @@ class OrthoImageMosaic(QtWidgets.QFrame):
             self.setStyleSheet("* {padding: 0; margin: 0; border: 0;}")
 
 
-            self.currLocation = dataModel.commonState.dimsTable['CurrLocation'].copy()
+            self.currLocation = dataModel.commonState.dimsTable.GetColumn('CurrLocation')
 
             self.numImages = dataModel.GetNumDatasets()
 
-            xDescription = dataModel.commonState.dimsTable.iloc[0]
-            yDescription = dataModel.commonState.dimsTable.iloc[1]
-            zDescription = dataModel.commonState.dimsTable.iloc[2]
+            xDescription = dataModel.commonState.dimsTable.GetRow(0)
+            yDescription = dataModel.commonState.dimsTable.GetRow(1)
+            zDescription = dataModel.commonState.dimsTable.GetRow(2)
             currViewFn = dataModel.GetCurrViewValue
             visibleFn = lambda channel: self.dataModel.GetDataTableValue(channel, 'Visible')
 
@@ -12,8 +12,35 @@ Philip J. Beatty (philip.beatty@gmail.com)
 2017, modified by Philip Beatty
 """
 
-try:
-    from .Interface import *
-except Exception as err:
-    print("Exception in Display __init__")
-    print("[{}]".format(err))
+import importlib
+
+# Interface (and with it Qt, matplotlib and IPython) is imported on first use
+# of one of its functions (PEP 562), so `import Display` is cheap for scripts that
+# only reconstruct
+INTERFACE_EXPORTS = ["Plot", "PlotListInterface", "ShowImage2D", "ShowImage3D", "BlockOnOpenWindow"]
+# Qt-free rendering to PNG files
+HEADLESS_EXPORTS = ["RenderImage2D", "RenderImage3D", "SaveImage2D", "SaveImage3D", "SaveSliceImages", "WritePng"]
+# array-like for data produced slice by slice, e.g. read from disk
+COMMON_EXPORTS = ["SliceProvider"]
+SUBMODULES = ["Interface", "Headless", "Common", "ControlWidgets", "ImagePanelObjects"]
+
+__all__ = INTERFACE_EXPORTS + HEADLESS_EXPORTS + COMMON_EXPORTS
+
+
+def __getattr__(name):
+    if name in INTERFACE_EXPORTS:
+        value = getattr(importlib.import_module('.Interface', __name__), name)
+    elif name in HEADLESS_EXPORTS:
+        value = getattr(importlib.import_module('.Headless', __name__), name)
+    elif name in COMMON_EXPORTS:
+        value = getattr(importlib.import_module('.Common', __name__), name)
+    elif name in SUBMODULES:
+        value = importlib.import_module('.' + name, __name__)
+    else:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__) | set(SUBMODULES))
@@ -0,0 +1,297 @@
+# -*- coding: utf-8 -*-
+"""
+Reference-vs-fast equivalence harness for IsmrmSunrise
+
+Runs each optimised function and a reference implementation of the same computation
+on randomised shapes, channel counts and dtypes, and reports the maximum relative error
+and the speedup of the optimised function in one table.
+It also checks that the lazy exports of IsmrmSunrise match the __all__ of its submodules.
+
+    python EquivalenceCheck.py --trials 3 --seed 0
+
+References are the slow *Reference functions kept in IsmrmSunrise where they exist
+(ComputeJerDataDrivenReference, ComputeDvcKernelsReference), otherwise direct
+implementations of the defining equations given below (explicit DFT matrices, a SENSE
+solve per aliased pixel set, a per pixel eigendecomposition for Walsh). The run exits
+with status 1 if any error exceeds its tolerance.
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+import IsmrmSunrise
+
+# maximum relative error per input dtype
+TOLERANCES = {np.complex64: 1e-4, np.complex128: 1e-8}
+
+
+def RandomComplex(rng, shape, dtype):
+    return (rng.standard_normal(shape) + 1j * rng.standard_normal(shape)).astype(dtype)
+
+
+def RandomSmoothImages(rng, shape, numChannels, dtype):
+    """Channel images with smooth, overlapping sensitivities over an elliptical object."""
+    x, y = np.meshgrid(np.linspace(-1, 1, shape[0]), np.linspace(-1, 1, shape[1]), indexing='ij')
+    im = ((x**2/0.7 + y**2/0.9) < 1) * (1 + 0.3*np.cos(5*x + rng.uniform(0, 2*np.pi)))
+    channels = np.zeros(tuple(shape) + (numChannels,), dtype=complex)
+    for channel in range(numChannels):
+        center = rng.uniform(-1.5, 1.5, 2)
+        channels[:, :, channel] = im * np.exp(-((x-center[0])**2 + (y-center[1])**2)) * np.exp(1j*(rng.uniform(-1, 1)*x + rng.uniform(-1, 1)*y + rng.uniform(0, 2*np.pi)))
+    return channels.astype(dtype)
+
+
+def MaxRelativeError(result, reference):
+    result = np.asarray(result)
+    reference = np.asarray(reference)
+    return np.max(np.abs(result - reference)) / max(np.max(np.abs(reference)), np.finfo(float).tiny)
+
+
+def SubspaceError(result, reference):
+    """1 - |cos(angle)| between vectors along the last dimension, for results defined up to a
+    complex scale per pixel (e.g. dominant eigenvectors). Pixels that are zero in either are ignored."""
+    result = np.reshape(result, [-1, result.shape[-1]])
+    reference = np.reshape(reference, [-1, reference.shape[-1]])
+    norms = np.linalg.norm(result, axis=1) * np.linalg.norm(reference, axis=1)
+    nonzero = norms > 0
+    cosAngle = np.abs(np.sum(result[nonzero] * np.conj(reference[nonzero]), axis=1)) / norms[nonzero]
+    return np.max(1 - cosAngle) if np.any(nonzero) else 0.0
+
+
+def CenteredDftMatrix(outExtent, inExtent, sign):
+    """DFT matrix of the centred transform used by Transforms: sample k (centre floor(K/2))
+    to position y (centre floor(N/2)), scaled by 1/sqrt(K)."""
+    y = np.arange(outExtent) - (outExtent >> 1)
+    k = np.arange(inExtent) - (inExtent >> 1)
+    return np.exp(sign * 2j*np.pi*np.outer(y, k)/outExtent) / np.sqrt(inExtent)
+
+
+def TransformKspaceToImageReference(kspace, imShape):
+    im = np.tensordot(CenteredDftMatrix(imShape[0], kspace.shape[0], 1), kspace, axes=(1, 0))
+    return np.moveaxis(np.tensordot(CenteredDftMatrix(imShape[1], kspace.shape[1], 1), im, axes=(1, 1)), 0, 1)
+
+
+def TransformImageToKspaceReference(im):
+    kspace = np.tensordot(CenteredDftMatrix(im.shape[0], im.shape[0], -1), im, axes=(1, 0))
+    return np.moveaxis(np.tensordot(CenteredDftMatrix(im.shape[1], im.shape[1], -1), kspace, axes=(1, 1)), 0, 1)
+
+
+def ComputeSenseUnmixingReference(accFactor, csm, noiseMatrix, regularizationFactor):
+    """SENSE unmixing by a regularised least squares solve for each set of aliased pixels."""
+    nx, ny, numChannels = csm.shape
+    numBlocks = ny // accFactor
+    noiseMatrixInv = np.linalg.inv(noiseMatrix)
+    unmix = np.zeros(csm.shape, dtype=complex)
+    for xIndex in range(nx):
+        for yIndex in range(numBlocks):
+            aliasedPixels = np.arange(yIndex, ny, numBlocks)
+            A = csm[xIndex, aliasedPixels, :].T
+            if np.max(np.abs(A)) == 0:
+                continue
+            AHA = np.dot(A.conj().T, np.dot(noiseMatrixInv, A))
+            isAliased = np.abs(np.diag(AHA)) > 0
+            regularization = regularizationFactor * np.trace(AHA) / np.sum(isAliased) * np.diag(isAliased)
+            unmix[xIndex, aliasedPixels, :] = np.dot(np.linalg.pinv(AHA + regularization), np.dot(A.conj().T, noiseMatrixInv))
+    return unmix
+
+
+def EstimateCsmWalshReference(im, smoothing=5):
+    """Walsh sensitivity estimates: the exact dominant eigenvector of the correlation matrix
+    of the SoS normalised channel images, summed over a smoothing x smoothing window."""
+    from IsmrmSunrise import ChannelCombination
+    voxels = ChannelCombination.NormalizeShadingToSoS(im)[0]
+    nx, ny, numChannels = im.shape
+    border = (smoothing - 1) >> 1
+    csm = np.zeros(im.shape, dtype=complex)
+    for xIndex in range(nx):
+        for yIndex in range(ny):
+            start = np.maximum(np.array([xIndex, yIndex]) - border, 0)
+            stop = np.minimum(start + smoothing, [nx, ny])
+            window = np.reshape(voxels[start[0]:stop[0], start[1]:stop[1]], [-1, numChannels])
+            correlation = np.dot(window.T, window.conj())
+            if np.max(np.abs(correlation)) == 0:
+                continue
+            eigenvalues, eigenvectors = np.linalg.eigh(correlation)
+            csm[xIndex, yIndex] = eigenvectors[:, -1]
+    return csm
+
+
+def CheckJerDataDriven(rng, dtype):
+    calShape = rng.integers(12, 21, 2)
+    numChannels = int(rng.integers(2, 5))
+    kernelShape = list(2 * rng.integers(1, 3, 2) + 1)
+    calData = RandomComplex(rng, tuple(calShape) + (numChannels,), dtype)
+    return ('cal {}x{} Nc {} kernel {}x{}'.format(calShape[0], calShape[1], numChannels, *kernelShape),
+            lambda: IsmrmSunrise.ComputeJerDataDriven(calData, kernelShape),
+            lambda: IsmrmSunrise.ComputeJerDataDrivenReference(calData, kernelShape),
+            MaxRelativeError)
+
+
+def CheckDvcKernels(rng, dtype):
+    imShape = rng.integers(24, 49, 2)
+    numChannels = int(rng.integers(2, 9))
+    kernelShape = list(2 * rng.integers(1, 4, 2) + 1)
+    oversampling = [rng.choice([1.0, 1.25, 1.5, 2.0])] * 2
+    channelImages = RandomSmoothImages(rng, imShape, numChannels, dtype)
+    vcImage = np.sum(channelImages * RandomComplex(rng, numChannels, dtype), axis=2)
+    return ('im {}x{} Nc {} kernel {}x{} os {}'.format(imShape[0], imShape[1], numChannels, kernelShape[0], kernelShape[1], oversampling[0]),
+            lambda: IsmrmSunrise.ComputeDvcKernels(channelImages, vcImage, kernelShape, oversampling),
+            lambda: IsmrmSunrise.ComputeDvcKernelsReference(channelImages, vcImage, kernelShape, oversampling),
+            MaxRelativeError)
+
+
+def CheckTransformKspaceToImage(rng, dtype):
+    kShape = rng.integers(8, 65, 2)
+    imShape = kShape + rng.integers(0, 2, 2) * rng.integers(0, 33, 2)
+    numChannels = int(rng.integers(1, 9))
+    kspace = RandomComplex(rng, tuple(kShape) + (numChannels,), dtype)
+    return ('k {}x{} -> im {}x{} Nc {}'.format(kShape[0], kShape[1], imShape[0], imShape[1], numChannels),
+            lambda: IsmrmSunrise.TransformKspaceToImage(kspace, [0, 1], list(imShape) + [numChannels]),
+            lambda: TransformKspaceToImageReference(kspace, imShape),
+            MaxRelativeError)
+
+
+def CheckTransformImageToKspace(rng, dtype):
+    imShape = rng.integers(8, 65, 2)
+    numChannels = int(rng.integers(1, 9))
+    im = RandomComplex(rng, tuple(imShape) + (numChannels,), dtype)
+    return ('im {}x{} Nc {}'.format(imShape[0], imShape[1], numChannels),
+            lambda: IsmrmSunrise.TransformImageToKspace(im, [0, 1]),
+            lambda: TransformImageToKspaceReference(im),
+            MaxRelativeError)
+
+
+def CheckAliasedTransform(rng, dtype):
+    accFactor = int(rng.integers(2, 5))
+    imShape = [int(rng.integers(8, 65)), accFactor * int(rng.integers(4, 33))]
+    numChannels = int(rng.integers(1, 9))
+    samplingPattern = IsmrmSunrise.SamplingPattern(imShape, accFactor, 0, int(rng.integers(0, accFactor)))
+    accelerated = IsmrmSunrise.AcceleratedKspace.FromFullData(RandomComplex(rng, tuple(imShape) + (numChannels,), dtype), samplingPattern)
+    return ('k {}x{} Nc {} R {}'.format(imShape[0], imShape[1], numChannels, accFactor),
+            lambda: accelerated.TransformToAliasedImage(),
+            lambda: IsmrmSunrise.TransformKspaceToImage(accelerated.ToFullData(IsmrmSunrise.SamplingPattern.ACCELERATED), [0, 1]),
+            MaxRelativeError)
+
+
+def CheckAliasedTransformIncomplete(rng, dtype):
+    """As CheckAliasedTransform, with the top ky lines missing (partial Fourier) and a few
+    random lines dropped, as in streamed frames and patterns read with SamplingPattern.FromArray."""
+    accFactor = int(rng.integers(2, 5))
+    imShape = [int(rng.integers(8, 65)), accFactor * int(rng.integers(8, 33))]
+    numChannels = int(rng.integers(1, 9))
+    patternImage = IsmrmSunrise.GenerateAcceleratedSamplingPattern(imShape, accFactor, 0, int(rng.integers(0, accFactor)))
+    numMissing = int(rng.integers(1, imShape[1] // 4))
+    patternImage[:, imShape[1]-numMissing:] = 0
+    acquired = np.nonzero(patternImage[0])[0]
+    patternImage[:, rng.choice(acquired[1:], 2, replace=False)] = 0
+    samplingPattern = IsmrmSunrise.SamplingPattern.FromArray(patternImage)
+    accelerated = IsmrmSunrise.AcceleratedKspace.FromFullData(RandomComplex(rng, tuple(imShape) + (numChannels,), dtype), samplingPattern)
+    return ('k {}x{} Nc {} R {} lines {}'.format(imShape[0], imShape[1], numChannels, accFactor, samplingPattern.NumLines()),
+            lambda: accelerated.TransformToAliasedImage(),
+            lambda: IsmrmSunrise.TransformKspaceToImage(accelerated.ToFullData(IsmrmSunrise.SamplingPattern.ACCELERATED), [0, 1]),
+            MaxRelativeError)
+
+
+def CheckSenseUnmixing(rng, dtype):
+    accFactor = int(rng.integers(2, 5))
+    imShape = [int(rng.integers(16, 49)), accFactor * int(rng.integers(4, 13))]
+    numChannels = int(rng.integers(accFactor, 9))
+    csm = RandomSmoothImages(rng, imShape, numChannels, dtype)
+    mixing = np.eye(numChannels) + 0.1 * RandomComplex(rng, (numChannels, numChannels), complex)
+    noiseMatrix = np.dot(mixing, mixing.conj().T)
+    return ('csm {}x{} Nc {} R {}'.format(imShape[0], imShape[1], numChannels, accFactor),
+            lambda: IsmrmSunrise.ComputeSenseUnmixing(accFactor, csm, noiseMatrix, 0.001),
+            lambda: ComputeSenseUnmixingReference(accFactor, csm, noiseMatrix, 0.001),
+            MaxRelativeError)
+
+
+def CheckCsmWalsh(rng, dtype):
+    imShape = rng.integers(16, 41, 2)
+    numChannels = int(rng.integers(2, 9))
+    im = RandomSmoothImages(rng, imShape, numChannels, dtype)
+    return ('im {}x{} Nc {}'.format(imShape[0], imShape[1], numChannels),
+            lambda: IsmrmSunrise.EstimateCsmWalsh(im),
+            lambda: EstimateCsmWalshReference(im),
+            SubspaceError)
+
+
+# (optimised function, reference, check, tolerance or None for TOLERANCES)
+# EstimateCsmWalsh uses a few power iterations rather than an exact eigendecomposition,
+# so it is only expected to agree to within the convergence of the power method
+CHECKS = [('ComputeJerDataDriven', 'ComputeJerDataDrivenReference', CheckJerDataDriven, None),
+          ('ComputeDvcKernels', 'ComputeDvcKernelsReference', CheckDvcKernels, 1e-6),
+          ('TransformKspaceToImage', 'DFT matrix', CheckTransformKspaceToImage, 1e-5),
+          ('TransformImageToKspace', 'DFT matrix', CheckTransformImageToKspace, 1e-5),
+          ('AcceleratedKspace.TransformToAliasedImage', 'zero-filled transform', CheckAliasedTransform, 1e-5),
+          ('AcceleratedKspace.TransformToAliasedImage', 'zero-filled transform, incomplete lattice', CheckAliasedTransformIncomplete, 1e-5),
+          ('ComputeSenseUnmixing', 'per pixel SENSE solve', CheckSenseUnmixing, None),
+          ('EstimateCsmWalsh', 'per pixel eigendecomposition', CheckCsmWalsh, 1e-4)]
+
+
+def RunEquivalenceChecks(numTrials=3, seed=0, dtypes=(np.complex64, np.complex128), names=None, verbose=True):
+    """Runs each check numTrials times per dtype on random inputs.
+
+    Returns
+    -------
+    results : list of dict
+        one row per trial with keys 'function', 'reference', 'dtype', 'case', 'error',
+        'tolerance', 'passed', 'time', 'referenceTime' and 'speedup'
+    """
+    rng = np.random.default_rng(seed)
+    results = []
+    for function, reference, check, tolerance in CHECKS:
+        if names is not None and function not in names:
+            continue
+        for dtype in dtypes:
+            for trial in range(numTrials):
+                case, fastFunction, referenceFunction, errorFunction = check(rng, dtype)
+                startTime = time.perf_counter()
+                fastResult = fastFunction()
+                fastTime = time.perf_counter() - startTime
+                startTime = time.perf_counter()
+                referenceResult = referenceFunction()
+                referenceTime = time.perf_counter() - startTime
+
+                error = float(errorFunction(fastResult, referenceResult))
+                rowTolerance = tolerance if tolerance is not None else TOLERANCES[dtype]
+                row = {'function': function, 'reference': reference, 'dtype': np.dtype(dtype).name, 'case': case,
+                       'error': error, 'tolerance': rowTolerance, 'passed': error <= rowTolerance,
+                       'time': fastTime, 'referenceTime': referenceTime, 'speedup': referenceTime / max(fastTime, 1e-9)}
+                results.append(row)
+                if verbose:
+                    PrintRow(row)
+    return results
+
+
+def CheckSubmoduleExports():
+    """Compares the names IsmrmSunrise exports lazily from each submodule (SUBMODULE_EXPORTS)
+    with the submodule's __all__. Returns a list of messages, one per mismatching submodule."""
+    import importlib
+    mismatches = []
+    for moduleName, names in IsmrmSunrise.SUBMODULE_EXPORTS.items():
+        module = importlib.import_module('IsmrmSunrise.' + moduleName)
+        if list(names) != list(module.__all__):
+            mismatches.append('IsmrmSunrise.SUBMODULE_EXPORTS[{!r}] = {} but {}.__all__ = {}'.format(moduleName, names, module.__name__, module.__all__))
+    return mismatches
+
+
+def PrintRow(row):
+    print('{:<42s} {:<11s} {:<38s} {:>9.2e} {:>9.2e} {:>8.1f}x {}'.format(
+        row['function'], row['dtype'], row['case'], row['error'], row['tolerance'], row['speedup'], 'ok' if row['passed'] else 'FAIL'))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Check optimised IsmrmSunrise functions against reference implementations')
+    parser.add_argument('--trials', type=int, default=3, help='random cases per function and dtype')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--functions', nargs='+', default=None, help='names of the functions to check. default is all')
+    args = parser.parse_args()
+
+    exportMismatches = CheckSubmoduleExports()
+    for message in exportMismatches:
+        print('FAIL ' + message)
+
+    print('{:<42s} {:<11s} {:<38s} {:>9s} {:>9s} {:>9s}'.format('function', 'dtype', 'case', 'max error', 'tolerance', 'speedup'))
+    results = RunEquivalenceChecks(args.trials, args.seed, names=args.functions)
+    if exportMismatches or not all(row['passed'] for row in results):
+        sys.exit(1)
@@ -0,0 +1,179 @@
+"""
+Code made available for the ISMRM 2015 Sunrise Educational Course
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+__all__ = ["CalibrationCache"]
+
+import hashlib
+import inspect
+import os
+import tempfile
+
+import numpy as np
+
+# part of every key. Increment when a change to the cached functions (or to functions 
+# they call from other modules) changes their results, to invalidate existing caches
+CACHE_VERSION = 1
+
+class CalibrationCache:
+    """On-disk cache of calibration results, keyed by a content hash of the input arrays
+    and parameters.
+
+    Rerunning a reconstruction on the same raw data (e.g. with different display settings)
+    loads the joint encoding relations, coil sensitivity maps, channel combination maps and
+    unmixing images from the cache instead of recomputing them.
+
+    Results are stored as .npy files, written to a temporary file and atomically renamed,
+    so several processes can share a cache directory. When the cache grows past maxBytes,
+    the least recently used results are removed.
+
+    Keys include CACHE_VERSION and a hash of the source of the module that defines the 
+    cached function, so that results computed by older code are not reused.
+
+    Parameters
+    ----------
+    directory : str
+        cache directory, created if it does not exist
+    maxBytes : int
+        maximum total size of cached results. None for no limit
+    mmapMode : str
+        passed to np.load, e.g. 'r' to memory-map cached results instead of reading them.
+        default is None (read into memory)
+
+    Examples
+    --------
+    cache = IsmrmSunrise.CalibrationCache('calibrationCache', maxBytes=2**30)
+    jerLookup = cache.ComputeJerDataDriven(calData, [5, 7])
+    unmix = cache.ComputeJerUnmixing(jerLookup, accFactor, ccm, 0.001)
+
+    Any function returning a single array can be cached with cache.Call(function, *args, **kwargs).
+    """
+    def __init__(self, directory, maxBytes=None, mmapMode=None):
+        self.directory = directory
+        self.maxBytes = maxBytes
+        self.mmapMode = mmapMode
+        # function -> hash of the source code of its module
+        self.codeVersions = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def ComputeJerDataDriven(self, calData, kernelShape):
+        from . import ParallelImagingCalibration
+        return self.Call(ParallelImagingCalibration.ComputeJerDataDriven, calData, list(kernelShape))
+
+    def EstimateCsmWalsh(self, im, smoothing=None):
+        from . import SensitivityEstimation
+        return self.Call(SensitivityEstimation.EstimateCsmWalsh, im, smoothing)
+
+    def ComputeCcmDvc(self, im, kernelSize=None, kernelOversampling=None, ccmShape=None):
+        from . import DVC
+        return self.Call(DVC.ComputeCcmDvc, im, kernelSize, kernelOversampling, ccmShape)
+
+    def ComputeJerUnmixing(self, jerLookup, accFactor, ccm, regularizationScale=0.0):
+        from . import ParallelImagingCalibration
+        return self.Call(ParallelImagingCalibration.ComputeJerUnmixing, jerLookup, accFactor, ccm, regularizationScale)
+
+    def Call(self, function, *args, **kwargs):
+        """Returns function(*args, **kwargs), from the cache if it has been computed before."""
+        path = os.path.join(self.directory, self.Key(function, *args, **kwargs) + '.npy')
+
+        try:
+            result = np.load(path, mmap_mode=self.mmapMode)
+            os.utime(path)
+            return result
+        except (FileNotFoundError, ValueError, EOFError, OSError):
+            # not cached, evicted by another process or partially written by an older version
+            pass
+
+        result = function(*args, **kwargs)
+        assert isinstance(result, np.ndarray), "CalibrationCache only caches functions returning a single array"
+        self.Store(path, result)
+        self.Evict()
+        return result
+
+    def Key(self, function, *args, **kwargs):
+        """Content hash of a function, the code version and the function's arguments."""
+        digest = hashlib.sha1()
+        digest.update('{}.{} {} {}'.format(function.__module__, function.__qualname__, CACHE_VERSION, self.CodeVersion(function)).encode())
+        for arg in list(args) + sorted(kwargs.items()):
+            HashArgument(digest, arg)
+        return digest.hexdigest()
+
+    def CodeVersion(self, function):
+        """Hash of the source code of the module defining function, or '' if it is not available."""
+        codeVersion = self.codeVersions.get(function)
+        if codeVersion is None:
+            try:
+                source = inspect.getsource(inspect.getmodule(function))
+            except (OSError, TypeError):
+                source = ''
+            codeVersion = hashlib.sha1(source.encode()).hexdigest() if source else ''
+            self.codeVersions[function] = codeVersion
+        return codeVersion
+
+    def Store(self, path, result):
+        fileHandle, tempPath = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fileHandle, 'wb') as f:
+                np.save(f, result)
+            os.replace(tempPath, path)
+        except FileNotFoundError:
+            # the temporary file was removed by Clear in another process; the result is not cached
+            pass
+        except BaseException:
+            if os.path.exists(tempPath):
+                os.remove(tempPath)
+            raise
+
+    def Evict(self):
+        """Removes least recently used results until the cache is within maxBytes."""
+        if self.maxBytes is None:
+            return
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.npy'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+
+        totalBytes = sum(entry[1] for entry in entries)
+        for (mtime, size, name) in sorted(entries):
+            if totalBytes <= self.maxBytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+            totalBytes -= size
+
+    def Clear(self):
+        """Removes all cached results, and temporary files left by interrupted writes."""
+        for name in os.listdir(self.directory):
+            if name.endswith('.npy') or name.endswith('.tmp'):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    pass
+
+
+def HashArgument(digest, arg):
+    """Adds an argument (array, scalar, sequence, dict or function) to a hash. Used by CalibrationCache."""
+    if isinstance(arg, np.ndarray):
+        digest.update('ndarray{}{}'.format(arg.dtype.str, arg.shape).encode())
+        digest.update(np.ascontiguousarray(arg).data)
+    elif isinstance(arg, (list, tuple)):
+        digest.update('{}{}'.format(type(arg).__name__, len(arg)).encode())
+        for elem in arg:
+            HashArgument(digest, elem)
+    elif isinstance(arg, dict):
+        HashArgument(digest, sorted(arg.items()))
+    elif callable(arg):
+        digest.update('{}.{}'.format(arg.__module__, getattr(arg, '__qualname__', repr(arg))).encode())
+    else:
+        digest.update(repr(arg).encode())
@@ -0,0 +1,164 @@
+"""
+Code made available for the ISMRM 2015 Sunrise Educational Course
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+__all__ = ["ComputeSvdCoilCompressionMatrix",
+           "ComputeGeometricCoilCompressionMatrices",
+           "ApplyCoilCompression",
+           "ApplyGeometricCoilCompression"]
+
+import numpy as np
+
+def ComputeSvdCoilCompressionMatrix(calData, numVirtualChannels):
+    """Computes a coil compression matrix from calibration data using the singular value
+    decomposition (Buehrer et al. Magn Reson Med 2007;57:1131-9, Huang et al. Magn Reson Imaging 2008;26:133-41.)
+
+    Compression should be applied after noise prewhitening (ApplyNoiseDecorrelationMatrix),
+    so that the noise covariance of the virtual channels is the identity. The same matrix
+    is applied to k-space data, channel images and coil sensitivity maps, after which
+    calibration (e.g. ComputeJerDataDriven, EstimateCsmWalsh) and unmixing run on
+    numVirtualChannels channels.
+
+    Parameters
+    ----------
+    calData : (kx, ky, ..., Nc) array
+        Calibration data (k-space or image space)
+    numVirtualChannels : int
+        Number of virtual channels to keep
+
+    Returns
+    -------
+    compressionMatrix : (Nc, numVirtualChannels) array
+        coil compression matrix with orthonormal columns, applied with ApplyCoilCompression
+    singularValues : (Nc,) array
+        singular values of the calibration data, e.g. to choose numVirtualChannels
+    """
+    numChannels = calData.shape[calData.ndim-1]
+    assert numVirtualChannels <= numChannels, "numVirtualChannels must not be larger than the number of channels"
+
+    calMatrix = np.reshape(calData, [calData.size // numChannels, numChannels], order='F')
+
+    # right singular vectors, from the (Nc, Nc) correlation matrix rather than the full SVD
+    correlation = np.dot(calMatrix.conj().T, calMatrix)
+    eigenvalues, eigenvectors = np.linalg.eigh(correlation)
+    order = np.argsort(eigenvalues)[::-1]
+    singularValues = np.sqrt(np.maximum(eigenvalues[order], 0))
+    compressionMatrix = eigenvectors[:, order[0:numVirtualChannels]]
+
+    return compressionMatrix, singularValues
+
+
+def ComputeGeometricCoilCompressionMatrices(calData, numVirtualChannels, readoutExtent=None):
+    """Computes geometric coil compression matrices, one per readout position,
+    from calibration data (Zhang et al. Magn Reson Med 2013;69:571-82.)
+
+    The readout (first) dimension is fully sampled, so it is transformed to image space
+    and a separate SVD compression is computed at each readout position. Adjacent
+    compression matrices are then aligned so that virtual channels vary smoothly along
+    the readout, which keeps k-space kernels (e.g. JER based calibration) valid.
+
+    Parameters
+    ----------
+    calData : (kx, ky, ..., Nc) array
+        Calibration data (k-space)
+    numVirtualChannels : int
+        Number of virtual channels to keep
+    readoutExtent : int
+        number of readout samples of the data the matrices will be applied to.
+        default is calData.shape[0]
+
+    Returns
+    -------
+    compressionMatrices : (Nx, Nc, numVirtualChannels) array
+        coil compression matrix for each readout position, applied with ApplyGeometricCoilCompression
+    """
+    from . import Transforms
+
+    if readoutExtent is None:
+        readoutExtent = calData.shape[0]
+    numChannels = calData.shape[calData.ndim-1]
+
+    outShape = list(calData.shape)
+    outShape[0] = readoutExtent
+    hybridData = Transforms.TransformKspaceToImage(calData, [0], outShape)
+    hybridData = np.reshape(hybridData, [readoutExtent, -1, numChannels], order='F')
+
+    compressionMatrices = np.zeros([readoutExtent, numChannels, numVirtualChannels], dtype=complex)
+    for xIndex in range(readoutExtent):
+        compressionMatrices[xIndex] = ComputeSvdCoilCompressionMatrix(hybridData[xIndex], numVirtualChannels)[0]
+
+    # align each position with its neighbour (orthogonal Procrustes), starting from the centre
+    center = readoutExtent >> 1
+    for xIndex in list(range(center+1, readoutExtent)) + list(range(center-1, -1, -1)):
+        neighbour = xIndex-1 if xIndex > center else xIndex+1
+        u, s, vh = np.linalg.svd(np.dot(compressionMatrices[xIndex].conj().T, compressionMatrices[neighbour]))
+        compressionMatrices[xIndex] = np.dot(compressionMatrices[xIndex], np.dot(u, vh))
+
+    return compressionMatrices
+
+
+def ApplyCoilCompression(data, compressionMatrix, chunkSize=None):
+    """Applies a coil compression matrix to data
+
+    Parameters
+    ----------
+    data : (Nx, Ny, ..., Nc) array
+        k-space data, channel images or coil sensitivity maps; last dimension is channels
+    compressionMatrix : (Nc, numVirtualChannels) array
+        e.g. as produced by ComputeSvdCoilCompressionMatrix
+    chunkSize : int
+        if given, data is processed this many elements of the first dimension at a time,
+        so that only one chunk of data needs to be in memory (e.g. for memory-mapped data)
+
+    Returns
+    -------
+    compressedData : (Nx, Ny, ..., numVirtualChannels) array
+        virtual channel data
+    """
+    numChannels = data.shape[data.ndim-1]
+    assert compressionMatrix.shape[0] == numChannels, "compressionMatrix shape should be numChannels x numVirtualChannels"
+
+    if chunkSize is None:
+        chunkSize = data.shape[0]
+
+    compressedData = np.zeros(data.shape[0:data.ndim-1] + (compressionMatrix.shape[1],), dtype=np.result_type(data.dtype, compressionMatrix.dtype))
+    for start in range(0, data.shape[0], chunkSize):
+        compressedData[start:start+chunkSize] = np.dot(np.asarray(data[start:start+chunkSize]), compressionMatrix)
+    return compressedData
+
+
+def ApplyGeometricCoilCompression(data, compressionMatrices, isKspace=True):
+    """Applies geometric coil compression matrices to data
+
+    Parameters
+    ----------
+    data : (Nx, Ny, ..., Nc) array
+        k-space data (isKspace=True), or channel images / coil sensitivity maps (isKspace=False);
+        last dimension is channels
+    compressionMatrices : (Nx, Nc, numVirtualChannels) array
+        one compression matrix per readout position, e.g. as produced by ComputeGeometricCoilCompressionMatrices
+    isKspace : bool
+        if True, data is transformed to image space along the readout before compression and back after
+
+    Returns
+    -------
+    compressedData : (Nx, Ny, ..., numVirtualChannels) array
+        virtual channel data
+    """
+    from . import Transforms
+
+    assert compressionMatrices.shape[0] == data.shape[0], "compressionMatrices must have one matrix per readout position"
+
+    if isKspace:
+        data = Transforms.TransformKspaceToImage(data, [0])
+
+    # (x, ..., c) x (x, c, v) -> (x, ..., v)
+    compressedData = np.einsum('x...c,xcv->x...v', data, compressionMatrices)
+
+    if isKspace:
+        compressedData = Transforms.TransformImageToKspace(compressedData, [0])
+    return compressedData
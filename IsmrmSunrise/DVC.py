@@ -1,14 +1,44 @@
-__all__ = ["CreateFourierEncodingImages", "ComputeDvcKernels", "ComputeCcmFromKernels", "ComputeCcmDvc", "GenerateVcBlocks", "FitToAffinePhase", "FitToConstantPhase", "StitchVcBlocks"]
+__all__ = ["CreateFourierEncodingPhasors", "CreateFourierEncodingImages", "ComputeDvcKernels", "ComputeDvcKernelsReference", "ComputeCcmFromKernels", "ComputeCcmDvc", "GenerateVcBlocks", "FitToAffinePhase", "FitToConstantPhase", "StitchVcBlocks"]
 
 import numpy as np
-import IsmrmSunrise
 
 
 
+def CreateFourierEncodingPhasors(imShape, kernelShape, kernelOversampling):
+    """Creates the 1-D Fourier encoding phasors along x and y for all kernel sample locations.
+    
+    The Fourier encoding images are separable, encodingImage(x, y) = xPhasors(x) * yPhasors(y), 
+    so these two small tables are enough to apply the encoding without forming 
+    the full set of encoding images.
+    
+    Parameters
+    ----------
+    imShape : length 2 vector
+        Shape of image [Nx, Ny] e.g. [128,128]
+    kernelShape : length 2 vector
+        Shape of k-space kernel. e.g. [5,5]
+    kernelOversampling : length 2 vector
+        k-space oversampling ratio. e.g. [1.25, 1.25]
+
+    Returns
+    -------
+    xPhasors : (Nx, kx) array
+        Fourier encoding along x for each kernel x location
+    yPhasors : (Ny, ky) array
+        Fourier encoding along y for each kernel y location
+    """
+    phasors = []
+    for dimIndex in range(2):
+        n = imShape[dimIndex]
+        k = (np.arange(0, kernelShape[dimIndex]) - kernelShape[dimIndex] * 0.5) / (kernelOversampling[dimIndex] * n)
+        phasors.append(np.exp(2.0j * np.pi * np.outer(np.arange(0, n), k)))
+    return phasors[0], phasors[1]
+
+
 def CreateFourierEncodingImages(imShape, kernelShape, kernelOversampling):
     """Creates Fourier incoding images for all kernel sample locations.
     
-    Not the most efficient thing to do, but easy to understand.
+    Formed as outer products of the separable phasors from CreateFourierEncodingPhasors.
     
     Parameters
     ----------
@@ -35,27 +65,11 @@ def CreateFourierEncodingImages(imShape, kernelShape, kernelOversampling):
         
     Philip J. Beatty (philip.beatty@gmail.com)    
     """
-    nx = imShape[0]
-    ny = imShape[1]    
-    numCoefficients = kernelShape[0] * kernelShape[1]
-
-    x = np.arange(0, nx)
-    y = np.arange(0, ny)
-    xv, yv = np.meshgrid(x,y, indexing='ij')
+    xPhasors, yPhasors = CreateFourierEncodingPhasors(imShape, kernelShape, kernelOversampling)
 
-    xkernelShape_2 = kernelShape[0] * 0.5
-    ykernelShape_2 = kernelShape[1] * 0.5
-
-    
-    # form Fourier encoding images
-    encodingImages = np.zeros((nx, ny, numCoefficients), dtype= complex)
-    for kyi in range(kernelShape[1]):
-        for kxi in range(kernelShape[0]):
-            kx = (kxi - xkernelShape_2) / (kernelOversampling[0] * nx)
-            ky = (kyi - ykernelShape_2) / (kernelOversampling[1] * ny)
-            encodingImages[:,:, kxi + kernelShape[0]*kyi] = np.exp(2.0j * np.pi * (kx * xv + ky * yv))
-    
-    return encodingImages
+    # kernel point index is kxi + kx * kyi
+    encodingImages = np.einsum('xa,yb->xyba', xPhasors, yPhasors)
+    return encodingImages.reshape((imShape[0], imShape[1], kernelShape[0] * kernelShape[1]))
     
     
 def ComputeDvcKernels(channelImages, vcImage, kernelShape, kernelOversampling):
@@ -88,6 +102,153 @@ def ComputeDvcKernels(channelImages, vcImage, kernelShape, kernelOversampling):
         
     Philip J. Beatty (philip.beatty@gmail.com)
   
+    """
+    numChannels = channelImages.shape[2]
+    kernelShape = np.asarray(kernelShape)
+    oversampledShape = np.asarray(kernelOversampling) * np.asarray(vcImage.shape)
+
+    # A = encodingImages * conj(vcImage), so A^H A only depends on the difference between 
+    # kernel locations: it samples the spectrum of |vcImage|^2 at deltas -(k-1)..(k-1)
+    weightSpectrum = ComputeLowFrequencyCoefficients(np.abs(vcImage)**2, 1-kernelShape, 2*kernelShape-1, oversampledShape)
+
+    kxIndex, kyIndex = np.meshgrid(np.arange(kernelShape[0]), np.arange(kernelShape[1]), indexing='ij')
+    kxIndex = kxIndex.flatten(order='F')
+    kyIndex = kyIndex.flatten(order='F')
+    # weight is real, so its spectrum at delta is the conj of the spectrum at -delta
+    Amatrix = weightSpectrum[kxIndex[:, np.newaxis] - kxIndex[np.newaxis, :] + kernelShape[0]-1, 
+                             kyIndex[:, np.newaxis] - kyIndex[np.newaxis, :] + kernelShape[1]-1]
+
+    # A^H b is the low frequency window of the spectrum of vcImage * conj(channelImages)
+    bmatrix = ComputeLowFrequencyCoefficients(vcImage[:,:,np.newaxis] * np.conj(channelImages), -0.5*kernelShape, kernelShape, oversampledShape)
+    bmatrix = np.reshape(bmatrix, [kernelShape[0] * kernelShape[1], numChannels], order='F')
+
+    x = np.linalg.solve(Amatrix, bmatrix)
+
+    kernels = np.reshape(x, tuple(kernelShape) + (numChannels,), order='F')
+    return kernels
+
+
+def ComputeLowFrequencyCoefficients(im, firstFrequency, numFrequencies, oversampledShape):
+    """Computes a window of (possibly oversampled) Fourier coefficients of an image
+    along its first two dimensions. Used by ComputeDvcKernels to form normal equations.
+
+    coeff[a, b, ...] = sum over x,y of im[x, y, ...] * exp(-2j*pi*((firstFrequency[0]+a)*x/oversampledShape[0] + (firstFrequency[1]+b)*y/oversampledShape[1]))
+
+    Uses a zero-padded FFT along dimensions where oversampledShape is an integer,
+    and a direct transform with a small phasor table otherwise.
+
+    Parameters
+    ----------
+    im : (Nx, Ny, ...) array
+        input image
+    firstFrequency : length 2 vector
+        first frequency of the window (in units of 1/oversampledShape), need not be an integer
+    numFrequencies : length 2 vector
+        number of frequencies in the window
+    oversampledShape : length 2 vector
+        image shape multiplied by the oversampling ratio, e.g. [160, 160] for 128x128 and 1.25 oversampling
+
+    Returns
+    -------
+    coeff : (numFrequencies[0], numFrequencies[1], ...) array
+        Fourier coefficients
+    """
+    coeff = im
+    for dimIndex in range(2):
+        n = coeff.shape[dimIndex]
+        m = oversampledShape[dimIndex]
+        reshapeExtent = np.ones(coeff.ndim, dtype=int)
+        reshapeExtent[dimIndex] = n
+        x = np.arange(0, n)
+        if m == np.round(m) and m >= max(n, numFrequencies[dimIndex]):
+            # shift window start to zero frequency, then FFT on the oversampled grid
+            shiftPhasor = np.reshape(np.exp(-2.0j * np.pi * firstFrequency[dimIndex] * x / m), reshapeExtent)
+            coeff = np.fft.fft(coeff * shiftPhasor, n=int(m), axis=dimIndex)
+            coeff = np.take(coeff, np.arange(0, numFrequencies[dimIndex]), axis=dimIndex)
+        else:
+            k = firstFrequency[dimIndex] + np.arange(0, numFrequencies[dimIndex])
+            phasors = np.exp(-2.0j * np.pi * np.outer(k, x) / m)
+            coeff = np.moveaxis(np.tensordot(phasors, coeff, axes=(1, dimIndex)), 0, dimIndex)
+    return coeff
+
+def SynthesizeFromLowFrequencyCoefficients(coeff, firstFrequency, outShape, oversampledShape):
+    """Synthesizes an image from a window of (possibly oversampled) Fourier coefficients
+    along the first two dimensions. Inverse operation to ComputeLowFrequencyCoefficients, 
+    used by ComputeCcmFromKernels.
+
+    im[x, y, ...] = sum over a,b of coeff[a, b, ...] * exp(2j*pi*((firstFrequency[0]+a)*x/oversampledShape[0] + (firstFrequency[1]+b)*y/oversampledShape[1]))
+
+    Uses a zero-padded inverse FFT along dimensions where oversampledShape is an integer, 
+    and a direct transform with a small phasor table otherwise.
+
+    Parameters
+    ----------
+    coeff : (kx, ky, ...) array
+        Fourier coefficients, e.g. k-space kernels
+    firstFrequency : length 2 vector
+        frequency of the first coefficient (in units of 1/oversampledShape), need not be an integer
+    outShape : length 2 vector
+        shape of image to produce (Nx, Ny)
+    oversampledShape : length 2 vector
+        image shape multiplied by the oversampling ratio, e.g. [160, 160] for 128x128 and 1.25 oversampling
+
+    Returns
+    -------
+    im : (Nx, Ny, ...) array
+        synthesized image
+    """
+    im = coeff
+    for dimIndex in range(2):
+        n = outShape[dimIndex]
+        m = oversampledShape[dimIndex]
+        numFrequencies = im.shape[dimIndex]
+        reshapeExtent = np.ones(im.ndim, dtype=int)
+        reshapeExtent[dimIndex] = n
+        x = np.arange(0, n)
+        if m == np.round(m) and m >= numFrequencies:
+            # synthesis is periodic in x with period m, so wrap when n > m
+            im = int(m) * np.fft.ifft(im, n=int(m), axis=dimIndex)
+            im = np.take(im, x % int(m), axis=dimIndex)
+            im = im * np.reshape(np.exp(2.0j * np.pi * firstFrequency[dimIndex] * x / m), reshapeExtent)
+        else:
+            k = firstFrequency[dimIndex] + np.arange(0, numFrequencies)
+            phasors = np.exp(2.0j * np.pi * np.outer(x, k) / m)
+            im = np.moveaxis(np.tensordot(phasors, im, axes=(1, dimIndex)), 0, dimIndex)
+    return im
+
+def ComputeDvcKernelsReference(channelImages, vcImage, kernelShape, kernelOversampling):
+    """ Computes Dvc kernels by forming the full encoding matrix.
+
+    This is not very efficient, but it is useful as a reference for testing
+    accelerated computation approaches such as ComputeDvcKernels.
+    
+    Parameters
+    ----------
+    channelImages : (Nx, Ny, Nc) array
+        Calibration channel images
+    vcImage : (Nx, Ny) array
+        Virtual coil image. Could also be an acquired calibration image from a 
+        coil with sensitivity over the entire imaging region.
+    kernelShape : length 2 vector
+        shape of k-space kernel [kx, ky] (e.g. [5,5])
+    kernelOversampling : length 2 vector
+        k-space oversampling ratio. e.g. [1.25, 1.25]
+
+    Returns
+    -------
+    kernels : (kx, ky, Nc) array
+        k-space kernels. Channel images can be convolved with these kernels and combined in k-space
+        
+    Notes
+    -----
+    Code made available for the ISMRM 2015 Sunrise Educational Course
+
+    This Source Code Form is subject to the terms of the Mozilla Public
+    License, v. 2.0. If a copy of the MPL was not distributed with this
+    file, You can obtain one at http://mozilla.org/MPL/2.0/.
+        
+    Philip J. Beatty (philip.beatty@gmail.com)
+  
     """
     numChannels = channelImages.shape[2]    
     
@@ -135,19 +296,14 @@ def ComputeCcmFromKernels(kernels, kernelOversampling, imShape):
         
     Philip J. Beatty (philip.beatty@gmail.com)    
     """
-    encodingImages = CreateFourierEncodingImages(imShape, [kernels.shape[0], kernels.shape[1]], kernelOversampling)
+    from . import ChannelCombination
+    kernelShape = np.asarray(kernels.shape[0:2])
+    oversampledShape = np.asarray(kernelOversampling) * np.asarray(imShape[0:2])
 
-    numCoefficients = encodingImages.shape[2]    
-    numChannels = kernels.shape[2]
-    nx = imShape[0]
-    ny = imShape[1]
+    # ccm is the (oversampled) inverse Fourier transform of the kernels
+    ccm = SynthesizeFromLowFrequencyCoefficients(kernels, -0.5*kernelShape, imShape, oversampledShape)
 
-    coeff = np.mat(np.reshape(kernels, [numCoefficients, numChannels], order='F'))
-    
-    ccm = np.mat(np.reshape(encodingImages, [nx*ny, numCoefficients], order='F')) * coeff
-
-    ccm = np.reshape(ccm.A, (nx, ny, numChannels), order='F')
-    ccm = IsmrmSunrise.ChannelCombination.NormalizeShadingToSoS(ccm)[0]
+    ccm = ChannelCombination.NormalizeShadingToSoS(ccm)[0]
     
     return ccm
 
@@ -181,6 +337,7 @@ def ComputeCcmDvc(im, kernelSize=None, kernelOversampling=None, ccmShape=None):
         
     Philip J. Beatty (philip.beatty@gmail.com)    
     """
+    from . import ChannelCombination
     if kernelOversampling is None:
         kernelOversampling = np.asarray([1.25, 1.25])
     if kernelSize is None:     
@@ -197,7 +354,7 @@ def ComputeCcmDvc(im, kernelSize=None, kernelOversampling=None, ccmShape=None):
 
     eigBlocks = GenerateVcBlocks(im, analysisBlockSize, synthesisBlockSize, synthesisOverlap)
 
-    vcImMag = IsmrmSunrise.ChannelCombination.ComputeRootSumOfSquaresChannelCombination(im)
+    vcImMag = ChannelCombination.ComputeRootSumOfSquaresChannelCombination(im)
 
     vcIm = np.exp(1j*StitchVcBlocks(eigBlocks, synthesisOverlap)) * vcImMag
 
@@ -240,25 +397,20 @@ def GenerateVcBlocks(im, analysisBlockSize, synthesisBlockSize, synthesisOverlap
         
     Philip J. Beatty (philip.beatty@gmail.com)    
     """
-    numChannels = im.shape[2]
-    correlationLookup = IsmrmSunrise.ComputeFullCorrelationLookup(im)    
-    matrixSet = IsmrmSunrise.ComputeMatrixSet(correlationLookup, analysisBlockSize, synthesisBlockSize, synthesisOverlap)
+    from . import SensitivityEstimation
+    correlationLookup = SensitivityEstimation.ComputeFullCorrelationLookup(im)    
+    matrixSet = SensitivityEstimation.ComputeMatrixSet(correlationLookup, analysisBlockSize, synthesisBlockSize, synthesisOverlap)
     nBlocks = matrixSet.shape[0:2]    
     matrixSet = matrixSet.reshape((np.prod(nBlocks),)+ matrixSet.shape[2:4], order='F')
     
-    blockEigVecs = np.reshape(IsmrmSunrise.ComputeDominantEigenvectors(matrixSet, 5), nBlocks + matrixSet.shape[2:4], order='F')
+    blockEigVecs = np.reshape(SensitivityEstimation.ComputeDominantEigenvectors(matrixSet, 5), nBlocks + matrixSet.shape[2:4], order='F')
     stepSize = synthesisBlockSize - synthesisOverlap
 
-    vcBlocks = np.zeros(tuple(synthesisBlockSize)+nBlocks, dtype=complex, order='F')
-    for yBlockIndex in range(nBlocks[1]):
-        for xBlockIndex in range(nBlocks[0]):
-            currLocation = np.array((xBlockIndex, yBlockIndex))
-            start = currLocation * stepSize
-            stop = start + synthesisBlockSize
-            currEigVec = blockEigVecs[xBlockIndex, yBlockIndex,:].reshape((1,1,numChannels))
-            currBlock = im[start[0]:stop[0],start[1]:stop[1],:]
-            currVcBlock = np.sum(np.conj(currEigVec) * currBlock, axis=2)
-            vcBlocks[:,:,xBlockIndex, yBlockIndex] = currVcBlock
+    # strided views of all synthesis blocks, (numBlocksx, numBlocksy, Nc, blockSizex, blockSizey)
+    blocks = np.lib.stride_tricks.sliding_window_view(im, tuple(synthesisBlockSize), axis=(0, 1))
+    blocks = blocks[::stepSize[0], ::stepSize[1]][0:nBlocks[0], 0:nBlocks[1]]
+
+    vcBlocks = np.asfortranarray(np.einsum('xyc,xycab->abxy', np.conj(blockEigVecs), blocks))
 
     return vcBlocks    
     
@@ -345,6 +497,16 @@ def FitToConstantPhase(phaseDiff):
 def StitchVcBlocks(eigBlocks, overlap):
     """Combines blocks by trying to align the phase in overlapping regions
     
+    The constant phase of each block is first synchronised on phasors: the 
+    block phasors are the leading eigenvector of the matrix of summed overlap 
+    products of neighbouring blocks (see SynchronizeBlockPhases). Unlike 
+    wrapped phase differences, these are consistent around loops of blocks. 
+    An affine phase is then fit to every block jointly, in a single weighted 
+    least squares problem: the corrected phase of neighbouring blocks should 
+    agree where they overlap, and the corrected phase of the centre block should 
+    be flat (this sets the otherwise arbitrary global phase). Like 
+    FitToAffinePhase, this doesn't try to do phase unwrapping within a block.
+    
     Parameters
     ----------
     eigBlocks: (blockSizex, blockSizey, numBlocksx, numBlocksy) 4-D array
@@ -368,33 +530,174 @@ def StitchVcBlocks(eigBlocks, overlap):
         
     Philip J. Beatty (philip.beatty@gmail.com)    
     """
-    from itertools import chain
+    import scipy.sparse
+    import scipy.sparse.linalg
     blockSize = np.asarray(eigBlocks.shape[0:2])
     nBlocks = np.asarray(eigBlocks.shape[2:4])
+    overlap = np.asarray(overlap)
     imShape = nBlocks * blockSize - (nBlocks-1)*overlap
-    im = np.zeros(imShape, dtype=complex, order='F')
     stepSize = blockSize-overlap
+    numBlocks = np.prod(nBlocks)
+
+    # affine phase parameters are (x slope, y slope, offset) per block.
+    # blockIndex = xBlockIndex + numBlocksx * yBlockIndex
+    blockIndices = np.arange(numBlocks).reshape(nBlocks, order='F')
+    # block coordinates are centred on the block to keep the fit well conditioned
+    xv, yv = np.meshgrid(np.arange(blockSize[0]) - 0.5*blockSize[0], np.arange(blockSize[1]) - 0.5*blockSize[1], indexing='ij')
+
+    # remove the constant phase of each block, so that the phase differences fit below are small
+    blockPhasors = SynchronizeBlockPhases(ComputeBlockOverlaps(eigBlocks, overlap, xv, yv), numBlocks)
+    eigBlocks = eigBlocks * np.conj(blockPhasors).reshape(tuple(nBlocks), order='F')
+
+    equations = [ComputePhaseFitEquations(*blockOverlap) for blockOverlap in ComputeBlockOverlaps(eigBlocks, overlap, xv, yv)]
+
+    # flat phase for the centre block
+    centreIndex = blockIndices[nBlocks[0]>>1, nBlocks[1]>>1]
+    coords = np.stack((xv.flatten(order='F'), yv.flatten(order='F'), np.ones(xv.size)), axis=1)
+    equations.append(ComputePhaseFitEquations(eigBlocks[:, :, nBlocks[0]>>1, nBlocks[1]>>1].reshape((-1, 1), order='F'), coords, None, np.array([centreIndex]), np.array([centreIndex])))
+
+    rows, cols, values, rhsRows, rhsValues = [np.concatenate(elems) for elems in zip(*equations)]
+    AHA = scipy.sparse.coo_matrix((values, (rows, cols)), shape=(3*numBlocks, 3*numBlocks)).tocsc()
+    AHb = np.bincount(rhsRows, weights=rhsValues, minlength=3*numBlocks)
 
+    # slight regularization, relative to each parameter's own weight, keeps blocks without 
+    # signal (not connected to the others) at zero phase without biasing weak blocks
+    diagonal = AHA.diagonal()
+    regularization = 1e-9 * diagonal + 1e-12 * np.max(diagonal)
+    coeff = scipy.sparse.linalg.spsolve(AHA + scipy.sparse.diags(regularization, format='csc'), AHb).reshape((numBlocks, 3))
 
-    yIndexOrder = chain(range(nBlocks[1])[(nBlocks[1]>>1)::-1], range(nBlocks[1])[((nBlocks[1]>>1)+1)::])
-    xIndexOrder = chain(range(nBlocks[0])[(nBlocks[0]>>1)::-1], range(nBlocks[0])[((nBlocks[0]>>1)+1)::])
+    phaseCorrection = np.exp(1j * (xv[:, :, np.newaxis] * coeff[:, 0] + yv[:, :, np.newaxis] * coeff[:, 1] + coeff[:, 2]))
+    correctedBlocks = eigBlocks * phaseCorrection.reshape(tuple(blockSize) + tuple(nBlocks), order='F')
 
-    firstBlock = True
-    for iby in yIndexOrder:
-        for ibx in xIndexOrder:
-            currLocation = np.array((ibx, iby))
-            start = currLocation * stepSize
+    # blend overlapping blocks
+    im = np.zeros(imShape, dtype=complex, order='F')
+    for iby in range(nBlocks[1]):
+        for ibx in range(nBlocks[0]):
+            start = np.array((ibx, iby)) * stepSize
             stop = start + blockSize
-            if firstBlock :
-                newPhase = eigBlocks[:,:,ibx, iby]
-                phaseCorrection = FitToAffinePhase(newPhase)
-                im[start[0]:stop[0], start[1]:stop[1]] = phaseCorrection*newPhase
-                firstBlock = False
-            else:
-                existingPhase = im[start[0]:stop[0], start[1]:stop[1]]
-                newPhase = eigBlocks[:,:,ibx, iby]
-                phaseDiff = newPhase * np.conj(existingPhase)
-                phaseCorrection = FitToAffinePhase(phaseDiff)
-                im[start[0]:stop[0], start[1]:stop[1]] = phaseCorrection * newPhase
+            im[start[0]:stop[0], start[1]:stop[1]] += correctedBlocks[:, :, ibx, iby]
     return np.angle(im)
 
+
+def ComputeBlockOverlaps(eigBlocks, overlap, xv, yv):
+    """Overlap products of each block and its neighbours, with the arguments of 
+    ComputePhaseFitEquations. Used by StitchVcBlocks.
+
+    Returns
+    -------
+    blockOverlaps : list of (phaseDiff, coords1, coords2, index1, index2)
+        one entry per dimension along which neighbouring blocks overlap, see ComputePhaseFitEquations
+    """
+    blockSize = np.asarray(eigBlocks.shape[0:2])
+    nBlocks = np.asarray(eigBlocks.shape[2:4])
+    stepSize = blockSize-overlap
+    blockIndices = np.arange(np.prod(nBlocks)).reshape(nBlocks, order='F')
+
+    blockOverlaps = []
+    for dimIndex in range(2):
+        if nBlocks[dimIndex] < 2 or overlap[dimIndex] <= 0:
+            continue
+        # overlap between each block and its neighbour along dimIndex
+        first = [slice(None)] * 4
+        second = [slice(None)] * 4
+        first[dimIndex] = slice(stepSize[dimIndex], blockSize[dimIndex])
+        second[dimIndex] = slice(0, overlap[dimIndex])
+        first[2+dimIndex] = slice(0, -1)
+        second[2+dimIndex] = slice(1, None)
+        phaseDiff = eigBlocks[tuple(first)] * np.conj(eigBlocks[tuple(second)])
+        numPairs = phaseDiff.shape[2] * phaseDiff.shape[3]
+        phaseDiff = phaseDiff.reshape((-1, numPairs), order='F')
+
+        coords1 = np.stack((xv[tuple(first[0:2])].flatten(order='F'), yv[tuple(first[0:2])].flatten(order='F'), np.ones(phaseDiff.shape[0])), axis=1)
+        coords2 = np.stack((xv[tuple(second[0:2])].flatten(order='F'), yv[tuple(second[0:2])].flatten(order='F'), np.ones(phaseDiff.shape[0])), axis=1)
+        blockOverlaps.append((phaseDiff, coords1, coords2, blockIndices[tuple(first[2:4])].flatten(order='F'), blockIndices[tuple(second[2:4])].flatten(order='F')))
+    return blockOverlaps
+
+
+def SynchronizeBlockPhases(blockOverlaps, numBlocks):
+    """Constant phase of each block, as a phasor, up to a global phase. Used by StitchVcBlocks.
+
+    The overlap products of the block pairs are summed into a Hermitian 
+    (numBlocks, numBlocks) matrix, whose element (i, j) is approximately 
+    weight * exp(1j*(phase_i - phase_j)). Its leading eigenvector is a least squares 
+    solution for exp(1j*phase) of all blocks at once, which, unlike fitting the wrapped 
+    pairwise phase differences, is not affected by their 2 pi ambiguity.
+
+    Parameters
+    ----------
+    blockOverlaps : list of (phaseDiff, coords1, coords2, index1, index2)
+        see ComputeBlockOverlaps
+    numBlocks : int
+        total number of blocks
+
+    Returns
+    -------
+    blockPhasors : (numBlocks,) array
+        exp(1j*phase) of each block. Blocks not connected to the others by signal get a phasor of 1
+    """
+    overlapMatrix = np.zeros((numBlocks, numBlocks), dtype=complex)
+    for phaseDiff, coords1, coords2, index1, index2 in blockOverlaps:
+        pairSums = np.sum(phaseDiff, axis=0)
+        np.add.at(overlapMatrix, (index1, index2), pairSums)
+        np.add.at(overlapMatrix, (index2, index1), np.conj(pairSums))
+    if not np.any(overlapMatrix):
+        return np.ones(numBlocks, dtype=complex)
+
+    eigenvalues, eigenvectors = np.linalg.eigh(overlapMatrix)
+    leading = eigenvectors[:, -1]
+    return np.where(np.abs(leading) > 1e-12 * np.max(np.abs(leading)), np.exp(1j*np.angle(leading)), 1)
+
+
+def ComputePhaseFitEquations(phaseDiff, coords1, coords2, index1, index2):
+    """Computes the weighted least squares normal equations for a set of block pairs, 
+    in sparse (coordinate) form. Used by StitchVcBlocks.
+
+    For each pixel of a pair the residual is 
+    (coords1 . params[index1] - coords2 . params[index2] + angle(phaseDiff)) * abs(phaseDiff), 
+    i.e. the affine phase correction of the two blocks should cancel the phase difference between them.
+    params are the 3 affine phase parameters of each block, flattened as 3 * blockIndex + parameterIndex.
+
+    Parameters
+    ----------
+    phaseDiff : (numPixels, numPairs) array
+        block1 * conj(block2) over the overlap of each pair
+    coords1 : (numPixels, 3) array
+        (x, y, 1) block coordinates of the overlap pixels in the first block of each pair
+    coords2 : (numPixels, 3) array
+        (x, y, 1) block coordinates of the overlap pixels in the second block of each pair.
+        None fits the first block on its own, with phaseDiff being its phase.
+    index1 : (numPairs,) array
+        block index of the first block of each pair
+    index2 : (numPairs,) array
+        block index of the second block of each pair
+
+    Returns
+    -------
+    rows, cols, values : 1-D arrays
+        entries of the normal matrix, duplicates are to be summed
+    rhsRows, rhsValues : 1-D arrays
+        entries of the right hand side, duplicates are to be summed
+    """
+    anchorPhase = np.angle(phaseDiff[np.argmax(np.abs(phaseDiff), axis=0), np.arange(phaseDiff.shape[1])])
+    phase = np.angle(phaseDiff * np.exp(-1j*anchorPhase)) + anchorPhase
+    # normalized so that the equations from separate calls are comparably weighted
+    weighting = np.abs(phaseDiff)**2
+    weighting = weighting / max(np.max(weighting), np.finfo(float).tiny)
+
+    terms = [(coords1, index1, 1.0)]
+    if coords2 is not None:
+        terms.append((coords2, index2, -1.0))
+
+    paramIndex = np.arange(3)
+    rows, cols, values, rhsRows, rhsValues = [], [], [], [], []
+    for (coordsA, indexA, signA) in terms:
+        rhsRows.append((3 * indexA[:, np.newaxis] + paramIndex).flatten())
+        rhsValues.append((-signA * np.dot(weighting.T * phase.T, coordsA)).flatten())
+        for (coordsB, indexB, signB) in terms:
+            coordsAB = (coordsA[:, :, np.newaxis] * coordsB[:, np.newaxis, :]).reshape((-1, 9))
+            blockValues = signA * signB * np.dot(weighting.T, coordsAB).reshape((-1, 3, 3))
+            rows.append(np.broadcast_to(3 * indexA[:, np.newaxis, np.newaxis] + paramIndex[:, np.newaxis], blockValues.shape).flatten())
+            cols.append(np.broadcast_to(3 * indexB[:, np.newaxis, np.newaxis] + paramIndex, blockValues.shape).flatten())
+            values.append(blockValues.flatten())
+
+    return np.concatenate(rows), np.concatenate(cols), np.concatenate(values), np.concatenate(rhsRows), np.concatenate(rhsValues)
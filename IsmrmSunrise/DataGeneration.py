@@ -1,4 +1,4 @@
-__all__=["GenerateAcceleratedSamplingPattern", "ExtractCalData"]
+__all__=["GenerateAcceleratedSamplingPattern", "SamplingPattern", "AcceleratedKspace", "FindCalibrationRegion", "ExtractCalData"]
 
 import numpy as np
 
@@ -32,44 +32,319 @@ def GenerateAcceleratedSamplingPattern(dataShape, acc, ref=0, sshift=0):
     Philip J. Beatty (philip.beatty@gmail.com)    
     """
 
-    sshift = sshift % acc
+    return SamplingPattern(dataShape, acc, ref, sshift).ToArray()
 
 
-    # Generate parallel imaging undersampling pattern
+class SamplingPattern:
+    """Accelerated Cartesian sampling pattern, stored as the indices of the acquired 
+    phase encoding lines rather than as a full k-space image.
 
-    accBim = np.zeros(dataShape)
-    accBim[:,sshift::acc] = 1
+    Phase encoding dimensions are all dimensions after the first (readout) dimension, 
+    i.e. ky for (kx, ky) data and (ky, kz) for (kx, ky, kz) data. Lines are acquired on 
+    a regular lattice (acceleration and shift per phase encoding dimension) plus a 
+    fully sampled block of reference lines in the centre of k-space.
 
-    # Generate reference lines pattern
-    refBim = np.zeros(dataShape)
-    if ref > 0:
-        startIndex = int((dataShape[1]-ref) / 2)
-        endIndex = startIndex + ref
-        refBim[:,startIndex:endIndex]= 2
+    Parameters
+    ----------
+    dataShape : tuple
+        matrix shape of fully sampled k-space data (kx, ky) or (kx, ky, kz)
+    acc : int or vector
+        Acceleration factor, per phase encoding dimension
+    ref : int or vector
+        Number of reference lines in center of k-space, per phase encoding dimension
+    sshift : int or vector
+        Sampling shift; index of line to start sampling, per phase encoding dimension
+
+    Attributes
+    ----------
+    lines : (numLines, numPhaseEncodingDims) int array
+        phase encoding indices of all acquired lines
+    lineTypes : (numLines,) int array
+        1 = accelerated line, 2 = reference line, 3 = both 
+        (same values as GenerateAcceleratedSamplingPattern)
+    refStart, refStop : (numPhaseEncodingDims,) int arrays
+        extent of the reference block along each phase encoding dimension
+    """
+    ACCELERATED = 1
+    REFERENCE = 2
+
+    def __init__(self, dataShape, acc, ref=0, sshift=0):
+        self.shape = tuple(int(n) for n in dataShape)
+        peShape = np.asarray(self.shape[1:])
+        numPeDims = peShape.size
+
+        self.acc = np.broadcast_to(np.asarray(acc, dtype=int), (numPeDims,)).copy()
+        self.ref = np.broadcast_to(np.asarray(ref, dtype=int), (numPeDims,)).copy()
+        self.sshift = np.broadcast_to(np.asarray(sshift, dtype=int), (numPeDims,)) % self.acc
+
+        self.refStart = ((peShape - self.ref) / 2).astype(int)
+        self.refStop = self.refStart + self.ref
+        if np.any(self.ref <= 0):
+            self.refStart = np.zeros(numPeDims, dtype=int)
+            self.refStop = np.zeros(numPeDims, dtype=int)
+
+        peIndices = np.indices(peShape).reshape((numPeDims, -1)).T
+        isAccelerated = np.all(peIndices % self.acc == self.sshift, axis=1)
+        isReference = np.all((peIndices >= self.refStart) & (peIndices < self.refStop), axis=1)
+        lineTypes = self.ACCELERATED * isAccelerated + self.REFERENCE * isReference
+
+        acquired = np.nonzero(lineTypes)[0]
+        self.lines = peIndices[acquired]
+        self.lineTypes = lineTypes[acquired]
+
+    @classmethod
+    def FromArray(cls, samplingPattern):
+        """Creates a SamplingPattern from a sampling pattern image with the values
+        used by GenerateAcceleratedSamplingPattern (0 = not acquired, 1 = accelerated, 
+        2 = reference, 3 = both). Acquisition is assumed constant along the readout."""
+        samplingPattern = np.asarray(samplingPattern)
+        pattern = cls(samplingPattern.shape, 1)
+        peImage = np.round(samplingPattern[0]).astype(int)
+        acquired = np.nonzero(peImage.flatten())[0]
+        pattern.lines = np.array(np.unravel_index(acquired, peImage.shape)).T
+        pattern.lineTypes = peImage.flatten()[acquired]
+
+        isAccelerated = (pattern.lineTypes & cls.ACCELERATED) > 0
+        for dimIndex in range(peImage.ndim):
+            acceleratedLines = np.unique(pattern.lines[isAccelerated, dimIndex])
+            if acceleratedLines.size > 1:
+                pattern.acc[dimIndex] = np.min(np.diff(acceleratedLines))
+            if acceleratedLines.size > 0:
+                pattern.sshift[dimIndex] = acceleratedLines[0] % pattern.acc[dimIndex]
+
+        isReference = (pattern.lineTypes & cls.REFERENCE) > 0
+        if np.any(isReference):
+            pattern.refStart = np.min(pattern.lines[isReference], axis=0)
+            pattern.refStop = np.max(pattern.lines[isReference], axis=0) + 1
+        pattern.ref = pattern.refStop - pattern.refStart
+        return pattern
+
+    def LineIndices(self, lineType=None):
+        """Indices (into lines) of the acquired lines of a given type.
+        lineType : None (all acquired lines), SamplingPattern.ACCELERATED or SamplingPattern.REFERENCE"""
+        if lineType is None:
+            return np.arange(self.lines.shape[0])
+        return np.nonzero(self.lineTypes & lineType)[0]
+
+    def NumLines(self, lineType=None):
+        return self.LineIndices(lineType).size
+
+    def Mask(self, lineType=None):
+        """Binary (kx, ky, ...) mask of the acquired lines of a given type.
+        Returned as a read-only view that is constant along the readout dimension."""
+        mask = np.zeros(self.shape[1:], dtype=bool)
+        mask[tuple(self.lines[self.LineIndices(lineType)].T)] = True
+        return np.broadcast_to(mask, self.shape)
+
+    def ToArray(self):
+        """Sampling pattern image with the values used by GenerateAcceleratedSamplingPattern."""
+        peImage = np.zeros(self.shape[1:])
+        peImage[tuple(self.lines.T)] = self.lineTypes
+        return np.tile(peImage, (self.shape[0],) + (1,) * len(self.shape[1:]))
+
+    def Gather(self, data, lineType=None):
+        """Gathers the acquired lines of a given type from (kx, ky, ..., Nc) data.
+
+        Returns
+        -------
+        lineData : (kx, numLines, Nc) array
+            acquired lines, in the order of lines[LineIndices(lineType)]
+        """
+        lineIndices = self.LineIndices(lineType)
+        return data[(slice(None),) + tuple(self.lines[lineIndices].T)]
+
+    def Scatter(self, lineData, lineType=None, dtype=None):
+        """Scatters lines gathered with Gather back into zero-filled (kx, ky, ..., Nc) data."""
+        lineIndices = self.LineIndices(lineType)
+        if dtype is None:
+            dtype = lineData.dtype
+        data = np.zeros(self.shape + lineData.shape[2:], dtype=dtype)
+        data[(slice(None),) + tuple(self.lines[lineIndices].T)] = lineData
+        return data
+
+
+class AcceleratedKspace:
+    """Accelerated k-space data holding only the acquired lines, together with their 
+    SamplingPattern, instead of zero-filled full k-space.
+
+    Parameters
+    ----------
+    samplingPattern : SamplingPattern
+        sampling pattern of the acquired lines
+    lineData : (kx, numLines, Nc) array
+        acquired lines, in the order of samplingPattern.lines
+    """
+    def __init__(self, samplingPattern, lineData):
+        assert lineData.shape[1] == samplingPattern.NumLines(), "lineData must contain all acquired lines"
+        self.samplingPattern = samplingPattern
+        self.lineData = lineData
+
+    @classmethod
+    def FromFullData(cls, data, samplingPattern):
+        """Keeps only the acquired lines of full (or zero-filled) (kx, ky, ..., Nc) data."""
+        return cls(samplingPattern, samplingPattern.Gather(data))
+
+    @property
+    def nbytes(self):
+        return self.lineData.nbytes
+
+    def Lines(self, lineType=None):
+        """(kx, numLines, Nc) acquired lines of a given type, e.g. SamplingPattern.ACCELERATED"""
+        if lineType is None:
+            return self.lineData
+        return self.lineData[:, self.samplingPattern.LineIndices(lineType)]
+
+    def ToFullData(self, lineType=None):
+        """Zero-filled (kx, ky, ..., Nc) k-space with the acquired lines of a given type."""
+        return self.samplingPattern.Scatter(self.Lines(lineType), lineType)
 
+    def CalData(self, maxReadoutWidth=-1):
+        """(kx, ky, ..., Nc) calibration data, see ExtractCalData. For (kx, ky) data the 
+        calibration lines are consecutive in lineData and this is a view, not a copy."""
+        pattern = self.samplingPattern
+        calRegion = FindCalibrationRegion(pattern, maxReadoutWidth)
+        inRegion = np.all([(pattern.lines[:, dimIndex] >= calRegion[dimIndex+1].start) & (pattern.lines[:, dimIndex] < calRegion[dimIndex+1].stop) 
+                           for dimIndex in range(len(pattern.shape)-1)], axis=0)
+        calLines = np.nonzero(inRegion)[0]
+        calShape = tuple(region.stop - region.start for region in calRegion)
+        if len(pattern.shape) == 2:
+            return self.lineData[calRegion[0], calLines[0]:calLines[-1]+1]
+        return self.lineData[calRegion[0]][:, calLines].reshape(calShape + self.lineData.shape[2:])
+
+    def TransformToAliasedImage(self, reducedFov=False):
+        """Aliased channel images from the accelerated (uniformly undersampled) lines.
+
+        Equivalent to TransformKspaceToImage(ToFullData(SamplingPattern.ACCELERATED), [0, 1]) 
+        for (kx, ky, Nc) data, but the ky transform only has length ky/acc. 
+        With reducedFov, returns only the central ky/acc rows of the aliased image.
+
+        Lattice positions sshift + acc*k that were not acquired (partial Fourier, dropped 
+        or not yet received lines) are zero-filled. If any accelerated line is off the 
+        lattice, or ky is not a multiple of acc, the zero-filled full transform is used.
+        """
+        from . import Transforms
+        pattern = self.samplingPattern
+        lineType = SamplingPattern.ACCELERATED
+        fullExtent = pattern.shape[1]
+        acc = pattern.acc[0]
+        kyLines = pattern.lines[pattern.LineIndices(lineType), 0]
+        if len(pattern.shape) != 2 or fullExtent % acc != 0 or np.any(kyLines % acc != pattern.sshift[0]):
+            assert not reducedFov, "reducedFov requires (kx, ky) data with the accelerated lines on a lattice of period acc dividing ky"
+            return Transforms.TransformKspaceToImage(self.ToFullData(lineType), range(len(pattern.shape)))
+
+        lineData = self.Lines(lineType)
+        numLatticeLines = fullExtent // acc
+        if kyLines.size != numLatticeLines:
+            latticeData = np.zeros((lineData.shape[0], numLatticeLines) + lineData.shape[2:], dtype=lineData.dtype)
+            latticeData[:, (kyLines - pattern.sshift[0]) // acc] = lineData
+            lineData = latticeData
+        im = Transforms.TransformKspaceToImage(lineData, [0])
+        return Transforms.TransformUndersampledKspaceToImage(im, acc, fullExtent, pattern.sshift[0], 1, reducedFov)
+
+
+def FindCalibrationRegion(samplingPattern, maxReadoutWidth=-1):
+    """Finds the region of contiguously sampled calibration data in k-space.
+
+    Along each dimension, the calibration region spans the acquired samples that belong 
+    to runs of at least 3 contiguous acquired samples.
+
+    Parameters
+    ----------
+    samplingPattern : SamplingPattern or (kx, ky, ...) array
+        sampling pattern. If an array:
+        0 = not acquired
+        >0 = acquired
+    maxReadoutWidth : int
+        if > 0, the calibration region along kx is limited to this many central samples
+
+    Returns
+    -------
+    calRegion : tuple of slices
+        calibration region along (kx, ky, ...)
+    """
+    if isinstance(samplingPattern, SamplingPattern):
+        # readout is fully sampled; phase encoding mask comes from the line indices
+        shape = samplingPattern.shape
+        readoutProjection = np.ones(shape[0], dtype=bool)
+        peMask = np.zeros(shape[1:], dtype=bool)
+        peMask[tuple(samplingPattern.lines.T)] = True
+    else:
+        samplingPattern = np.asarray(samplingPattern) > 0
+        shape = samplingPattern.shape
+        readoutProjection = np.any(samplingPattern, axis=tuple(range(1, len(shape))))
+        peMask = np.any(samplingPattern, axis=0)
+
+    calRegion = [FindContiguousRun(readoutProjection)]
+    if peMask.ndim == 1:
+        calRegion.append(FindContiguousRun(peMask))
+    else:
+        # grow a fully sampled block outwards from the centre of k-space
+        start = np.array(peMask.shape) >> 1
+        stop = start + 1
+        assert peMask[tuple(start)], "no contiguous calibration region found"
+        growing = True
+        while growing:
+            growing = False
+            for dimIndex in range(peMask.ndim):
+                # candidate face just below start and just above stop
+                for (bound, faceIndex, step) in ((start, start[dimIndex]-1, -1), (stop, stop[dimIndex], 1)):
+                    if faceIndex < 0 or faceIndex >= peMask.shape[dimIndex]:
+                        continue
+                    face = [slice(start[d], stop[d]) for d in range(peMask.ndim)]
+                    face[dimIndex] = faceIndex
+                    if np.all(peMask[tuple(face)]):
+                        bound[dimIndex] += step
+                        growing = True
+        calRegion.extend(slice(start[d], stop[d]) for d in range(peMask.ndim))
+
+    if maxReadoutWidth > 0:
+        calRegion[0] = slice((shape[0]-maxReadoutWidth)//2, (shape[0]+maxReadoutWidth)//2)
+
+    return tuple(calRegion)
+
+
+def FindContiguousRun(projection):
+    """Finds the extent of the samples of a 1-D mask that belong to runs of at least 3
+    contiguous samples (i.e. the nonzero region after binary opening with a length 3 structure).
+    Used by FindCalibrationRegion.
+
+    Parameters
+    ----------
+    projection : 1-D bool array
+        acquired samples
+
+    Returns
+    -------
+    run : slice
+        from the first to the last sample in a run of at least 3
+    """
+    edges = np.diff(np.concatenate(([0], projection.astype(int), [0])))
+    runStarts = np.nonzero(edges == 1)[0]
+    runStops = np.nonzero(edges == -1)[0]
+    longRuns = (runStops - runStarts) >= 3
+    assert np.any(longRuns), "no contiguous calibration region found"
+    return slice(np.min(runStarts[longRuns]), np.max(runStops[longRuns]))
 
-    imBim = accBim + refBim
 
-    return imBim
-    
 def ExtractCalData(data, samplingPattern=None, maxReadoutWidth=-1):
-    import scipy.ndimage.morphology
     """Extract region of calibration data from an internally calibrated data set.
 
     Parameters
     ----------
-    data : (kx, ky, Nc) array
+    data : (kx, ky, Nc) or (kx, ky, kz, Nc) array
         accelerated data set with zeros in the unacquired frames.
-    samplingPattern : (kx, ky) array
+    samplingPattern : SamplingPattern or (kx, ky) / (kx, ky, kz) array
         sampling pattern mask.
         0 = not acquired
         >0 = acquired
         if None, uses np.max(np.abs(data))
+    maxReadoutWidth : int
+        if > 0, calibration data is limited to this many central samples along kx
 
     Returns
     -------
-    calData : (kx, ky, Nc) array
-        calibration data sub matrix
+    calData : (kx, ky, Nc) or (kx, ky, kz, Nc) array
+        calibration data sub matrix. This is a view into data, not a copy.
 
     Notes
     -----
@@ -82,24 +357,6 @@ def ExtractCalData(data, samplingPattern=None, maxReadoutWidth=-1):
     Philip J. Beatty (philip.beatty@gmail.com)
     """
     if samplingPattern is None:
-        samplingPattern = np.max(np.abs(data), 2)
-    ky_projection = np.max(samplingPattern, axis=0)
-    kx_projection = np.max(samplingPattern, axis=1)
-    
-    ky_contiguous = scipy.ndimage.morphology.binary_opening(ky_projection, structure=np.ones((3,)))    
-    kx_contiguous = scipy.ndimage.morphology.binary_opening(kx_projection, structure=np.ones((3,)))    
-    
-    cal_indx = np.nonzero(kx_contiguous)
-    cal_indy = np.nonzero(ky_contiguous)
-
-    kx_cal_bounds = np.arange(np.min(cal_indx), np.max(cal_indx)+1)
-    if maxReadoutWidth > 0:
-        kx_cal_bounds = np.arange((samplingPattern.shape[0]-maxReadoutWidth)//2, (samplingPattern.shape[0]+maxReadoutWidth)//2)
-    
-    
-    ky_cal_bounds = np.arange(np.min(cal_indy), np.max(cal_indy)+1)
-    channelBounds = np.arange(0, data.shape[2])
-    
-    cal_data = data[np.ix_(kx_cal_bounds, ky_cal_bounds, channelBounds)]
-    
-    return cal_data
\ No newline at end of file
+        samplingPattern = np.max(np.abs(data), data.ndim-1)
+
+    return data[FindCalibrationRegion(samplingPattern, maxReadoutWidth)]
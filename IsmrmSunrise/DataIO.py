@@ -0,0 +1,208 @@
+"""
+Code made available for the ISMRM 2015 Sunrise Educational Course
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+__all__ = ["LoadArray", "LazyMatArray", "IterateChunks", "ProcessInChunks"]
+
+import os
+
+import numpy as np
+
+def LoadArray(path, variableName=None, lazy=True):
+    """Opens an array from a .npy file or a .mat file without reading it into memory.
+
+    .npy files are memory-mapped. MATLAB v7.3 .mat files (and other HDF5 files) are opened
+    with h5py and returned as a LazyMatArray, which reads only the requested part of the
+    array when indexed. Older .mat files cannot be read lazily and are loaded with scipy.io.
+
+    Parameters
+    ----------
+    path : str
+        .npy, .mat or .h5 file
+    variableName : str
+        name of the variable in a .mat or HDF5 file. If None and the file contains a
+        single variable, that variable is used
+    lazy : bool
+        if False, the whole array is read into memory
+
+    Returns
+    -------
+    data : array-like
+        np.memmap, LazyMatArray or np.ndarray. All can be sliced like an array;
+        slices are read from disk as needed
+    """
+    extension = os.path.splitext(path)[1].lower()
+
+    if extension == '.npy':
+        return np.load(path, mmap_mode='r' if lazy else None)
+
+    if extension == '.mat' and not IsHdf5File(path):
+        import scipy.io
+        contents = dict((name, value) for name, value in scipy.io.loadmat(path).items() if not name.startswith('__'))
+        return contents[SelectVariable(list(contents.keys()), variableName, path)]
+
+    data = LazyMatArray(path, variableName)
+    if not lazy:
+        return data[...]
+    return data
+
+
+class LazyMatArray:
+    """Read-only array view of a variable in a MATLAB v7.3 .mat (HDF5) file.
+
+    Indexing reads only the requested part of the variable. Dimensions are presented in
+    MATLAB order (HDF5 stores them reversed) and MATLAB complex variables are returned
+    as complex arrays.
+
+    Parameters
+    ----------
+    path : str
+        .mat (v7.3) or HDF5 file
+    variableName : str
+        name of the variable. If None and the file contains a single variable, that variable is used
+    """
+    def __init__(self, path, variableName=None):
+        try:
+            import h5py
+        except ImportError:
+            raise ImportError('h5py is required to read MATLAB v7.3 .mat and HDF5 files')
+
+        self.file = h5py.File(path, 'r')
+        names = [name for name in self.file.keys() if not name.startswith('#')]
+        self.dataset = self.file[SelectVariable(names, variableName, path)]
+
+        self.shape = self.dataset.shape[::-1]
+        self.ndim = len(self.shape)
+        self.size = int(np.prod(self.shape))
+        fieldNames = self.dataset.dtype.names
+        self.isComplex = fieldNames is not None and 'real' in fieldNames and 'imag' in fieldNames
+        if self.isComplex:
+            self.dtype = np.result_type(self.dataset.dtype['real'], np.complex64)
+        else:
+            self.dtype = self.dataset.dtype
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, index):
+        if not isinstance(index, tuple):
+            index = (index,)
+        if any(elem is Ellipsis for elem in index):
+            ellipsisIndex = [elem is Ellipsis for elem in index].index(True)
+            numMissing = self.ndim - (len(index) - 1)
+            index = index[0:ellipsisIndex] + (slice(None),) * numMissing + index[ellipsisIndex+1:]
+        index = index + (slice(None),) * (self.ndim - len(index))
+
+        # h5py only supports integers and contiguous slices; read the bounding region, then apply the rest
+        readIndex = []
+        remainingIndex = []
+        for elem in index:
+            if isinstance(elem, (int, np.integer)):
+                readIndex.append(elem)
+            elif isinstance(elem, slice) and elem.step in (None, 1):
+                readIndex.append(elem)
+                remainingIndex.append(slice(None))
+            else:
+                readIndex.append(slice(None))
+                remainingIndex.append(elem)
+
+        data = self.dataset[tuple(readIndex[::-1])]
+        if self.isComplex:
+            data = data['real'] + 1j * data['imag']
+        data = np.transpose(data)
+        if any(not (isinstance(elem, slice) and elem == slice(None)) for elem in remainingIndex):
+            data = data[tuple(remainingIndex)]
+        return data
+
+    def __array__(self, dtype=None):
+        data = self[...]
+        if dtype is not None:
+            data = data.astype(dtype)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def IterateChunks(data, axis=-1, chunkSize=1):
+    """Iterates over chunks of an (possibly memory-mapped or lazy) array along one axis,
+    reading one chunk at a time into memory.
+
+    Parameters
+    ----------
+    data : array-like
+        e.g. as returned by LoadArray
+    axis : int
+        axis to chunk along, e.g. the slice or channel axis
+    chunkSize : int
+        number of elements along axis per chunk
+
+    Yields
+    ------
+    chunkSlice : slice
+        location of the chunk along axis
+    chunk : np.ndarray
+        chunk of data, read into memory
+    """
+    ndim = len(data.shape)
+    axis = axis % ndim
+    for start in range(0, data.shape[axis], chunkSize):
+        chunkSlice = slice(start, min(start + chunkSize, data.shape[axis]))
+        index = (slice(None),) * axis + (chunkSlice,)
+        yield chunkSlice, np.asarray(data[index])
+
+
+def ProcessInChunks(function, data, axis=-1, chunkSize=1, out=None):
+    """Applies a function to chunks of an (possibly memory-mapped or lazy) array along
+    one axis, e.g. reconstructs a multi-slice data set one slice at a time, so that only
+    one chunk of the input needs to be in memory.
+
+    Parameters
+    ----------
+    function : function
+        maps a chunk (with the chunk axis kept) to an output chunk, whose size along
+        axis is the same as the input chunk
+    data : array-like
+        e.g. as returned by LoadArray
+    axis : int
+        axis to chunk along
+    chunkSize : int
+        number of elements along axis per chunk
+    out : array
+        output array, e.g. np.lib.format.open_memmap(...) to also keep the output out of memory.
+        if None, an in-memory array is allocated from the first output chunk
+
+    Returns
+    -------
+    out : array
+        stacked output chunks
+    """
+    ndim = len(data.shape)
+    axis = axis % ndim
+    for chunkSlice, chunk in IterateChunks(data, axis, chunkSize):
+        result = np.asarray(function(chunk))
+        if out is None:
+            outShape = list(result.shape)
+            outShape[axis] = data.shape[axis]
+            out = np.zeros(outShape, dtype=result.dtype)
+        out[(slice(None),) * axis + (chunkSlice,)] = result
+    return out
+
+
+def IsHdf5File(path):
+    # MATLAB v7.3 files have a 512 byte header before the HDF5 signature
+    signature = b'\x89HDF\r\n\x1a\n'
+    with open(path, 'rb') as f:
+        header = f.read(520)
+    return header[0:8] == signature or header[512:520] == signature
+
+
+def SelectVariable(names, variableName, path):
+    if variableName is not None:
+        return variableName
+    assert len(names) == 1, '{} contains several variables, variableName must be one of {}'.format(path, names)
+    return names[0]
@@ -0,0 +1,236 @@
+"""
+Code made available for the ISMRM 2015 Sunrise Educational Course
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+__all__ = ["Instrumentation", "CallCollector", "Instrument"]
+
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+
+# modules whose public functions are instrumented by default
+INSTRUMENTED_MODULES = ["Noise", "Transforms", "SensitivityEstimation", "ParallelImagingCalibration", "DVC", "ImageQualityTools"]
+
+# collector of the active Instrumentation context, None when instrumentation is off
+activeCollector = None
+
+
+class CallCollector:
+    """Records of instrumented calls: one dict per call with keys 'name', 'thread',
+    'start' and 'wallTime' (s, time.perf_counter), 'cpuTime' (s, process CPU time),
+    'peakMemory' (bytes allocated at the peak of the call, if memory is traced),
+    'depth' (nesting level), 'arguments' and 'result' (shapes and dtypes of arrays,
+    short descriptions of other values).
+    """
+    def __init__(self, traceMemory=True):
+        self.traceMemory = traceMemory
+        self.calls = []
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def Add(self, record):
+        with self.lock:
+            self.calls.append(record)
+
+    def Summary(self):
+        """Totals per function: name -> dict with 'calls', 'wallTime', 'cpuTime' and 'peakMemory' (maximum over calls).
+        Times include the time spent in nested instrumented calls."""
+        summary = {}
+        for record in self.calls:
+            entry = summary.setdefault(record['name'], {'calls': 0, 'wallTime': 0.0, 'cpuTime': 0.0, 'peakMemory': None})
+            entry['calls'] += 1
+            entry['wallTime'] += record['wallTime']
+            entry['cpuTime'] += record['cpuTime']
+            if record['peakMemory'] is not None:
+                entry['peakMemory'] = max(entry['peakMemory'] or 0, record['peakMemory'])
+        return summary
+
+    def PrintSummary(self):
+        print('{:<64s} {:>6s} {:>10s} {:>10s} {:>10s}'.format('function', 'calls', 'wall (s)', 'cpu (s)', 'peak (MB)'))
+        for name, entry in sorted(self.Summary().items(), key=lambda item: -item[1]['wallTime']):
+            peak = '{:10.1f}'.format(entry['peakMemory'] / 2**20) if entry['peakMemory'] is not None else '{:>10s}'.format('-')
+            print('{:<64s} {:>6d} {:>10.4f} {:>10.4f} {}'.format(name, entry['calls'], entry['wallTime'], entry['cpuTime'], peak))
+
+    def ToJson(self, path=None):
+        """Call records as JSON. Written to path if given, otherwise returned as a string."""
+        return WriteJson({'calls': self.calls}, path)
+
+    def ToChromeTrace(self, path=None):
+        """Call records in Chrome trace event format, for chrome://tracing or Perfetto.
+        Written to path if given, otherwise returned as a string."""
+        pid = os.getpid()
+        startTime = min((record['start'] for record in self.calls), default=0.0)
+        events = []
+        for record in self.calls:
+            events.append({'name': record['name'], 'cat': record['name'].split('.')[0], 'ph': 'X', 'pid': pid, 'tid': record['thread'],
+                           'ts': (record['start'] - startTime) * 1e6, 'dur': record['wallTime'] * 1e6,
+                           'args': {'cpuTime': record['cpuTime'], 'peakMemory': record['peakMemory'],
+                                    'arguments': record['arguments'], 'result': record['result']}})
+        return WriteJson({'traceEvents': events, 'displayTimeUnit': 'ms'}, path)
+
+
+class Instrumentation:
+    """Context manager that records every call to the public functions of IsmrmSunrise
+    modules (by default Noise, Transforms, SensitivityEstimation, ParallelImagingCalibration,
+    DVC and ImageQualityTools) into a CallCollector.
+
+    The functions are wrapped with Instrument on entry and restored on exit, in their
+    modules and in the IsmrmSunrise namespace, so calls between modules are recorded too
+    and nothing is added to calls made outside the context.
+
+    Parameters
+    ----------
+    modules : list of str
+        names of IsmrmSunrise modules to instrument. default is INSTRUMENTED_MODULES
+    traceMemory : bool
+        if True, the peak memory allocated during each call is measured with tracemalloc,
+        which slows down allocation heavy code while the context is active
+    collector : CallCollector
+        collector to add to. default is a new collector
+
+    Examples
+    --------
+    with IsmrmSunrise.Instrumentation() as collector:
+        jerLookup = IsmrmSunrise.ComputeJerDataDriven(calData, [5, 7])
+        unmix = IsmrmSunrise.ComputeJerUnmixing(jerLookup, accFactor, ccm, 0.001)
+    collector.PrintSummary()
+    collector.ToChromeTrace('recon.trace.json')
+    """
+    def __init__(self, modules=None, traceMemory=True, collector=None):
+        self.modules = modules if modules is not None else INSTRUMENTED_MODULES
+        self.collector = collector if collector is not None else CallCollector(traceMemory)
+        self.patched = []
+        self.startedTracemalloc = False
+
+    def __enter__(self):
+        global activeCollector
+        import importlib
+        assert activeCollector is None, "Instrumentation contexts cannot be nested"
+
+        package = sys.modules[__package__]
+        for moduleName in self.modules:
+            module = importlib.import_module('.' + moduleName, __package__)
+            for name in module.__all__:
+                function = getattr(module, name)
+                if not callable(function) or isinstance(function, type):
+                    continue
+                wrapped = Instrument(function, moduleName + '.' + name)
+                self.Patch(module, name, wrapped)
+                if getattr(package, name, None) is function:
+                    self.Patch(package, name, wrapped)
+
+        if self.collector.traceMemory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.startedTracemalloc = True
+        activeCollector = self.collector
+        return self.collector
+
+    def __exit__(self, excType, excValue, traceback):
+        global activeCollector
+        activeCollector = None
+        for owner, name, original in reversed(self.patched):
+            setattr(owner, name, original)
+        self.patched = []
+        if self.startedTracemalloc:
+            tracemalloc.stop()
+            self.startedTracemalloc = False
+        return False
+
+    def Patch(self, owner, name, replacement):
+        self.patched.append((owner, name, getattr(owner, name)))
+        setattr(owner, name, replacement)
+
+
+def Instrument(function, name=None):
+    """Decorator that records calls to a function in the active Instrumentation context.
+    Outside a context the only cost is one check of a module variable per call.
+
+    Parameters
+    ----------
+    function : function
+        function to instrument
+    name : str
+        name in the records. default is module.qualname
+    """
+    if name is None:
+        name = '{}.{}'.format(function.__module__.split('.')[-1], function.__qualname__)
+
+    @functools.wraps(function)
+    def InstrumentedFunction(*args, **kwargs):
+        collector = activeCollector
+        if collector is None:
+            return function(*args, **kwargs)
+        return RecordCall(collector, name, function, args, kwargs)
+
+    return InstrumentedFunction
+
+
+def RecordCall(collector, name, function, args, kwargs):
+    """Calls function and adds its record to collector. Used by Instrument."""
+    stack = collector.local.__dict__.setdefault('stack', [])
+    traceMemory = collector.traceMemory and tracemalloc.is_tracing()
+
+    frame = {'startMemory': 0, 'peak': 0}
+    if traceMemory:
+        current, peak = tracemalloc.get_traced_memory()
+        if stack:
+            # keep the enclosing call's peak before resetting it for this call
+            stack[-1]['peak'] = max(stack[-1]['peak'], peak)
+        tracemalloc.reset_peak()
+        frame = {'startMemory': current, 'peak': current}
+    stack.append(frame)
+
+    startTime = time.perf_counter()
+    startCpuTime = time.process_time()
+    try:
+        result = function(*args, **kwargs)
+    finally:
+        wallTime = time.perf_counter() - startTime
+        cpuTime = time.process_time() - startCpuTime
+        stack.pop()
+        peakMemory = None
+        if traceMemory:
+            frame['peak'] = max(frame['peak'], tracemalloc.get_traced_memory()[1])
+            peakMemory = frame['peak'] - frame['startMemory']
+            if stack:
+                stack[-1]['peak'] = max(stack[-1]['peak'], frame['peak'])
+            tracemalloc.reset_peak()
+
+    collector.Add({'name': name, 'thread': threading.get_ident(), 'start': startTime, 'wallTime': wallTime,
+                   'cpuTime': cpuTime, 'peakMemory': peakMemory, 'depth': len(stack),
+                   'arguments': [DescribeValue(arg) for arg in args] + ['{}={}'.format(key, DescribeValue(value)) for key, value in kwargs.items()],
+                   'result': DescribeValue(result)})
+    return result
+
+
+def DescribeValue(value):
+    """Short description of an argument or result, e.g. 'complex128[64,64,8]'."""
+    if isinstance(value, np.ndarray):
+        return '{}[{}]'.format(value.dtype.name, ','.join(str(n) for n in value.shape))
+    if isinstance(value, tuple):
+        return '({})'.format(', '.join(DescribeValue(elem) for elem in value))
+    if isinstance(value, list) and len(value) <= 4:
+        return '[{}]'.format(', '.join(DescribeValue(elem) for elem in value))
+    if isinstance(value, (list, dict)):
+        return '{}[{}]'.format(type(value).__name__, len(value))
+    if value is None or isinstance(value, (bool, int, float, complex, str, np.generic)):
+        return repr(value)[0:40]
+    return type(value).__name__
+
+
+def WriteJson(content, path):
+    if path is None:
+        return json.dumps(content)
+    with open(path, 'w') as f:
+        json.dump(content, f)
+    return path
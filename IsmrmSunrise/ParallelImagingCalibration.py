@@ -1,7 +1,6 @@
 __all__ = ["ComputeJerModelDriven", "ComputeJerDataDriven", "ComputeJerDataDrivenReference", "ComputeSenseUnmixing", "ComputeJerUnmixing", "ComputeUnmixingImagesFromKspaceKernels"]
 
 import numpy as np
-import time
 
 def ComputeJerModelDriven(csm, kernelShape):
     """Computes a lookup table of joint encoding relationships (JER) using the
@@ -100,8 +99,8 @@ def ComputeJerDataDrivenReference(calData, kernelShape):
     wx = kernelShape[0]
     wy = kernelShape[1]
 
-    nfitx = calData.shape[0] - wx
-    nfity = calData.shape[1] - wy
+    nfitx = calData.shape[0] - wx + 1
+    nfity = calData.shape[1] - wy + 1
     jerLookup = np.zeros(kernelShape + kernelShape + [nc, nc], dtype=complex)
 
     xInd = np.arange(0, nfitx)
@@ -296,10 +295,8 @@ def ComputeSenseUnmixing(accFactor, csm, noiseMatrix=None, regularizationFactor=
 
     noiseMatrixInv = np.linalg.pinv(noiseMatrix)
 
-    tic = time.time()
     for xIndex in range(csm.shape[0]): 
         unmix[xIndex,:,:] = ComputeSenseUnmixing1d(accFactor, np.squeeze(csm[xIndex,:,:]), noiseMatrixInv, regularizationFactor) 
-    print('for loop time %f' %(time.time()-tic))
 
     return unmix
 
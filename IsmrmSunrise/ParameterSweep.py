@@ -0,0 +1,147 @@
+"""
+Code made available for the ISMRM 2015 Sunrise Educational Course
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+__all__ = ["SweepReconParameters", "ScoreUnmixing"]
+
+import itertools
+import os
+
+import numpy as np
+
+def SweepReconParameters(calData, calIm, ccmMethods, kernelShapes, accFactors, regularizationScales,
+                         noiseMatrix=None, pixelMask=None, trueCsm=None, numWorkers=None):
+    """Evaluates JER based reconstructions over a grid of calibration parameters.
+
+    Intermediates that do not depend on every parameter are computed once and
+    shared: the joint encoding relations are computed once per kernel shape
+    (and reused for all acceleration factors and regularization values) and the
+    channel combination maps are computed once per ccm method. Candidates are
+    then unmixed and scored in a process pool.
+
+    Parameters
+    ----------
+    calData : (kx, ky, Nc) array
+        Calibration data (k-space)
+    calIm : (Nx, Ny, Nc) array
+        Calibration images passed to each of the ccm methods
+    ccmMethods : dict
+        name -> function taking calIm and returning (Nx, Ny, Nc) channel combination maps,
+        e.g. {'DVC': IsmrmSunrise.ComputeCcmDvc}
+    kernelShapes : list of length 2 vectors
+        kernel shapes to evaluate, e.g. [[5,5], [5,7]]
+    accFactors : list of int
+        acceleration factors to evaluate, e.g. [2, 3, 4]
+    regularizationScales : list of scalars
+        regularization scales to evaluate, e.g. [0.0, 0.001, 0.01]
+    noiseMatrix : (Nc, Nc) array
+        noise covariance matrix. default is identity
+    pixelMask : (Nx, Ny) array
+        1 = pixel that might have signal, 0 = pixel that won't have signal.
+        Scores are computed over these pixels. default is all pixels
+    trueCsm : (Nx, Ny, Nc) array
+        ground truth coil sensitivity maps. If given, aliasing energy is also scored
+    numWorkers : int
+        number of worker processes. default is os.cpu_count(); 1 runs serially
+
+    Returns
+    -------
+    results : list of dict
+        one row per candidate with keys 'ccmMethod', 'kernelShape', 'accFactor',
+        'regularizationScale' and the scores returned by ScoreUnmixing.
+        Can be passed directly to pandas.DataFrame.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    if numWorkers is None:
+        numWorkers = os.cpu_count()
+
+    kernelShapes = [tuple(int(k) for k in kernelShape) for kernelShape in kernelShapes]
+    imShape = calIm.shape[0:2]
+    if pixelMask is None:
+        pixelMask = np.ones(imShape)
+
+    # channel combination maps: once per method. Computed here rather than in the
+    # pool so that ccm methods don't need to be picklable (e.g. lambdas)
+    ccms = dict((name, ccmMethod(calIm)) for name, ccmMethod in ccmMethods.items())
+
+    candidates = list(itertools.product(ccms.keys(), kernelShapes, accFactors, regularizationScales))
+
+    if numWorkers <= 1:
+        jerLookups = dict((kernelShape, _ComputeJer(calData, kernelShape)) for kernelShape in kernelShapes)
+        scores = [_EvaluateCandidate(jerLookups[kernelShape], accFactor, ccms[name], regularizationScale, noiseMatrix, pixelMask, trueCsm)
+                  for name, kernelShape, accFactor, regularizationScale in candidates]
+    else:
+        with ProcessPoolExecutor(max_workers=numWorkers) as executor:
+            jerLookups = dict(zip(kernelShapes, executor.map(_ComputeJer, itertools.repeat(calData), kernelShapes)))
+            futures = [executor.submit(_EvaluateCandidate, jerLookups[kernelShape], accFactor, ccms[name], regularizationScale, noiseMatrix, pixelMask, trueCsm)
+                       for name, kernelShape, accFactor, regularizationScale in candidates]
+            scores = [future.result() for future in futures]
+
+    results = []
+    for (name, kernelShape, accFactor, regularizationScale), score in zip(candidates, scores):
+        row = {'ccmMethod': name,
+               'kernelShape': kernelShape,
+               'accFactor': accFactor,
+               'regularizationScale': regularizationScale}
+        row.update(score)
+        results.append(row)
+    return results
+
+
+def ScoreUnmixing(unmix, ccm, accFactor, noiseMatrix=None, pixelMask=None, trueCsm=None):
+    """Summarizes the quality of a set of unmixing images with scalar scores
+    derived from ComputeGmap and ComputeAliasingEnergyMap.
+
+    Parameters
+    ----------
+    unmix : (Nx, Ny, Nc) array
+        unmixing images for accelerated case
+    ccm : (Nx, Ny, Nc) array
+        channel combination maps
+    accFactor : int
+        acceleration factor corresponding to unmixing
+    noiseMatrix : (Nc, Nc) array
+        noise covariance matrix
+    pixelMask : (Nx, Ny) array
+        1 = pixel that might have signal, 0 = pixel that won't have signal.
+        default is all pixels
+    trueCsm : (Nx, Ny, Nc) array
+        ground truth coil sensitivity maps. If None, aliasing energy is not scored
+
+    Returns
+    -------
+    scores : dict
+        'gmapMean', 'gmapMax' and, if trueCsm is given, 'aemRms', 'aemMax'
+        computed over the pixels in pixelMask
+    """
+    from . import ImageQualityTools
+
+    if pixelMask is None:
+        pixelMask = np.ones(unmix.shape[0:2])
+    maskIndices = np.nonzero(pixelMask)
+
+    gmap = ImageQualityTools.ComputeGmap(unmix, ccm, accFactor, noiseMatrix)[maskIndices]
+    scores = {'gmapMean': np.mean(gmap), 'gmapMax': np.max(gmap)}
+
+    if trueCsm is not None:
+        aem = ImageQualityTools.ComputeAliasingEnergyMap(pixelMask, trueCsm, unmix, accFactor)[maskIndices]
+        scores['aemRms'] = np.sqrt(np.mean(aem**2))
+        scores['aemMax'] = np.max(aem)
+
+    return scores
+
+
+def _ComputeJer(calData, kernelShape):
+    from . import ParallelImagingCalibration
+    return ParallelImagingCalibration.ComputeJerDataDriven(calData, list(kernelShape))
+
+
+def _EvaluateCandidate(jerLookup, accFactor, ccm, regularizationScale, noiseMatrix, pixelMask, trueCsm):
+    from . import ParallelImagingCalibration
+    unmix = ParallelImagingCalibration.ComputeJerUnmixing(jerLookup, accFactor, ccm, regularizationScale)
+    return ScoreUnmixing(unmix, ccm, accFactor, noiseMatrix, pixelMask, trueCsm)
@@ -0,0 +1,391 @@
+"""
+Code made available for the ISMRM 2015 Sunrise Educational Course
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+__all__ = ["ReconServer", "ReconClient"]
+
+import collections
+import concurrent.futures
+import io
+import json
+import os
+import queue
+import socket
+import struct
+import threading
+import time
+
+import numpy as np
+
+# a frame waiting in the queue
+#   connection : Connection to reply on
+#   header : request header
+#   frame : AcceleratedKspace
+#   calibration : concurrent.futures.Future resolving to the calibration dict
+#   computesCalibration : bool. True if this frame sets the calibration result
+#   enqueueTime : time.perf_counter() when the frame was queued
+ReconJob = collections.namedtuple('ReconJob', ['connection', 'header', 'frame', 'calibration', 'computesCalibration', 'enqueueTime'])
+
+
+class ReconServer:
+    """Local reconstruction service. Receives accelerated k-space frames over a socket,
+    reconstructs them with JER based unmixing in a pool of worker threads and returns the
+    images with per-stage timings.
+
+    Calibration is kept warm per series, slice and contrast: frames with calibration lines
+    recalibrate, frames without reuse the most recent calibration of their series and slice
+    (frames that depend on a calibration still being computed wait for it).
+
+    Received frames go into a bounded queue. When it is full the server stops reading from
+    the connection, so clients are slowed down by the socket (back-pressure), or, with
+    rejectWhenFull, the frame is answered immediately with status 'busy'. Either way the
+    queueing delay stays bounded under burst load.
+
+    Messages are length-prefixed JSON headers followed by arrays in .npy format; see
+    SendMessage and ReceiveMessage. ReconClient implements the client side.
+
+    Parameters
+    ----------
+    address : str or (host, port) tuple
+        Unix domain socket path, or TCP address. Port 0 picks a free port (see self.address)
+    numWorkers : int
+        number of worker threads. default is os.cpu_count()
+    maxQueued : int
+        maximum number of frames waiting for a worker
+    rejectWhenFull : bool
+        if True, frames arriving when the queue is full are rejected rather than waited for
+    kernelShape, ccmMethod, regularizationScale, maxReadoutWidth
+        see ReconstructFrame
+
+    Examples
+    --------
+    server = IsmrmSunrise.ReconServer(('localhost', 0)).Start()
+    client = IsmrmSunrise.ReconClient(server.address)
+    im, reply = client.Reconstruct(frame, seriesId='exam1')
+    print(reply['timings'])
+    client.Close()
+    server.Stop()
+    """
+    def __init__(self, address, numWorkers=None, maxQueued=16, rejectWhenFull=False,
+                 kernelShape=(5, 7), ccmMethod=None, regularizationScale=0.001, maxReadoutWidth=-1):
+        self.address = address
+        self.numWorkers = numWorkers if numWorkers is not None else os.cpu_count()
+        self.jobs = queue.Queue(maxsize=maxQueued)
+        self.rejectWhenFull = rejectWhenFull
+        self.reconParameters = {'kernelShape': tuple(kernelShape), 'ccmMethod': ccmMethod,
+                                'regularizationScale': regularizationScale, 'maxReadoutWidth': maxReadoutWidth}
+
+        self.calibrations = {}
+        self.calibrationLock = threading.Lock()
+        self.listener = None
+        self.threads = []
+        self.connections = set()
+
+    def Start(self):
+        """Starts listening and the worker threads. Returns self."""
+        if isinstance(self.address, str):
+            if os.path.exists(self.address):
+                os.remove(self.address)
+            self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listener.bind(self.address)
+        self.listener.listen()
+        self.address = self.listener.getsockname()
+
+        self.threads = [threading.Thread(target=self.Work, daemon=True) for workerIndex in range(self.numWorkers)]
+        self.threads.append(threading.Thread(target=self.AcceptConnections, daemon=True))
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def Serve(self):
+        """Starts the server and blocks until it is stopped."""
+        self.Start()
+        for thread in self.threads:
+            thread.join()
+
+    def Stop(self):
+        """Stops accepting connections, lets the workers finish the queued frames and closes all connections."""
+        try:
+            # wakes up the accept() in AcceptConnections
+            self.listener.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.listener.close()
+        for thread in self.threads[0:self.numWorkers]:
+            self.jobs.put(None)
+        for thread in self.threads:
+            thread.join()
+        for connection in list(self.connections):
+            connection.Close()
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.remove(self.address)
+
+    def AcceptConnections(self):
+        while True:
+            try:
+                sock, peer = self.listener.accept()
+            except OSError:
+                # listener closed by Stop
+                return
+            connection = Connection(sock)
+            self.connections.add(connection)
+            threading.Thread(target=self.HandleConnection, args=(connection,), daemon=True).start()
+
+    def HandleConnection(self, connection):
+        """Reads requests from one client, in order, and queues its frames.
+
+        A request that can not be decoded (missing header fields, inconsistent frame arrays)
+        is answered with status 'error' and the connection stays open. A message that can 
+        not be parsed at all is answered with status 'error' and the connection is closed, 
+        as the following messages can not be found in the stream.
+        """
+        try:
+            while True:
+                try:
+                    message = ReceiveMessage(connection.sock)
+                except (KeyError, TypeError, AttributeError, ValueError) as error:
+                    connection.Send({'requestId': None, 'status': 'error', 'message': 'malformed message: {!r}'.format(error)})
+                    return
+                if message is None:
+                    return
+                header, arrays = message
+                try:
+                    self.HandleRequest(connection, header, arrays)
+                except (KeyError, TypeError, ValueError, IndexError, AssertionError) as error:
+                    connection.Send(ReplyHeader(header, 'error', message='malformed request: {!r}'.format(error)))
+        except OSError:
+            return
+        finally:
+            self.connections.discard(connection)
+            connection.Close()
+
+    def HandleRequest(self, connection, header, arrays):
+        if header.get('type') == 'frame':
+            self.Dispatch(connection, header, arrays)
+        elif header.get('type') == 'endSeries':
+            self.EndSeries(header['seriesId'])
+            connection.Send({'type': 'endSeries', 'requestId': header.get('requestId'), 'status': 'ok'})
+        else:
+            connection.Send({'requestId': header.get('requestId'), 'status': 'error',
+                             'message': 'unknown request type {}'.format(header.get('type'))})
+
+    def Dispatch(self, connection, header, arrays):
+        """Queues a frame, recording which calibration it produces or depends on.
+        Calibration order follows the order frames are received in."""
+        from . import Streaming
+
+        receiveTime = time.perf_counter()
+        frame = DecodeFrame(header, arrays)
+        calibrationKey = (header['seriesId'],) + tuple(header['frameKey'][0:2])
+
+        with self.calibrationLock:
+            computesCalibration = Streaming.HasCalibrationData(frame.samplingPattern, self.reconParameters['kernelShape'])
+            if computesCalibration:
+                calibration = concurrent.futures.Future()
+                self.calibrations[calibrationKey] = calibration
+            else:
+                calibration = self.calibrations.get(calibrationKey)
+
+        if calibration is None:
+            connection.Send(ReplyHeader(header, 'error', message='no calibration received for this series and slice'))
+            return
+
+        job = ReconJob(connection, header, frame, calibration, computesCalibration, receiveTime)
+        try:
+            self.jobs.put(job, block=not self.rejectWhenFull)
+        except queue.Full:
+            if computesCalibration:
+                calibration.set_exception(RuntimeError('calibration frame was rejected'))
+            connection.Send(ReplyHeader(header, 'busy'))
+
+    def EndSeries(self, seriesId):
+        """Releases the calibrations kept for a series."""
+        with self.calibrationLock:
+            for calibrationKey in [key for key in self.calibrations if key[0] == seriesId]:
+                del self.calibrations[calibrationKey]
+
+    def Work(self):
+        from . import Streaming
+
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                return
+            timings = {'queue': time.perf_counter() - job.enqueueTime}
+            try:
+                if job.computesCalibration:
+                    try:
+                        im, calibration = Streaming.ReconstructFrame(job.frame, None, timings=timings, **self.reconParameters)
+                    except BaseException as error:
+                        job.calibration.set_exception(error)
+                        raise
+                    job.calibration.set_result(calibration)
+                else:
+                    waitStart = time.perf_counter()
+                    calibration = job.calibration.result()
+                    timings['calibrationWait'] = time.perf_counter() - waitStart
+                    # copy, so that a different acceleration factor does not replace the shared unmixing images
+                    im, calibration = Streaming.ReconstructFrame(job.frame, dict(calibration), timings=timings, **self.reconParameters)
+                timings['total'] = time.perf_counter() - job.enqueueTime
+                job.connection.Send(ReplyHeader(job.header, 'ok', timings=timings), {'im': im.astype(np.complex64)})
+            except Exception as error:
+                job.connection.Send(ReplyHeader(job.header, 'error', message=repr(error)))
+
+
+class ReconClient:
+    """Client for ReconServer.
+
+    Frames can be submitted without waiting for their images (Submit, then Receive), so
+    that several frames are in flight; replies carry the requestId and frameKey of their
+    frame and may arrive out of order. Replies are read in a background thread, so the
+    server is never blocked sending to a client that is still submitting.
+
+    Parameters
+    ----------
+    address : str or (host, port) tuple
+        address of the server
+    """
+    def __init__(self, address):
+        family = socket.AF_UNIX if isinstance(address, str) else socket.AF_INET
+        self.connection = Connection(socket.socket(family, socket.SOCK_STREAM))
+        self.connection.sock.connect(address)
+        self.nextRequestId = 0
+        self.replies = queue.Queue()
+        threading.Thread(target=ReceiveReplies, args=(self.connection.sock, self.replies), daemon=True).start()
+
+    def Submit(self, frame, seriesId, frameKey=(0, 0, 0, 0, 0)):
+        """Sends an AcceleratedKspace frame. Returns its requestId."""
+        header, arrays = EncodeFrame(frame)
+        header.update({'type': 'frame', 'requestId': self.nextRequestId, 'seriesId': seriesId, 'frameKey': list(frameKey)})
+        self.nextRequestId += 1
+        self.connection.Send(header, arrays)
+        return header['requestId']
+
+    def Receive(self, timeout=None):
+        """Waits for the next reply. Returns (im, reply): im is None unless reply['status'] is 'ok'."""
+        message = self.replies.get(timeout=timeout)
+        if message is None:
+            raise ConnectionError('connection closed by the server')
+        reply, arrays = message
+        return arrays.get('im'), reply
+
+    def Reconstruct(self, frame, seriesId, frameKey=(0, 0, 0, 0, 0)):
+        """Sends a frame and waits for its image. Returns (im, reply)."""
+        self.Submit(frame, seriesId, frameKey)
+        return self.Receive()
+
+    def EndSeries(self, seriesId):
+        """Releases the server's calibrations for a series. Call after all replies for the series have been received."""
+        self.connection.Send({'type': 'endSeries', 'seriesId': seriesId})
+        return self.Receive()[1]
+
+    def Close(self):
+        self.connection.Close()
+
+
+def ReceiveReplies(sock, replies):
+    """Puts the messages received on a socket on a queue, then None when it is closed. Used by ReconClient."""
+    try:
+        while True:
+            message = ReceiveMessage(sock)
+            replies.put(message)
+            if message is None:
+                return
+    except (OSError, ValueError):
+        replies.put(None)
+
+
+class Connection:
+    """Socket shared by the connection handler and the workers replying on it."""
+    def __init__(self, sock):
+        self.sock = sock
+        self.sendLock = threading.Lock()
+
+    def Send(self, header, arrays=None):
+        try:
+            with self.sendLock:
+                SendMessage(self.sock, header, arrays)
+        except OSError:
+            # client has gone away
+            pass
+
+    def Close(self):
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+def ReplyHeader(request, status, **fields):
+    header = {'type': request.get('type'), 'requestId': request.get('requestId'), 'seriesId': request.get('seriesId'),
+              'frameKey': request.get('frameKey'), 'status': status}
+    header.update(fields)
+    return header
+
+
+def EncodeFrame(frame):
+    """Header fields and arrays describing an AcceleratedKspace (kx, ky, Nc) frame."""
+    pattern = frame.samplingPattern
+    header = {'shape': list(pattern.shape), 'accFactor': int(pattern.acc[0]), 'sshift': int(pattern.sshift[0])}
+    arrays = {'lines': pattern.lines[:, 0], 'lineTypes': pattern.lineTypes, 'lineData': frame.lineData}
+    return header, arrays
+
+
+def DecodeFrame(header, arrays):
+    from . import DataGeneration
+    from . import Streaming
+    peImage = np.zeros(header['shape'][1], dtype=int)
+    peImage[arrays['lines']] = arrays['lineTypes']
+    pattern = Streaming.CreateFramePattern(header['shape'][0], peImage, header['accFactor'], header['sshift'])
+    # lines arrive in any order; lineData must follow pattern.lines, which is in ky order
+    lineData = arrays['lineData'][:, np.argsort(arrays['lines'])]
+    return DataGeneration.AcceleratedKspace(pattern, lineData)
+
+
+def SendMessage(sock, header, arrays=None):
+    """Sends a JSON header and named arrays: a 4 byte header length, the header (which
+    lists the array names and sizes), then each array in .npy format."""
+    arrays = arrays if arrays is not None else {}
+    payloads = []
+    for name, array in arrays.items():
+        buffer = io.BytesIO()
+        np.lib.format.write_array(buffer, np.asarray(array), allow_pickle=False)
+        payloads.append((name, buffer.getvalue()))
+    header = dict(header, arrays=[[name, len(payload)] for name, payload in payloads])
+    headerBytes = json.dumps(header).encode()
+    sock.sendall(struct.pack('!I', len(headerBytes)) + headerBytes)
+    for name, payload in payloads:
+        sock.sendall(payload)
+
+
+def ReceiveMessage(sock):
+    """Receives a message sent with SendMessage. Returns (header, arrays), or None if the connection was closed."""
+    lengthBytes = ReceiveExactly(sock, 4)
+    if lengthBytes is None:
+        return None
+    header = json.loads(ReceiveExactly(sock, struct.unpack('!I', lengthBytes)[0]).decode())
+    arrays = {}
+    for name, size in header.pop('arrays'):
+        arrays[name] = np.lib.format.read_array(io.BytesIO(ReceiveExactly(sock, size)), allow_pickle=False)
+    return header, arrays
+
+
+def ReceiveExactly(sock, size):
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        numBytes = sock.recv_into(view[received:], size - received)
+        if numBytes == 0:
+            if received == 0:
+                return None
+            raise ConnectionError('connection closed in the middle of a message')
+        received += numBytes
+    return bytes(buffer)
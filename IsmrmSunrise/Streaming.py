@@ -0,0 +1,449 @@
+"""
+Code made available for the ISMRM 2015 Sunrise Educational Course
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+__all__ = ["Readout", "ReadIsmrmrdHeader", "ReadIsmrmrdAcquisitions", "GenerateReadouts",
+           "FrameAssembler", "ReconstructFrame", "StreamRecon", "Prefetch"]
+
+import collections
+import contextlib
+import queue
+import threading
+import time
+
+import numpy as np
+
+# ISMRMRD acquisition flags (bit numbers, counted from 1)
+ACQ_LAST_IN_SLICE = 8
+ACQ_LAST_IN_REPETITION = 14
+ACQ_IS_NOISE_MEASUREMENT = 19
+ACQ_IS_PARALLEL_CALIBRATION = 20
+ACQ_IS_PARALLEL_CALIBRATION_AND_IMAGING = 21
+ACQ_IS_NAVIGATION_DATA = 23
+ACQ_IS_PHASECORR_DATA = 24
+ACQ_LAST_IN_MEASUREMENT = 25
+
+# one acquired phase encoding line
+#   frameKey : (slice, contrast, phase, repetition, set)
+#   line : ky index
+#   data : (kx, Nc) array
+#   isCalibration, isImaging : bool. Both False if the source does not flag calibration lines
+#   isLastInFrame : bool. The frame is complete after this readout
+Readout = collections.namedtuple('Readout', ['frameKey', 'line', 'data', 'isCalibration', 'isImaging', 'isLastInFrame'])
+
+
+def ReadIsmrmrdHeader(path):
+    """Reads the encoding parameters needed for reconstruction from the XML header of an ISMRMRD file.
+
+    Parameters
+    ----------
+    path : str
+        ISMRMRD HDF5 file
+
+    Returns
+    -------
+    header : dict
+        'matrixSize' : (x, y, z) encoded matrix size
+        'accFactor' : acceleration factor along ky, or None if not given
+    """
+    import h5py
+    import xml.etree.ElementTree as ElementTree
+
+    with h5py.File(path, 'r') as f:
+        xmlHeader = f['dataset/xml'][0]
+    if isinstance(xmlHeader, bytes):
+        xmlHeader = xmlHeader.decode()
+
+    root = ElementTree.fromstring(xmlHeader)
+    namespace = {'ismrmrd': 'http://www.ismrm.org/ISMRMRD'}
+    matrixSize = root.find('ismrmrd:encoding/ismrmrd:encodedSpace/ismrmrd:matrixSize', namespace)
+    accFactor = root.find('ismrmrd:encoding/ismrmrd:parallelImaging/ismrmrd:accelerationFactor/ismrmrd:kspace_encoding_step_1', namespace)
+
+    return {'matrixSize': tuple(int(matrixSize.find('ismrmrd:' + axis, namespace).text) for axis in 'xyz'),
+            'accFactor': int(accFactor.text) if accFactor is not None else None}
+
+
+def ReadIsmrmrdAcquisitions(path, blockSize=64):
+    """Reads the acquisitions of an ISMRMRD HDF5 file one block at a time and yields them as readouts.
+
+    Noise, navigator and phase correction acquisitions are skipped. Only 2D (kx, ky)
+    encoding is supported.
+
+    Parameters
+    ----------
+    path : str
+        ISMRMRD HDF5 file
+    blockSize : int
+        number of acquisitions read from the file at a time
+
+    Yields
+    ------
+    readout : Readout
+        one phase encoding line
+    """
+    import h5py
+
+    skipFlags = IsmrmrdFlagMask(ACQ_IS_NOISE_MEASUREMENT, ACQ_IS_NAVIGATION_DATA, ACQ_IS_PHASECORR_DATA)
+    lastFlags = IsmrmrdFlagMask(ACQ_LAST_IN_SLICE, ACQ_LAST_IN_REPETITION, ACQ_LAST_IN_MEASUREMENT)
+
+    with h5py.File(path, 'r') as f:
+        acquisitions = f['dataset/data']
+        for start in range(0, acquisitions.shape[0], blockSize):
+            block = acquisitions[start:start+blockSize]
+            for acquisition in block:
+                head = acquisition['head']
+                flags = int(head['flags'])
+                if flags & skipFlags:
+                    continue
+                idx = head['idx']
+                assert int(idx['kspace_encode_step_2']) == 0, "only 2D acquisitions are supported"
+
+                # data is stored as interleaved real/imaginary float32, channel by channel
+                data = acquisition['data'].view(np.complex64).reshape(int(head['active_channels']), int(head['number_of_samples'])).T
+                isCalibration = IsIsmrmrdFlagSet(flags, ACQ_IS_PARALLEL_CALIBRATION) or IsIsmrmrdFlagSet(flags, ACQ_IS_PARALLEL_CALIBRATION_AND_IMAGING)
+                isImaging = not IsIsmrmrdFlagSet(flags, ACQ_IS_PARALLEL_CALIBRATION)
+                frameKey = (int(idx['slice']), int(idx['contrast']), int(idx['phase']), int(idx['repetition']), int(idx['set']))
+                yield Readout(frameKey, int(idx['kspace_encode_step_1']), data, isCalibration, isImaging, bool(flags & lastFlags))
+
+
+def GenerateReadouts(data, samplingPattern, frameKey=(0, 0, 0, 0, 0)):
+    """Yields the acquired lines of (kx, ky, Nc) k-space data as readouts, in ky order.
+
+    Lets simulated data, or data stored as .npy (see LoadArray), be streamed through
+    FrameAssembler and StreamRecon in the same way as an ISMRMRD file.
+
+    Parameters
+    ----------
+    data : (kx, ky, Nc) array
+        full or zero-filled k-space data, e.g. memory-mapped
+    samplingPattern : SamplingPattern
+        acquired lines. Reference lines are flagged as calibration lines
+    frameKey : tuple
+        frame the lines belong to
+
+    Yields
+    ------
+    readout : Readout
+        one phase encoding line
+    """
+    from . import DataGeneration
+
+    numLines = samplingPattern.NumLines()
+    for lineIndex in range(numLines):
+        line = int(samplingPattern.lines[lineIndex, 0])
+        lineType = samplingPattern.lineTypes[lineIndex]
+        yield Readout(frameKey, line, np.asarray(data[:, line]),
+                      bool(lineType & DataGeneration.SamplingPattern.REFERENCE),
+                      bool(lineType & DataGeneration.SamplingPattern.ACCELERATED),
+                      lineIndex == numLines-1)
+
+
+class FrameAssembler:
+    """Groups streamed readouts into frames (one 2D k-space per slice, contrast, phase,
+    repetition and set) as they arrive.
+
+    A frame is complete when a readout marked as last in its frame arrives, or when the
+    stream ends (Flush). Interleaved frames are assembled in parallel.
+
+    Calibration (ACS) lines are taken from the calibration flags of the readouts. If the
+    source does not flag calibration lines, lines that are off the regular lattice of
+    accelerated lines (e.g. a fully sampled centre of k-space) are used as calibration lines.
+
+    Parameters
+    ----------
+    numPhaseEncodes : int
+        ky extent of the frames
+    accFactor : int
+        acceleration factor. If None, inferred for each frame from the line spacing
+    """
+    def __init__(self, numPhaseEncodes, accFactor=None):
+        self.numPhaseEncodes = numPhaseEncodes
+        self.accFactor = accFactor
+        self.pending = collections.OrderedDict()
+
+    def Add(self, readout):
+        """Adds a readout. Returns (frameKey, AcceleratedKspace) if it completes a frame, otherwise None."""
+        self.pending.setdefault(readout.frameKey, []).append(readout)
+        if readout.isLastInFrame:
+            return readout.frameKey, self.AssembleFrame(self.pending.pop(readout.frameKey))
+        return None
+
+    def Flush(self):
+        """Assembles all incomplete frames, e.g. at the end of the stream."""
+        frames = [(frameKey, self.AssembleFrame(readouts)) for frameKey, readouts in self.pending.items()]
+        self.pending.clear()
+        return frames
+
+    def AssembleFrames(self, readouts):
+        """Adds readouts and yields (frameKey, AcceleratedKspace) for each frame as it is completed."""
+        for readout in readouts:
+            completed = self.Add(readout)
+            if completed is not None:
+                yield completed
+        for completed in self.Flush():
+            yield completed
+
+    def AssembleFrame(self, readouts):
+        from . import DataGeneration
+        SamplingPattern = DataGeneration.SamplingPattern
+
+        isFlagged = any(readout.isCalibration for readout in readouts)
+        imagingLines = np.unique([readout.line for readout in readouts if readout.isImaging or not isFlagged])
+        accFactor, sshift = InferLattice(imagingLines, self.accFactor, self.numPhaseEncodes)
+
+        # one line per ky; a line acquired more than once keeps the last readout
+        lines = {}
+        peImage = np.zeros(self.numPhaseEncodes, dtype=int)
+        for readout in readouts:
+            lines[readout.line] = readout.data
+            onLattice = readout.line % accFactor == sshift
+            isImaging = readout.isImaging or not isFlagged
+            # imaging lines off the lattice are only used for calibration
+            isCalibration = readout.isCalibration or not onLattice
+            peImage[readout.line] |= SamplingPattern.ACCELERATED * (isImaging and onLattice) + SamplingPattern.REFERENCE * isCalibration
+
+        pattern = CreateFramePattern(readouts[0].data.shape[0], peImage, accFactor, sshift)
+        lineData = np.stack([lines[line] for line in pattern.lines[:, 0]], axis=1)
+        return DataGeneration.AcceleratedKspace(pattern, lineData)
+
+
+def CreateFramePattern(numSamples, peImage, accFactor, sshift):
+    """SamplingPattern of a (kx, ky) frame from its ky line types (values as in SamplingPattern.lineTypes)."""
+    from . import DataGeneration
+    pattern = DataGeneration.SamplingPattern.FromArray(np.broadcast_to(peImage, (numSamples, peImage.size)))
+    pattern.acc[0] = accFactor
+    pattern.sshift[0] = sshift
+    return pattern
+
+
+def InferLattice(lines, accFactor=None, numPhaseEncodes=None):
+    """Acceleration factor and sampling shift of a set of ky lines. Used by FrameAssembler.
+
+    Lines in the longest run of consecutive lines (a fully sampled calibration region in 
+    the centre of k-space) are ignored. The acceleration factor is the greatest common 
+    divisor of the spacings between the other lines, so that partial Fourier and dropped 
+    lines do not affect it either. Lines that are all consecutive give an acceleration 
+    factor of 1.
+
+    Raises ValueError if the lines outside the calibration region are not all on the 
+    lattice of a given accFactor, or, if numPhaseEncodes is given, are outside the 
+    phase encodes.
+    """
+    lines = np.unique(np.asarray(lines, dtype=int))
+    if lines.size == 0:
+        raise ValueError('no imaging lines to infer the sampling lattice from')
+    if numPhaseEncodes is not None and (lines[0] < 0 or lines[-1] >= numPhaseEncodes):
+        raise ValueError('lines {} to {} do not fit in {} phase encodes'.format(lines[0], lines[-1], numPhaseEncodes))
+
+    # lines outside the longest run of consecutive lines, e.g. the calibration region
+    runBreaks = np.concatenate([[0], np.nonzero(np.diff(lines) != 1)[0] + 1, [lines.size]])
+    longestRun = np.argmax(np.diff(runBreaks))
+    outsideRun = np.concatenate([lines[:runBreaks[longestRun]], lines[runBreaks[longestRun+1]:]])
+
+    if accFactor is None:
+        spacings = np.diff(outsideRun)
+        accFactor = int(np.gcd.reduce(spacings)) if spacings.size > 0 else 1
+    accFactor = int(accFactor)
+    if outsideRun.size > 0:
+        sshift = int(outsideRun[0] % accFactor)
+        offLattice = outsideRun[outsideRun % accFactor != sshift]
+        if offLattice.size > 0:
+            raise ValueError('lines {} are not on the lattice of acceleration factor {} and shift {}'.format(
+                offLattice.tolist(), accFactor, sshift))
+    else:
+        sshift = int(np.argmax(np.bincount(lines % accFactor, minlength=accFactor)))
+    return accFactor, sshift
+
+
+def ReconstructFrame(frame, calibration=None, kernelShape=(5, 7), ccmMethod=None, regularizationScale=0.001, maxReadoutWidth=-1, timings=None):
+    """Reconstructs one accelerated frame with JER based unmixing.
+
+    Calibration (joint encoding relations, channel combination maps and unmixing images)
+    is computed from the calibration lines of the frame. Frames without enough calibration
+    lines reuse the calibration passed in, e.g. from an earlier frame of the same slice.
+
+    Parameters
+    ----------
+    frame : AcceleratedKspace
+        (kx, ky, Nc) accelerated k-space, e.g. from FrameAssembler
+    calibration : dict
+        calibration returned for an earlier frame, or None
+    kernelShape : length 2 vector
+        kernel shape for the joint encoding relations
+    ccmMethod : function
+        takes (Nx, Ny, Nc) calibration images and returns channel combination maps.
+        default is Walsh coil sensitivity estimates with ComputeChannelCombinationMaps
+    regularizationScale : scalar
+        passed to ComputeJerUnmixing
+    maxReadoutWidth : int
+        if > 0, calibration data is limited to this many central samples along kx
+    timings : dict
+        if given, the time in seconds spent in each stage ('jer', 'ccm', 'unmix',
+        'transform', 'combine') is added to it. Skipped stages are not added
+
+    Returns
+    -------
+    im : (Nx, Ny) array
+        reconstructed image
+    calibration : dict
+        'jerLookup', 'ccm', 'accFactor' and 'unmix', to be passed in for later frames
+    """
+    from . import ParallelImagingCalibration
+
+    pattern = frame.samplingPattern
+    accFactor = int(pattern.acc[0])
+    imShape = pattern.shape
+
+    if HasCalibrationData(pattern, kernelShape):
+        calData = frame.CalData(maxReadoutWidth)
+        if ccmMethod is None:
+            ccmMethod = ComputeCcmWalsh
+        calibration = {}
+        with TimeStage(timings, 'jer'):
+            calibration['jerLookup'] = ParallelImagingCalibration.ComputeJerDataDriven(calData, list(kernelShape))
+        with TimeStage(timings, 'ccm'):
+            calibration['ccm'] = ccmMethod(GenerateCalImages(calData, imShape))
+    assert calibration is not None, "the first frame of each slice must contain calibration lines"
+
+    if calibration.get('accFactor') != accFactor:
+        with TimeStage(timings, 'unmix'):
+            calibration['unmix'] = ParallelImagingCalibration.ComputeJerUnmixing(calibration['jerLookup'], accFactor, calibration['ccm'], regularizationScale)
+        calibration['accFactor'] = accFactor
+
+    with TimeStage(timings, 'transform'):
+        imAlias = frame.TransformToAliasedImage()
+    with TimeStage(timings, 'combine'):
+        im = np.sum(imAlias * calibration['unmix'], 2)
+    return im, calibration
+
+
+@contextlib.contextmanager
+def TimeStage(timings, stage):
+    """Adds the time spent in the with block to timings[stage], if timings is not None."""
+    startTime = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - startTime
+
+
+def HasCalibrationData(samplingPattern, kernelShape):
+    """True if a sampling pattern has a fully sampled region that is at least as wide as the kernel along ky."""
+    from . import DataGeneration
+    try:
+        calRegion = DataGeneration.FindCalibrationRegion(samplingPattern)
+    except AssertionError:
+        return False
+    return calRegion[1].stop - calRegion[1].start >= kernelShape[1]
+
+
+def GenerateCalImages(calData, imShape):
+    """Hamming filtered, low resolution (Nx, Ny, Nc) channel images from calibration data."""
+    from . import Transforms
+    lpFilter = np.outer(np.hamming(calData.shape[0]), np.hamming(calData.shape[1]))
+    return Transforms.TransformKspaceToImage(calData * lpFilter[:, :, np.newaxis], [0, 1], imShape,
+                                             preShift=-np.ceil(np.array(calData.shape[0:2]) * .5))
+
+
+def ComputeCcmWalsh(calIm):
+    from . import ChannelCombination
+    from . import SensitivityEstimation
+    return ChannelCombination.ComputeChannelCombinationMaps(SensitivityEstimation.EstimateCsmWalsh(calIm))
+
+
+def StreamRecon(readouts, numPhaseEncodes, accFactor=None, kernelShape=(5, 7), ccmMethod=None,
+                regularizationScale=0.001, maxReadoutWidth=-1, maxQueued=256):
+    """Reconstructs frames as soon as they are complete while readouts are still streaming in.
+
+    Readouts are read in a background thread (see Prefetch), so reading the next frame
+    overlaps with calibration and unmixing of the current one. Calibration is kept per
+    slice and contrast, so frames without calibration lines (e.g. later repetitions) reuse
+    the most recent calibration of their slice.
+
+    Parameters
+    ----------
+    readouts : iterable of Readout
+        e.g. ReadIsmrmrdAcquisitions(path) or GenerateReadouts(data, samplingPattern)
+    numPhaseEncodes : int
+        ky extent, e.g. ReadIsmrmrdHeader(path)['matrixSize'][1]
+    accFactor : int
+        acceleration factor. If None, inferred for each frame from the line spacing
+    kernelShape, ccmMethod, regularizationScale, maxReadoutWidth
+        see ReconstructFrame
+    maxQueued : int
+        maximum number of readouts read ahead of the reconstruction
+
+    Yields
+    ------
+    frameKey : tuple
+        (slice, contrast, phase, repetition, set)
+    im : (Nx, Ny) array
+        reconstructed image
+
+    Examples
+    --------
+    header = IsmrmSunrise.ReadIsmrmrdHeader('meas.h5')
+    for frameKey, im in IsmrmSunrise.StreamRecon(IsmrmSunrise.ReadIsmrmrdAcquisitions('meas.h5'), header['matrixSize'][1], header['accFactor']):
+        ...
+    """
+    assembler = FrameAssembler(numPhaseEncodes, accFactor)
+    calibrations = {}
+
+    for frameKey, frame in assembler.AssembleFrames(Prefetch(readouts, maxQueued)):
+        calibrationKey = frameKey[0:2]
+        im, calibrations[calibrationKey] = ReconstructFrame(frame, calibrations.get(calibrationKey), kernelShape, ccmMethod, regularizationScale, maxReadoutWidth)
+        yield frameKey, im
+
+
+def Prefetch(iterable, maxQueued=256):
+    """Iterates over an iterable in a background thread, keeping at most maxQueued items
+    ahead of the consumer. Exceptions raised by the iterable are re-raised in the consumer."""
+    items = queue.Queue(maxsize=maxQueued)
+    stop = threading.Event()
+    producer = threading.Thread(target=ProduceItems, args=(iterable, items, stop), daemon=True)
+    producer.start()
+    try:
+        while True:
+            item, error = items.get()
+            if item is EndOfItems:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
+
+
+EndOfItems = object()
+
+def ProduceItems(iterable, items, stop):
+    """Puts the items of an iterable on a bounded queue until it is exhausted or stop is set. Used by Prefetch."""
+    try:
+        for item in iterable:
+            while not stop.is_set():
+                try:
+                    items.put((item, None), timeout=0.1)
+                    break
+                except queue.Full:
+                    pass
+            if stop.is_set():
+                return
+        items.put((EndOfItems, None))
+    except BaseException as error:
+        items.put((EndOfItems, error))
+
+
+def IsmrmrdFlagMask(*flags):
+    mask = 0
+    for flag in flags:
+        mask |= 1 << (flag - 1)
+    return mask
+
+
+def IsIsmrmrdFlagSet(flags, flag):
+    return bool(flags & IsmrmrdFlagMask(flag))
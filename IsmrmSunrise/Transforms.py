@@ -1,4 +1,4 @@
-__all__ = ["TransformImageToKspace", "TransformKspaceToImage", "TransformKernelToImageSpace", "FlipDim", "MultiDimensionalFourierTransform"]
+__all__ = ["TransformImageToKspace", "TransformKspaceToImage", "TransformKernelToImageSpace", "FlipDim", "MultiDimensionalFourierTransform", "TransformUndersampledKspaceToImage"]
 
 import numpy as np
 import PythonFT
@@ -217,3 +217,53 @@ def MultiDimensionalFourierTransform(inputMatrix, dim=None, outputShape=None, sc
     return input
 
 
+
+
+def TransformUndersampledKspaceToImage(lineData, accFactor, fullExtent, sshift=0, dim=1, reducedFov=False):
+    """Fourier transform from uniformly undersampled k-space to aliased images along one 
+    dimension, using only the acquired lines.
+
+    The aliased image of uniformly undersampled data is periodic (apart from a linear phase)
+    with period fullExtent/accFactor, so it is computed with an FFT of that length instead 
+    of transforming the full zero-filled k-space. Matches TransformKspaceToImage applied 
+    to the zero-filled data along dim.
+
+    Parameters
+    ----------
+    lineData : (..., numLines, ...) array
+        acquired lines only, numLines = fullExtent/accFactor along dim,
+        lines at k-space indices sshift, sshift+accFactor, sshift+2*accFactor, ...
+    accFactor : int
+        Acceleration factor, must divide fullExtent
+    fullExtent : int
+        number of lines in fully sampled k-space along dim
+    sshift : int
+        Sampling shift; index of first acquired line
+    dim : int
+        dimension along which lines are undersampled
+    reducedFov : bool
+        If True, only the central fullExtent/accFactor pixels (the reduced field of view) are returned
+
+    Returns
+    -------
+    im : (..., Ny, ...) array
+        aliased image, Ny = fullExtent or fullExtent/accFactor if reducedFov
+    """
+    assert fullExtent % accFactor == 0, "fullExtent must be a multiple of accFactor"
+    numLines = fullExtent // accFactor
+    assert lineData.shape[dim] == numLines, "lineData must have fullExtent/accFactor lines"
+
+    # centred transform as in TransformKspaceToImage: im[y] = sum over k of data[k] * exp(2j*pi*(k-c)*(y-c)/fullExtent), c=floor(fullExtent/2)
+    center = fullExtent >> 1
+    if reducedFov:
+        y = center - (numLines >> 1) + np.arange(0, numLines)
+    else:
+        y = np.arange(0, fullExtent)
+
+    periodicIm = numLines * np.fft.ifft(lineData, axis=dim)
+    im = np.take(periodicIm, (y - center) % numLines, axis=dim)
+
+    reshapeExtent = np.ones(lineData.ndim, dtype=int)
+    reshapeExtent[dim] = y.size
+    linearPhase = np.exp(2.0j * np.pi * (sshift - center) * (y - center) / fullExtent) / np.sqrt(fullExtent)
+    return (im * np.reshape(linearPhase, reshapeExtent)).astype(np.complex64)
@@ -1,9 +1,61 @@
 # -*- coding: utf-8 -*-
-from .Noise import *
-from .Transforms import *
-from .ChannelCombination import *
-from .SensitivityEstimation import *
-from .DataGeneration import *
-from .ParallelImagingCalibration import *
-from .ImageQualityTools import *
-from .DVC import *
+"""
+Submodules are imported on first use (PEP 562), so `import IsmrmSunrise` only costs
+numpy and a function such as IsmrmSunrise.TransformKspaceToImage only loads the
+modules it needs. `from IsmrmSunrise import *` still imports everything.
+"""
+import importlib
+
+# submodule -> public names, in the order of the former star imports.
+# Keep in sync with the __all__ of each submodule (checked by EquivalenceCheck.py).
+SUBMODULE_EXPORTS = {
+    "Noise": ["GenerateCorrelatedNoise", "EstimateCovarianceMatrix", "EstimateCovariance", "ComputeNoiseDecorrelationMatrixFromCovarianceMatrix",
+              "ApplyNoiseDecorrelationMatrix", "ComputeNoiseAmplification"],
+    "Transforms": ["TransformImageToKspace", "TransformKspaceToImage", "TransformKernelToImageSpace", "FlipDim", "MultiDimensionalFourierTransform",
+                   "TransformUndersampledKspaceToImage"],
+    "ChannelCombination": ["ComputeChannelCombinationMaps", "ComputeRootSumOfSquaresChannelCombination", "NormalizeShadingToSoS"],
+    "SensitivityEstimation": ["EstimateCsmMckenzie", "EstimateCsmWalsh", "ComputeDominantEigenvectors", "ComputeFullCorrelationLookup", "ComputeMatrixSet"],
+    "DataGeneration": ["GenerateAcceleratedSamplingPattern", "SamplingPattern", "AcceleratedKspace", "FindCalibrationRegion", "ExtractCalData"],
+    "ParallelImagingCalibration": ["ComputeJerModelDriven", "ComputeJerDataDriven", "ComputeJerDataDrivenReference", "ComputeSenseUnmixing",
+                                   "ComputeJerUnmixing", "ComputeUnmixingImagesFromKspaceKernels"],
+    "ImageQualityTools": ["ComputeGmap", "ComputeAliasingEnergyMap"],
+    "DVC": ["CreateFourierEncodingPhasors", "CreateFourierEncodingImages", "ComputeDvcKernels", "ComputeDvcKernelsReference", "ComputeCcmFromKernels",
+            "ComputeCcmDvc", "GenerateVcBlocks", "FitToAffinePhase", "FitToConstantPhase", "StitchVcBlocks"],
+    "ParameterSweep": ["SweepReconParameters", "ScoreUnmixing"],
+    "CoilCompression": ["ComputeSvdCoilCompressionMatrix", "ComputeGeometricCoilCompressionMatrices", "ApplyCoilCompression", "ApplyGeometricCoilCompression"],
+    "CalibrationCache": ["CalibrationCache"],
+    "DataIO": ["LoadArray", "LazyMatArray", "IterateChunks", "ProcessInChunks"],
+    "Streaming": ["Readout", "ReadIsmrmrdHeader", "ReadIsmrmrdAcquisitions", "GenerateReadouts", "FrameAssembler", "ReconstructFrame", "StreamRecon", "Prefetch"],
+    "ReconServer": ["ReconServer", "ReconClient"],
+    "Instrumentation": ["Instrumentation", "CallCollector", "Instrument"],
+}
+
+# public name -> submodule defining it
+EXPORT_MODULES = dict((name, moduleName) for moduleName, names in SUBMODULE_EXPORTS.items() for name in names)
+
+# submodules defining a class of the same name. IsmrmSunrise.CalibrationCache etc. are
+# the classes; use them through the package rather than importing the submodules 
+# directly, which would bind the module instead
+CLASS_MODULES = [moduleName for moduleName, names in SUBMODULE_EXPORTS.items() if moduleName in names]
+
+__all__ = list(EXPORT_MODULES)
+
+
+def __getattr__(name):
+    moduleName = EXPORT_MODULES.get(name)
+    if moduleName is not None:
+        module = importlib.import_module('.' + moduleName, __name__)
+        value = getattr(module, name)
+        if moduleName in CLASS_MODULES:
+            # importing the submodule bound it as a package attribute, in place of its class
+            globals()[moduleName] = getattr(module, moduleName)
+    elif name in SUBMODULE_EXPORTS:
+        value = importlib.import_module('.' + name, __name__)
+    else:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__) | set(SUBMODULE_EXPORTS))